@@ -1,14 +1,15 @@
 import logging
 import json
 import azure.functions as func
-from azure.core.exceptions import ResourceNotFoundError, AzureError
+from azure.core.exceptions import AzureError
 import sys
 import os
 
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient
+from shared.azure_client import ConcurrencyConflictError
+from shared.data_store import DataStore
 from shared.user_manager import extract_user_id
 
 
@@ -22,7 +23,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     - user_id (optional): User ID (extracted from header/query/body)
     
     Returns:
-    - Success response with entry count
+    - Success response with the position of the new entry (entry_index) and the
+      entry count up to it; concurrent appends on this instance share one write
     """
     logging.info('add_new_data: Processing HTTP request with user isolation')
     
@@ -52,32 +54,18 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(f"add_new_data: user_id={user_id}, file_name={target_blob_name}")
     
     try:
-        # Get blob client with user isolation
-        blob_client = AzureBlobClient.get_blob_client(target_blob_name, user_id)
-        
-        # 1. Read existing data or create empty list
-        try:
-            blob_data = blob_client.download_blob()
-            data_str = blob_data.readall().decode('utf-8')
-            data = json.loads(data_str)
-        except ResourceNotFoundError:
-            data = []
-        
-        # 2. Ensure data is a list
-        if not isinstance(data, list):
-            data = [data]
-        
-        # 3. Append new entry
-        data.append(new_entry)
-        
-        # 4. Write updated data back
-        upload_data = json.dumps(data, indent=2, ensure_ascii=False)
-        blob_client.upload_blob(upload_data.encode('utf-8'), overwrite=True)
+        # Conditional append (tail segment only for segmented files); re-merged if another writer wins the race,
+        # and combined with concurrent appends to the same file on this instance
+        entry_count = DataStore.append(target_blob_name, new_entry, user_id)
+        if entry_count == DataStore.UNCOUNTED:
+            # Logged behind pending removals of a large file; counting them would read too much
+            entry_count = None
         
         response_data = {
             "status": "success",
             "message": f"Entry successfully added to '{target_blob_name}'",
-            "entry_count": len(data),
+            "entry_count": entry_count,
+            "entry_index": entry_count - 1 if entry_count is not None else None,
             "user_id": user_id
         }
         
@@ -86,7 +74,14 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             status_code=200
         )
-
+    
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Write conflict in add_new_data: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Concurrent modification, please retry: {str(e)}"}),
+            status_code=409,
+            mimetype="application/json"
+        )
     except AzureError as e:
         logging.error(f"Azure error in add_new_data: {str(e)}")
         return func.HttpResponse(
@@ -0,0 +1,87 @@
+"""
+Per-request latency of a fresh BlobServiceClient versus the shared, pooled
+AzureBlobClient used by all handlers.
+
+A "cold" request builds a client from the connection string, downloads one
+blob and closes the client, as the legacy handlers did: every request pays
+for a new TCP connection (and TLS handshake against Azure). A "warm" request
+downloads the same blob through AzureBlobClient, reusing the keep-alive
+connections of the worker.
+
+Usage (against Azurite by default, or AZURE_STORAGE_CONNECTION_STRING):
+    python benchmark_blob_client.py --requests 200 --size-kb 16
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, List
+
+from azure.storage.blob import BlobServiceClient
+
+from shared.azure_client import AzureBlobClient
+from shared.config import AzureConfig
+
+
+BENCHMARK_USER_ID = "benchmark"
+BENCHMARK_BLOB_NAME = "benchmark_blob_client.json"
+
+
+def measure(request: Callable[[], bytes], count: int) -> List[float]:
+    """Run `request` `count` times and return the latencies in milliseconds"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies: List[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Downloads per mode (default: 100)")
+    parser.add_argument("--size-kb", type=int, default=16, help="Size of the test blob (default: 16)")
+    args = parser.parse_args()
+
+    blob_client = AzureBlobClient.get_blob_client(BENCHMARK_BLOB_NAME, BENCHMARK_USER_ID)
+    blob_client.upload_blob(b"x" * (args.size_kb * 1024), overwrite=True)
+    blob_name = blob_client.blob_name
+
+    def cold_request() -> bytes:
+        with BlobServiceClient.from_connection_string(AzureConfig.CONNECTION_STRING) as service_client:
+            blob = service_client.get_blob_client(AzureConfig.CONTAINER_NAME, blob_name)
+            return blob.download_blob().readall()
+
+    def warm_request() -> bytes:
+        return AzureBlobClient.get_blob_client(BENCHMARK_BLOB_NAME, BENCHMARK_USER_ID).download_blob().readall()
+
+    try:
+        # One warm-up request each, so neither mode pays for imports or DNS
+        cold_request()
+        warm_request()
+        cold = summarize(measure(cold_request, args.requests))
+        warm = summarize(measure(warm_request, args.requests))
+    finally:
+        blob_client.delete_blob()
+        AzureBlobClient.close()
+
+    print(json.dumps({
+        "requests": args.requests,
+        "size_kb": args.size_kb,
+        "per_request_client": cold,
+        "pooled_client": warm,
+        "saved_per_request_ms": round(cold["mean_ms"] - warm["mean_ms"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import logging
+import azure.functions as func
+import sys
+import os
+from typing import List
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import StorageConfig, UserNamespace
+from shared.interaction_log import InteractionLog
+from shared.storage import get_storage
+
+
+def pending_users() -> List[str]:
+    """Users with interaction history whose thread index is missing or unfinished, from one listing"""
+    with_history = {}
+    built = set()
+    for info in get_storage().list_blobs("users/"):
+        user_id = UserNamespace.extract_user_id_from_blob_name(info.name)
+        if user_id is None:
+            continue
+        name = info.name[len(UserNamespace.get_user_prefix(user_id)):]
+        if name == InteractionLog.THREAD_INDEX_BLOB_NAME and info.size > 0:
+            # The marker gets its first block when the build has finished
+            built.add(user_id)
+        elif name.startswith(InteractionLog.LOG_PREFIX):
+            with_history[user_id] = True
+    return [user_id for user_id in with_history if user_id not in built]
+
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Background build of the per-thread interaction logs.
+    
+    Thread-scoped history and list_threads read a thread's own log once the
+    user's thread index is complete, and scan the day partitions until then.
+    The index is never built on a request; this timer builds it for at most
+    StorageConfig.THREAD_INDEX_MAX_USERS users per run (including builds
+    abandoned by a worker that died), and the next run continues with
+    whatever is left.
+    """
+    if timer.past_due:
+        logging.info("build_thread_indexes: timer is past due")
+    
+    built = skipped = failed = 0
+    for user_id in pending_users():
+        if built >= StorageConfig.THREAD_INDEX_MAX_USERS:
+            break
+        try:
+            if InteractionLog.build_thread_index(user_id):
+                built += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            failed += 1
+            logging.warning(f"build_thread_indexes: could not build the thread index of user {user_id}: {str(e)}")
+    
+    logging.info(f"build_thread_indexes: built={built}, skipped={skipped}, failed={failed}")
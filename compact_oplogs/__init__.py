@@ -0,0 +1,61 @@
+import logging
+import azure.functions as func
+import sys
+import os
+import posixpath
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import OplogConfig
+from shared.data_oplog import OpLog
+from shared.data_store import DataStore
+from shared.storage import get_storage
+
+# Logs that no manifest points to are removed once they are this old (a
+# younger one may belong to a compaction that is still committing)
+ORPHAN_MIN_AGE = timedelta(hours=1)
+
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Background compaction of collection operation logs.
+    
+    Writes compact a log once it passes OplogConfig.COMPACT_OPS operations;
+    this folds the operations of collections that stopped receiving writes,
+    so their readers no longer replay them. Logs left behind by compactions
+    that died after committing are deleted. At most
+    OplogConfig.COMPACT_MAX_BLOBS collections are compacted per run.
+    """
+    if timer.past_due:
+        logging.info("compact_oplogs: timer is past due")
+    
+    storage = get_storage()
+    compacted = orphaned = failed = 0
+    now = datetime.now(timezone.utc)
+    
+    marker = f"{OpLog.LOG_SUFFIX}/"
+    for info in storage.list_blobs():
+        if compacted >= OplogConfig.COMPACT_MAX_BLOBS:
+            break
+        # Empty logs have nothing to fold (listings carry sizes, not block counts)
+        if marker not in info.name or not info.size:
+            continue
+        
+        # Logs live in `<collection>.oplog/`, next to the collection's manifest
+        name = info.name[:info.name.index(marker)]
+        try:
+            document, _ = storage.read_json(name)
+            ref = document.get("oplog") if DataStore.is_manifest(document) else None
+            if ref is not None and posixpath.join(posixpath.dirname(name), ref) == info.name:
+                if DataStore.compact(name):
+                    compacted += 1
+            elif info.last_modified and now - info.last_modified > ORPHAN_MIN_AGE:
+                storage.delete_blob(info.name)
+                orphaned += 1
+        except Exception as e:
+            failed += 1
+            logging.warning(f"compact_oplogs: could not compact {name}: {str(e)}")
+    
+    logging.info(f"compact_oplogs: compacted={compacted}, orphaned={orphaned}, failed={failed}")
@@ -0,0 +1,127 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import DateIndexConfig
+from shared.data_store import DataStore
+from shared.date_index import DateIndex
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Entries with a date between two bounds, across all of a user's JSON files.
+    
+    Answered by binary search in the user's date index
+    (`__indexes__/dates.json`), which writes keep up to date; files are only
+    read to rebuild the sections of files changed some other way, or when
+    `include_entries` is set.
+    
+    Parameters (in JSON body):
+    - from (optional): First ISO date or datetime to include
+    - to (optional): Last ISO date or datetime to include (a date includes the whole day)
+      At least one of from/to is required.
+    - fields (optional): Date fields to look at (default: all of DATE_INDEX_FIELDS)
+    - files (optional): File names to look in; all .json files of the user when omitted
+    - prefix (optional): Only look in files whose name starts with this prefix
+    - limit (optional): Maximum number of hits (default DATE_RANGE_DEFAULT_LIMIT, at most DATE_RANGE_MAX_LIMIT)
+    - include_entries (optional): Also return the entries
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Hits in date order with file, field, date, entry position and entry id, plus per-file errors
+    """
+    logging.info('get_date_range: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    start = req_body.get('from')
+    end = req_body.get('to')
+    fields = req_body.get('fields')
+    files = req_body.get('files')
+    prefix = req_body.get('prefix')
+    limit = req_body.get('limit', DateIndexConfig.DEFAULT_LIMIT)
+    include_entries = bool(req_body.get('include_entries', False))
+    
+    error = None
+    if start is None and end is None:
+        error = "Missing required field 'from' or 'to'"
+    elif any(bound is not None and DateIndex.date_key(bound) is None for bound in (start, end)):
+        error = "'from' and 'to' must be ISO dates (YYYY-MM-DD) or datetimes"
+    elif fields is not None and (
+        not isinstance(fields, list) or not all(name in DateIndexConfig.FIELDS for name in fields)
+    ):
+        error = f"'fields' must be a list of indexed date fields ({', '.join(DateIndexConfig.FIELDS)})"
+    elif files is not None and (not isinstance(files, list) or not all(isinstance(name, str) for name in files)):
+        error = "'files' must be a list of file names"
+    elif isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= DateIndexConfig.MAX_LIMIT:
+        error = f"'limit' must be an integer between 1 and {DateIndexConfig.MAX_LIMIT}"
+    if error:
+        return func.HttpResponse(
+            json.dumps({"error": error}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"get_date_range: user_id={user_id}, from={start}, to={end}, fields={fields}, files={files}")
+    
+    try:
+        result = DataStore.date_range(
+            start,
+            end,
+            user_id,
+            fields=fields,
+            files=files,
+            prefix=prefix,
+            limit=limit,
+            include_entries=include_entries
+        )
+        if result.rebuilt:
+            logging.info(f"get_date_range: rebuilt date index of {len(result.rebuilt)} files for user {user_id}")
+        
+        response = {
+            "status": "partial" if result.errors else "success",
+            "user_id": user_id,
+            "from": start,
+            "to": end,
+            "hits": result.hits,
+            "count": len(result.hits),
+            "matched": result.matched,
+            "files_searched": result.files,
+            "errors": result.errors
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except AzureError as e:
+        logging.error(f"Azure error in get_date_range: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in get_date_range: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,122 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import AzureError
+from datetime import datetime, timezone
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import DateIndexConfig
+from shared.data_store import DataStore
+from shared.date_index import DateIndex
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Entries due today across all of a user's JSON files, for the "Today" widget.
+    
+    A date-range query on one day (see get_date_range), answered from the
+    user's date index.
+    
+    Parameters (query string or JSON body):
+    - date (optional): Day to report, YYYY-MM-DD (default: today in UTC)
+    - field (optional): Date field to look at (default "due")
+    - include_overdue (optional): "true" to also return entries due before that day
+    - prefix (optional): Only look in files whose name starts with this prefix
+    - limit (optional): Maximum number of hits (default DATE_RANGE_DEFAULT_LIMIT, at most DATE_RANGE_MAX_LIMIT)
+    - include_entries (optional): "true" to also return the entries
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Hits in date order with file, field, date, entry position and entry id, plus per-file errors
+    """
+    logging.info('get_due_today: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json() or {}
+    except ValueError:
+        req_body = {}
+    
+    def param(name: str, default=None):
+        value = req.params.get(name)
+        return value if value is not None else req_body.get(name, default)
+    
+    def flag(name: str) -> bool:
+        value = param(name, False)
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    
+    day = param('date') or datetime.now(timezone.utc).date().isoformat()
+    field = param('field', 'due')
+    prefix = param('prefix')
+    include_overdue = flag('include_overdue')
+    include_entries = flag('include_entries')
+    
+    error = None
+    limit = param('limit', DateIndexConfig.DEFAULT_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = None
+    if not isinstance(day, str) or len(day) != 10 or DateIndex.date_key(day) is None:
+        error = "'date' must be an ISO date (YYYY-MM-DD)"
+    elif field not in DateIndexConfig.FIELDS:
+        error = f"'field' must be an indexed date field ({', '.join(DateIndexConfig.FIELDS)})"
+    elif limit is None or not 1 <= limit <= DateIndexConfig.MAX_LIMIT:
+        error = f"'limit' must be an integer between 1 and {DateIndexConfig.MAX_LIMIT}"
+    if error:
+        return func.HttpResponse(
+            json.dumps({"error": error}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"get_due_today: user_id={user_id}, date={day}, field={field}, include_overdue={include_overdue}")
+    
+    try:
+        result = DataStore.date_range(
+            None if include_overdue else day,
+            day,
+            user_id,
+            fields=[field],
+            prefix=prefix,
+            limit=limit,
+            include_entries=include_entries
+        )
+        
+        response = {
+            "status": "partial" if result.errors else "success",
+            "user_id": user_id,
+            "date": day,
+            "field": field,
+            "hits": result.hits,
+            "count": len(result.hits),
+            "matched": result.matched,
+            "files_searched": result.files,
+            "errors": result.errors
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except AzureError as e:
+        logging.error(f"Azure error in get_due_today: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in get_due_today: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,95 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError, AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import UserNamespace
+from shared.data_store import DataStore
+from shared.storage import get_storage
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Entry count, size and per-category counts of files, from blob metadata only.
+    
+    Nothing is downloaded: a single file costs one properties call, all files of
+    the user one list call. Files written before statistics were recorded report
+    entry_count and category_counts as null until their next write. Collections
+    with operations logged since their last compaction also read the log (and
+    the segments those operations may touch) to count them in.
+    
+    Parameters (query string or JSON body):
+    - target_blob_name (optional): File to describe (e.g., "tasks.json"); all of
+      the user's files when omitted
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Statistics per file: entry_count, byte_size, category_counts, last_modified
+    """
+    logging.info('get_file_stats: Processing HTTP request with user isolation')
+    
+    target_blob_name = req.params.get('target_blob_name')
+    if not target_blob_name:
+        try:
+            target_blob_name = (req.get_json() or {}).get('target_blob_name')
+        except ValueError:
+            target_blob_name = None
+    
+    user_id = extract_user_id(req)
+    logging.info(f"get_file_stats: user_id={user_id}, file_name={target_blob_name or '*'}")
+    
+    try:
+        storage = get_storage()
+        
+        if target_blob_name:
+            info = storage.get_properties(storage.blob_path(target_blob_name, user_id))
+            files = [{"file": target_blob_name, **DataStore.file_stats(target_blob_name, info, user_id)}]
+        else:
+            prefix = UserNamespace.get_user_prefix(user_id)
+            files = []
+            for info in storage.list_blobs(prefix, include_metadata=True):
+                if DataStore.is_internal_blob(info.name):
+                    continue
+                file_name = info.name[len(prefix):]
+                files.append({"file": file_name, **DataStore.file_stats(file_name, info, user_id)})
+        
+        response = {
+            "status": "success",
+            "user_id": user_id,
+            "files": files,
+            "count": len(files)
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except ResourceNotFoundError:
+        logging.warning(f"File not found: {target_blob_name} for user {user_id}")
+        return func.HttpResponse(
+            json.dumps({"error": f"File '{target_blob_name}' not found for user {user_id}"}),
+            status_code=404,
+            mimetype="application/json"
+        )
+    except AzureError as e:
+        logging.error(f"Azure error in get_file_stats: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in get_file_stats: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
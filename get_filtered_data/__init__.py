@@ -8,7 +8,8 @@ import os
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient
+from shared.data_store import DataStore, NotAnArrayError
+from shared.query import Cursor, CursorError, CursorExpiredError, Query, QueryError
 from shared.user_manager import extract_user_id
 
 
@@ -20,10 +21,18 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     - target_blob_name (required): Name of the file to read (e.g., "tasks.json")
     - key (optional): Field name to filter by (e.g., "status")
     - value (optional): Value to match (e.g., "open")
+    - limit (optional): Page size: maximum number of entries to return; "total" still counts all of them
+    - cursor (optional): "next_cursor" of the previous page, to fetch the next one with the same
+      filter/query (expires when the file changes: 409)
+    - fields (optional): Only return these fields of each entry
+    - query (optional): Structured query instead of key/value: "where" (and/or/not over eq, ne, in, nin,
+      gt, gte, lt, lte, contains, exists), "sort", "limit" and "fields" (see shared/query.py)
     - user_id (optional): User ID (extracted from header/query/body)
     
     Returns:
-    - JSON data (filtered if key/value provided, otherwise full data)
+    - JSON data (filtered if key/value provided, otherwise full data), "next_cursor" (null after
+      the last page) and "cache": "hit" when the result was reused from this worker's result
+      cache, "miss" when it was computed and kept, "bypass" when it was not kept (QUERY_CACHE_MAX_BYTES)
     """
     logging.info('get_filtered_data: Processing HTTP request with user isolation')
     
@@ -40,6 +49,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     target_blob_name = req_body.get('target_blob_name')
     key = req_body.get('key')
     value = req_body.get('value')
+    limit = req_body.get('limit')
+    cursor_token = req_body.get('cursor')
+    fields = req_body.get('fields')
+    query_spec = req_body.get('query')
     
     if not target_blob_name:
         return func.HttpResponse(
@@ -48,31 +61,103 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
     
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        return func.HttpResponse(
+            json.dumps({"error": "'limit' must be a positive integer"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    if fields is not None and (
+        not isinstance(fields, list) or not fields
+        or not all(isinstance(name, str) and name for name in fields)
+    ):
+        return func.HttpResponse(
+            json.dumps({"error": "'fields' must be a non-empty list of field names"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    cursor = None
+    if cursor_token is not None:
+        try:
+            cursor = Cursor.decode(cursor_token)
+        except CursorError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=400,
+                mimetype="application/json"
+            )
+    
+    query = None
+    if query_spec is not None:
+        if key:
+            return func.HttpResponse(
+                json.dumps({"error": "Use either 'query' or 'key'/'value', not both"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        try:
+            if isinstance(query_spec, dict) and limit is not None and "limit" not in query_spec:
+                query_spec = {**query_spec, "limit": limit}
+            if isinstance(query_spec, dict) and fields is not None and "fields" not in query_spec:
+                query_spec = {**query_spec, "fields": fields}
+            query = Query.compile(query_spec)
+        except QueryError as e:
+            return func.HttpResponse(
+                json.dumps({"error": f"Invalid query: {str(e)}"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+    
     # Extract user ID from request
     user_id = extract_user_id(req)
     logging.info(f"get_filtered_data: user_id={user_id}, file_name={target_blob_name}, filter={key}={value if key else 'none'}")
     
     try:
-        # Get blob client with user isolation
-        blob_client = AzureBlobClient.get_blob_client(target_blob_name, user_id)
+        if query is not None:
+            # Filter evaluated while reading (one pass), then sorted, paged and projected;
+            # reused while the file is unchanged
+            data, total, next_cursor, cache_status = DataStore.find_cached(target_blob_name, query, user_id, cursor)
+            if data is None:
+                raise ResourceNotFoundError(f"Blob '{target_blob_name}' not found")
+            return func.HttpResponse(
+                json.dumps({
+                    "status": "success",
+                    "user_id": user_id,
+                    "file": target_blob_name,
+                    "query": query_spec,
+                    "data": data,
+                    "count": len(data),
+                    "total": total,
+                    "next_cursor": next_cursor,
+                    "cache": cache_status
+                }, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
         
-        # Read blob data
-        blob_data = blob_client.download_blob()
-        data_str = blob_data.readall().decode('utf-8')
-        data = json.loads(data_str)
+        # Read blob data with user isolation; segments that cannot match the filter are skipped
+        # and large files are filtered while streaming, stopping once the page of `limit` entries is full
+        match = (key, value) if key and value else None
+        data, total, next_cursor, cache_status = DataStore.read_cached(
+            target_blob_name, user_id, match=match, limit=limit, fields=fields, cursor=cursor
+        )
+        if data is None:
+            raise ResourceNotFoundError(f"Blob '{target_blob_name}' not found")
         
-        # Apply filter if provided
-        if key and value:
-            filtered_data = [entry for entry in data if str(entry.get(key)) == str(value)]
-            
+        # Filter already applied while reading
+        if match:
             response = {
                 "status": "success",
                 "user_id": user_id,
                 "file": target_blob_name,
                 "filter": {"key": key, "value": value},
-                "data": filtered_data,
-                "count": len(filtered_data),
-                "total": len(data)
+                "data": data,
+                "count": len(data),
+                "total": total,
+                "next_cursor": next_cursor,
+                "cache": cache_status
             }
         else:
             response = {
@@ -81,15 +166,32 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "file": target_blob_name,
                 "filter": None,
                 "data": data,
-                "count": len(data)
+                "count": total,
+                "cache": cache_status
             }
+            if (limit is not None or cursor is not None) and isinstance(data, list):
+                response["count"] = len(data)
+                response["total"] = total
+                response["next_cursor"] = next_cursor
         
         return func.HttpResponse(
             json.dumps(response, ensure_ascii=False),
             mimetype="application/json",
             status_code=200
         )
-
+    
+    except CursorExpiredError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=409,
+            mimetype="application/json"
+        )
+    except CursorError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
     except ResourceNotFoundError:
         logging.warning(f"File not found: {target_blob_name} for user {user_id}")
         return func.HttpResponse(
@@ -97,6 +199,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             status_code=404,
             mimetype="application/json"
         )
+    except NotAnArrayError:
+        return func.HttpResponse(
+            json.dumps({"error": f"File '{target_blob_name}' is not a JSON array; 'query' needs a list of entries"}),
+            status_code=400,
+            mimetype="application/json"
+        )
     except json.JSONDecodeError as e:
         logging.error(f"JSON parsing error in {target_blob_name}: {str(e)}")
         return func.HttpResponse(
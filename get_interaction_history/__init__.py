@@ -1,14 +1,14 @@
 import logging
 import json
 import azure.functions as func
-from azure.core.exceptions import ResourceNotFoundError, AzureError
+from azure.core.exceptions import AzureError
 import sys
 import os
 
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient
+from shared.interaction_log import InteractionLog
 from shared.user_manager import extract_user_id
 
 
@@ -23,7 +23,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     - user_id (optional): User ID (extracted from header/query/body)
     
     Returns:
-    - List of interactions with metadata
+    - List of interactions with metadata, newest first; total_count is null when
+      a thread filter filled the page before all partitions were read
     """
     logging.info('get_interaction_history: Processing HTTP request with user isolation')
     
@@ -72,44 +73,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(f"get_interaction_history: user_id={user_id}, thread_id={thread_id}, limit={limit}, offset={offset}")
     
     try:
-        # Use the same dedicated file for interaction logs
-        target_blob_name = "interaction_logs.json"
-        
-        # Get blob client with user isolation
-        blob_client = AzureBlobClient.get_blob_client(target_blob_name, user_id)
-        
-        # 1. Read existing logs
-        try:
-            blob_data = blob_client.download_blob()
-            data_str = blob_data.readall().decode('utf-8')
-            logs = json.loads(data_str)
-        except ResourceNotFoundError:
-            logs = []
-        
-        # 2. Ensure logs is a list
-        if not isinstance(logs, list):
-            logs = []
-        
-        # 3. Filter by thread_id if specified
-        if thread_id:
-            filtered_logs = [log for log in logs if log.get('thread_id') == thread_id]
-        else:
-            filtered_logs = logs
-        
-        # 4. Apply pagination
-        total_count = len(filtered_logs)
-        
-        # Sort by timestamp (most recent first)
-        filtered_logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        
-        # Apply offset and limit
-        paginated_logs = filtered_logs[offset:offset + limit]
+        # Walk day partitions newest-first, reading only those the page needs
+        paginated_logs, total_count, has_more = InteractionLog.page(user_id, offset, limit, thread_id)
         
         response_data = {
             "status": "success",
             "interactions": paginated_logs,
             "total_count": total_count,
             "returned_count": len(paginated_logs),
+            "has_more": has_more,
             "offset": offset,
             "limit": limit,
             "user_id": user_id,
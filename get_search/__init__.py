@@ -0,0 +1,121 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import SearchConfig
+from shared.data_store import DataStore
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Full-text search over the string fields of a user's JSON files.
+    
+    Answered from the per-file search indexes (`<name>.searchindex.json`) that
+    writes keep up to date; the files themselves are only read to rebuild a
+    missing or stale index, or when `include_entries` is set.
+    
+    Parameters (in JSON body):
+    - query (required): Words to search for
+    - files (optional): File names to search; all .json files of the user when omitted
+    - prefix (optional): Only search files whose name starts with this prefix
+    - match (optional): "any" (default) or "all" words
+    - rank (optional): Rank hits by BM25 (default true); false returns them in file order
+    - limit (optional): Maximum number of hits (default SEARCH_DEFAULT_LIMIT, at most SEARCH_MAX_LIMIT)
+    - include_entries (optional): Also return the matching entries
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Hits with file, entry position, entry id and score, plus per-file errors
+    """
+    logging.info('get_search: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    text = req_body.get('query')
+    files = req_body.get('files')
+    prefix = req_body.get('prefix')
+    match = req_body.get('match', 'any')
+    rank = req_body.get('rank', True)
+    limit = req_body.get('limit', SearchConfig.DEFAULT_LIMIT)
+    include_entries = bool(req_body.get('include_entries', False))
+    
+    error = None
+    if not isinstance(text, str) or not text.strip():
+        error = "Missing required field 'query'"
+    elif files is not None and (not isinstance(files, list) or not all(isinstance(name, str) for name in files)):
+        error = "'files' must be a list of file names"
+    elif match not in ("any", "all"):
+        error = "'match' must be 'any' or 'all'"
+    elif not isinstance(rank, bool):
+        error = "'rank' must be true or false"
+    elif isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= SearchConfig.MAX_LIMIT:
+        error = f"'limit' must be an integer between 1 and {SearchConfig.MAX_LIMIT}"
+    if error:
+        return func.HttpResponse(
+            json.dumps({"error": error}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"get_search: user_id={user_id}, query={text!r}, files={files}, prefix={prefix}")
+    
+    try:
+        result = DataStore.search(
+            text,
+            user_id,
+            files=files,
+            prefix=prefix,
+            limit=limit,
+            require_all=match == "all",
+            scored=rank,
+            include_entries=include_entries
+        )
+        if result.rebuilt:
+            logging.info(f"get_search: rebuilt search index of {len(result.rebuilt)} files for user {user_id}")
+        
+        response = {
+            "status": "partial" if result.errors else "success",
+            "user_id": user_id,
+            "query": text,
+            "hits": result.hits,
+            "count": len(result.hits),
+            "matched": result.matched,
+            "files_searched": result.files,
+            "errors": result.errors
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+
+    except AzureError as e:
+        logging.error(f"Azure error in get_search: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in get_search: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,88 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.data_store import DataStore
+from shared.summary_stats import SummaryStats
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Dashboard overview of all of a user's JSON files: entry counts per file and
+    per value of the grouped fields (SUMMARY_GROUP_FIELDS, default category and status).
+    
+    Answered from the per-user aggregate document (`__indexes__/summary.json`),
+    which add_new_data, update_data_entry and remove_data_entry keep current
+    with deltas; files are only read when their counts are stale, or all of
+    them with `verify`.
+    
+    Parameters (query string or JSON body):
+    - prefix (optional): Only include files whose name starts with this prefix
+    - verify (optional): "true" to recount every file and repair counts that drifted
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Total entry count, counts per grouped field over all files and per file
+    """
+    logging.info('get_summary_stats: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json() or {}
+    except ValueError:
+        req_body = {}
+    
+    prefix = req.params.get('prefix') or req_body.get('prefix') or ''
+    verify = req.params.get('verify', req_body.get('verify', False))
+    verify = verify if isinstance(verify, bool) else str(verify).lower() == "true"
+    
+    user_id = extract_user_id(req)
+    logging.info(f"get_summary_stats: user_id={user_id}, prefix={prefix}, verify={verify}")
+    
+    try:
+        state = DataStore.refresh_user_index(SummaryStats, user_id, verify=verify)
+        if state.rebuilt:
+            logging.info(f"get_summary_stats: recounted {len(state.rebuilt)} files for user {user_id}")
+        
+        sections = {name: section for name, section in state.sections.items() if name.startswith(prefix)}
+        overview = SummaryStats.overview(sections)
+        errors = [error for error in state.errors if error["file"].startswith(prefix)]
+        
+        response = {
+            "status": "partial" if errors else "success",
+            "user_id": user_id,
+            "entry_count": overview["entry_count"],
+            "file_count": len(overview["files"]),
+            "groups": overview["groups"],
+            "files": overview["files"],
+            "errors": errors
+        }
+        if verify:
+            response["drifted"] = [name for name in state.drifted if name.startswith(prefix)]
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except AzureError as e:
+        logging.error(f"Azure error in get_summary_stats: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in get_summary_stats: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
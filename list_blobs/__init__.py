@@ -8,35 +8,72 @@ import os
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient
+from shared.config import StorageConfig
+from shared.data_store import DataStore
+from shared.storage import get_storage
 from shared.user_manager import extract_user_id
 
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
+async def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     List all blobs for the authenticated user.
     
     Parameters:
     - prefix (optional): Filter blobs by name prefix (e.g., "tasks" to find "tasks.json", "tasks_backup.json")
+    - max_results (optional): Page size (1..STORAGE_LIST_MAX_RESULTS); without it all blobs are returned
+    - continuation_token (optional): Token returned with the previous page
+    - include_details (optional): "true" to return {name, size, last_modified} objects instead of names
     - user_id (optional): User ID (from header X-User-Id, query param, or body)
     
     Returns:
-    - JSON array of blob names
+    - JSON array of blob names (or details), plus continuation_token/has_more when paging
     """
     # Extract user ID and optional prefix
     user_id = extract_user_id(req)
     prefix = req.params.get("prefix")
+    continuation_token = req.params.get("continuation_token")
+    include_details = req.params.get("include_details", "").lower() == "true"
     
-    logging.info(f"list_blobs: user_id={user_id}, prefix={prefix}")
+    try:
+        max_results = req.params.get("max_results")
+        max_results = int(max_results) if max_results else None
+        if max_results is not None and not 1 <= max_results <= StorageConfig.LIST_MAX_RESULTS:
+            raise ValueError
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": f"max_results must be an integer between 1 and {StorageConfig.LIST_MAX_RESULTS}"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    if continuation_token and max_results is None:
+        max_results = StorageConfig.LIST_MAX_RESULTS
+    
+    logging.info(f"list_blobs: user_id={user_id}, prefix={prefix}, max_results={max_results}")
     
     try:
-        # Get list of blobs for this user
-        blobs = AzureBlobClient.list_user_blobs(user_id, prefix)
+        # Get one page of blobs for this user (segments and indexes of collections are internal)
+        infos, next_token = await get_storage().alist_user_page(
+            user_id, prefix, max_results, continuation_token, DataStore.is_listed_blob
+        )
+        
+        if include_details:
+            blobs = [
+                {
+                    "name": info.name,
+                    "size": info.size,
+                    "last_modified": info.last_modified.isoformat() if info.last_modified else None
+                }
+                for info in infos
+            ]
+        else:
+            blobs = [info.name for info in infos]
         
         response = {
             "user_id": user_id,
             "blobs": blobs,
-            "count": len(blobs)
+            "count": len(blobs),
+            "continuation_token": next_token,
+            "has_more": next_token is not None
         }
         
         return func.HttpResponse(
@@ -45,6 +82,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             status_code=200
         )
 
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=400,
+            mimetype="application/json"
+        )
     except AzureError as e:
         logging.error(f"Azure error listing blobs for user {user_id}: {str(e)}")
         return func.HttpResponse(
@@ -0,0 +1,87 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.interaction_log import InteractionLog
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    List the user's conversation threads with interaction counts and last activity.
+    
+    Served from the per-thread interaction logs with a single list call once
+    the build_thread_indexes timer has built them; until then the history is
+    scanned.
+    
+    Parameters (query string or JSON body):
+    - limit (optional): Maximum number of threads to return (default: all)
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Threads (thread_id, interaction_count, last_activity), most recently active first
+    """
+    logging.info('list_threads: Processing HTTP request with user isolation')
+    
+    limit = req.params.get('limit')
+    if limit is None:
+        try:
+            limit = (req.get_json() or {}).get('limit')
+        except ValueError:
+            limit = None
+    
+    if limit is not None:
+        try:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return func.HttpResponse(
+                json.dumps({"error": "Limit must be a positive integer"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"list_threads: user_id={user_id}, limit={limit}")
+    
+    try:
+        threads = InteractionLog.list_threads(user_id)
+        total = len(threads)
+        if limit is not None:
+            threads = threads[:limit]
+        
+        response = {
+            "status": "success",
+            "user_id": user_id,
+            "threads": threads,
+            "count": len(threads),
+            "total": total
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except AzureError as e:
+        logging.error(f"Azure error in list_threads: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in list_threads: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -1,84 +1,235 @@
 import logging
 import json
 import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError
+import sys
 import os
-from azure.storage.blob import BlobServiceClient
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import StorageConfig
+from shared.data_store import DataStore
+from shared.storage import get_storage
+from shared.user_manager import extract_user_id
+
+# Domyślny folder operacji 'archive'
+ARCHIVE_PREFIX = "archive/"
+
+# Górny limit plików w jednym wywołaniu (lista lub prefiks)
+MAX_BATCH_ITEMS = 1000
+
+
+def item_result(source_name: str, error, target_name: str = None) -> dict:
+    """Wynik operacji na jednym pliku w trybie wsadowym"""
+    result = {"source_name": source_name}
+    if target_name is not None:
+        result["target_name"] = target_name
+    if error is None:
+        result["status"] = "success"
+    elif isinstance(error, ResourceNotFoundError):
+        result["status"] = "not_found"
+    else:
+        result["status"] = "error"
+        result["error"] = str(error)
+    return result
+
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('manage_files: Przetwarzanie żądania HTTP do zarządzania plikami.')
-
+    
     try:
         req_body = req.get_json()
     except ValueError:
         return func.HttpResponse("Proszę przesłać poprawny JSON.", status_code=400)
-
+    
     operation = req_body.get('operation')
     source_name = req_body.get('source_name')
     target_name = req_body.get('target_name')
     prefix = req_body.get('prefix', '') # Opcjonalny argument dla 'list'
-
+    
+    # Stronicowanie 'list': rozmiar strony, token z poprzedniej strony, rozmiar i data modyfikacji
+    max_results = req_body.get('max_results')
+    continuation_token = req_body.get('continuation_token')
+    include_details = bool(req_body.get('include_details', False))
+    
+    # Tryb wsadowy: lista plików albo prefiks (dla delete/rename/archive)
+    source_names = req_body.get('source_names')
+    renames = req_body.get('renames')           # [{"source_name": ..., "target_name": ...}]
+    target_prefix = req_body.get('target_prefix')
+    archive_prefix = req_body.get('archive_prefix') or ARCHIVE_PREFIX
+    
     if not operation:
         return func.HttpResponse("Brak wymaganego pola 'operation'.", status_code=400)
-
+    
+    if not isinstance(prefix, str):
+        return func.HttpResponse("'prefix' musi być tekstem.", status_code=400)
+    if source_names is not None and (not isinstance(source_names, list) or not all(isinstance(name, str) and name for name in source_names)):
+        return func.HttpResponse("'source_names' musi być listą nazw plików.", status_code=400)
+    if renames is not None and (not isinstance(renames, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('source_name'), str) and item.get('source_name')
+        and isinstance(item.get('target_name'), str) and item.get('target_name')
+        for item in renames
+    )):
+        return func.HttpResponse("'renames' musi być listą obiektów z 'source_name' i 'target_name'.", status_code=400)
+    
+    # Wsad wybiera dokładnie jeden parametr; pusty prefiks nigdy nie oznacza "wszystkie pliki"
+    batch_params = [param for param, value in (('source_names', source_names), ('renames', renames)) if value is not None]
+    if prefix and operation != 'list':
+        batch_params.append('prefix')
+    if operation in ('delete', 'rename', 'archive'):
+        if source_name and batch_params:
+            return func.HttpResponse(f"'source_name' nie może być łączone z: {', '.join(batch_params)}.", status_code=400)
+        if len(batch_params) > 1:
+            return func.HttpResponse(f"Podaj tylko jedno z: {', '.join(batch_params)}.", status_code=400)
+        if renames is not None and operation != 'rename':
+            return func.HttpResponse(f"'renames' dotyczy tylko operacji rename, nie {operation}.", status_code=400)
+        if source_names is not None and operation == 'rename':
+            return func.HttpResponse("Dla 'rename' użyj 'renames' albo 'prefix' i 'target_prefix'.", status_code=400)
+    
+    if max_results is not None and (
+        isinstance(max_results, bool) or not isinstance(max_results, int)
+        or not 1 <= max_results <= StorageConfig.LIST_MAX_RESULTS
+    ):
+        return func.HttpResponse(f"'max_results' musi być liczbą od 1 do {StorageConfig.LIST_MAX_RESULTS}.", status_code=400)
+    if continuation_token is not None and not isinstance(continuation_token, str):
+        return func.HttpResponse("'continuation_token' musi być tekstem zwróconym przez poprzednią stronę.", status_code=400)
+    
+    # Operacje tylko w przestrzeni użytkownika (users/<user_id>/...)
+    user_id = extract_user_id(req)
+    logging.info(f"manage_files: user_id={user_id}, operation={operation}")
+    
     try:
-        connect_str = os.environ["AZURE_STORAGE_CONNECTION_STRING"]
-        container_name = os.environ["AZURE_BLOB_CONTAINER_NAME"]
-        
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-        container_client = blob_service_client.get_container_client(container_name)
+        storage = get_storage()
         
         result_message = ""
         
+        def files_with_prefix(exclude_prefix: str = None):
+            # Pliki logiczne pod prefiksem; segmenty, indeksy i logi operacji są wewnętrzne
+            infos, _ = storage.list_user_page(user_id, prefix, visible=DataStore.is_listed_blob)
+            return [
+                info.name for info in infos
+                if not (exclude_prefix and info.name.startswith(exclude_prefix))
+            ]
+        
+        def batch_response(results: list) -> dict:
+            succeeded = sum(1 for result in results if result["status"] == "success")
+            return {
+                "operation": operation,
+                "results": results,
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "message": f"Operacja '{operation}' zakończona: {succeeded} z {len(results)} plików.",
+                "user_id": user_id
+            }
+        
+        def too_many(count: int):
+            if count > MAX_BATCH_ITEMS:
+                return func.HttpResponse(
+                    f"Zbyt wiele plików w jednym wywołaniu ({count}); limit to {MAX_BATCH_ITEMS}.",
+                    status_code=400
+                )
+            return None
+        
         if operation == 'list':
             # Operacja 'list' z filtrem prefix (dla folderów np. 'custom_knowledge/')
-            blob_list = container_client.list_blobs(name_starts_with=prefix)
-            file_names = [blob.name for blob in blob_list]
-            result_message = f"Pomyślnie pobrano listę {len(file_names)} plików z prefiksem '{prefix}'."
+            # Bez 'max_results' zwracana jest cała lista (jak dotychczas)
+            page_size = max_results or (StorageConfig.LIST_MAX_RESULTS if continuation_token else None)
+            infos, next_token = storage.list_user_page(
+                user_id, prefix, page_size, continuation_token, DataStore.is_listed_blob
+            )
+            if include_details:
+                files = [
+                    {
+                        "name": info.name,
+                        "size": info.size,
+                        "last_modified": info.last_modified.isoformat() if info.last_modified else None
+                    }
+                    for info in infos
+                ]
+            else:
+                files = [info.name for info in infos]
+            result_message = f"Pomyślnie pobrano listę {len(files)} plików z prefiksem '{prefix}'."
             response_data = {
                 "operation": "list",
                 "prefix": prefix,
-                "files": file_names,
-                "message": result_message
+                "files": files,
+                "continuation_token": next_token,
+                "has_more": next_token is not None,
+                "message": result_message,
+                "user_id": user_id
             }
         
+        elif operation == 'delete' and batch_params:
+            # Wsadowo: jedno żądanie Blob Batch na 256 plików zamiast wywołania na plik
+            names = source_names if source_names is not None else files_with_prefix()
+            rejected = too_many(len(names))
+            if rejected:
+                return rejected
+            errors = DataStore.delete_many(names, user_id)
+            response_data = batch_response([item_result(name, error) for name, error in zip(names, errors)])
+        
         elif operation == 'delete':
             if not source_name:
                 return func.HttpResponse("Brak 'source_name' dla operacji delete.", status_code=400)
             
-            blob_client = container_client.get_blob_client(source_name)
-            blob_client.delete_blob()
+            # Usuwa również segmenty dużych kolekcji (<nazwa>.segments/)
+            DataStore.delete(source_name, user_id)
             result_message = f"Pomyślnie usunięto plik: {source_name}. Agent utrzymał czystość pamięci."
-            response_data = {"operation": "delete", "source_name": source_name, "message": result_message}
-            
-        elif operation == 'rename':
+            response_data = {"operation": "delete", "source_name": source_name, "message": result_message, "user_id": user_id}
+        
+        elif operation in ('rename', 'archive') and batch_params:
+            # Wsadowo: kopie po stronie serwera (oczekiwane do końca) równolegle, potem usunięcie źródeł
+            if operation == 'archive':
+                names = source_names if source_names is not None else files_with_prefix(archive_prefix)
+                pairs = [(name, f"{archive_prefix}{name}") for name in names]
+            elif renames is not None:
+                pairs = [(item['source_name'], item['target_name']) for item in renames]
+            else:
+                if target_prefix is None:
+                    return func.HttpResponse("Brak 'target_prefix' dla operacji rename z prefiksem.", status_code=400)
+                pairs = [(name, f"{target_prefix}{name[len(prefix):]}") for name in files_with_prefix()]
+            rejected = too_many(len(pairs))
+            if rejected:
+                return rejected
+            errors = DataStore.rename_many(pairs, user_id)
+            response_data = batch_response([
+                item_result(source, error, target) for (source, target), error in zip(pairs, errors)
+            ])
+        
+        elif operation in ('rename', 'archive'):
+            if operation == 'archive' and source_name:
+                target_name = f"{archive_prefix}{source_name}"
             if not source_name or not target_name:
-                return func.HttpResponse("Brak 'source_name' lub 'target_name' dla operacji rename.", status_code=400)
-            
-            # Rename w Blob Storage to 'copy' z nowego źródła + 'delete' starego
-            source_blob_client = container_client.get_blob_client(source_name)
-            target_blob_client = container_client.get_blob_client(target_name)
+                return func.HttpResponse(f"Brak 'source_name' lub 'target_name' dla operacji {operation}.", status_code=400)
             
-            target_blob_client.start_copy_from_url(source_blob_client.url)
-            source_blob_client.delete_blob()
+            # Rename w Blob Storage to 'copy' (oczekiwane do końca) + 'delete' starego, razem z segmentami kolekcji
+            DataStore.rename(source_name, target_name, user_id)
             
             result_message = f"Pomyślnie zmieniono nazwę pliku z '{source_name}' na '{target_name}' (operacja copy+delete). Agent zarchiwizował/zreorganizował wiedzę."
-            response_data = {"operation": "rename", "source_name": source_name, "target_name": target_name, "message": result_message}
-
+            response_data = {"operation": operation, "source_name": source_name, "target_name": target_name, "message": result_message, "user_id": user_id}
+        
         else:
             return func.HttpResponse(f"Nieobsługiwana operacja: {operation}.", status_code=400)
-
+        
         return func.HttpResponse(
             json.dumps(response_data, ensure_ascii=False),
             mimetype="application/json",
             status_code=200
         )
-
+    
+    except ValueError as e:
+        return func.HttpResponse(
+             json.dumps({"error": str(e)}, ensure_ascii=False),
+             mimetype="application/json",
+             status_code=400
+        )
     except Exception as e:
         # Kod błędu 404 często oznacza, że blob nie istnieje (dla delete/rename)
         error_status = 500
-        if "BlobNotFound" in str(e):
+        if isinstance(e, ResourceNotFoundError) or "BlobNotFound" in str(e):
              error_status = 404
-             
+        
         logging.error(f"Błąd w manage_files: {e}")
         return func.HttpResponse(
              json.dumps({"error": f"Wystąpił błąd podczas operacji na Blob Storage (status: {error_status}): {str(e)}"}),
@@ -0,0 +1,119 @@
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError, AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.azure_client import ConcurrencyConflictError
+from shared.data_store import DataStore, NotAnArrayError
+from shared.user_manager import extract_user_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Manage field indexes used by get_filtered_data, with user isolation.
+    
+    Parameters (in JSON body):
+    - target_blob_name (required): Name of the indexed file (e.g., "tasks.json")
+    - operation (required): "create", "drop" or "list"
+    - fields (required for create, optional for drop): Field names (e.g., ["status", "category", "id"]);
+      drop without fields removes all indexes of the file
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Fields indexed after the operation
+    """
+    logging.info('manage_indexes: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    target_blob_name = req_body.get('target_blob_name')
+    operation = req_body.get('operation')
+    fields = req_body.get('fields')
+    
+    if not target_blob_name or operation not in ("create", "drop", "list"):
+        return func.HttpResponse(
+            json.dumps({"error": "Missing 'target_blob_name' or invalid 'operation' (create, drop, list)"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    if isinstance(fields, str):
+        fields = [fields]
+    if (operation == "create" and not fields) or (fields is not None and not isinstance(fields, list)):
+        return func.HttpResponse(
+            json.dumps({"error": "'fields' must be a non-empty list of field names"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"manage_indexes: user_id={user_id}, file_name={target_blob_name}, operation={operation}, fields={fields}")
+    
+    try:
+        if operation == "create":
+            indexed_fields = DataStore.create_index(target_blob_name, fields, user_id)
+        elif operation == "drop":
+            indexed_fields = DataStore.drop_index(target_blob_name, fields, user_id)
+        else:
+            indexed_fields = DataStore.indexed_fields(target_blob_name, user_id)
+        
+        response_data = {
+            "status": "success",
+            "operation": operation,
+            "file": target_blob_name,
+            "indexed_fields": indexed_fields,
+            "user_id": user_id
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response_data, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except ResourceNotFoundError:
+        logging.warning(f"File not found: {target_blob_name} for user {user_id}")
+        return func.HttpResponse(
+            json.dumps({"error": f"File '{target_blob_name}' not found for user {user_id}"}),
+            status_code=404,
+            mimetype="application/json"
+        )
+    except NotAnArrayError as e:
+        return func.HttpResponse(
+            json.dumps({"error": f"Only JSON arrays can be indexed: {str(e)}"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Write conflict in manage_indexes: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Concurrent modification, please retry: {str(e)}"}),
+            status_code=409,
+            mimetype="application/json"
+        )
+    except AzureError as e:
+        logging.error(f"Azure error in manage_indexes: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in manage_indexes: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,66 @@
+"""
+Move blobs written at the container root into a user's namespace.
+
+update_data_entry, remove_data_entry, manage_files and upload_data_or_file
+used to work on root-level blobs ("tasks.json"); they now resolve names under
+users/<user_id>/ like every other endpoint, so root-level files are no longer
+reachable through the API. This moves them (together with the segments,
+operation logs and indexes stored next to them, whose references are
+relative) to users/<user_id>/.
+
+Blobs that already exist in the target namespace are left in place and
+reported. Without --apply, only prints what would be moved.
+
+Usage (against Azurite by default, or AZURE_STORAGE_CONNECTION_STRING):
+    python migrate_root_blobs.py --user-id default --apply
+"""
+import argparse
+import json
+from typing import Dict, List
+
+from shared.config import UserNamespace
+from shared.storage import StorageBackend, get_storage
+
+
+def migrate(storage: StorageBackend, user_id: str, apply: bool = False) -> Dict[str, List[str]]:
+    """
+    Move every blob outside users/ into `user_id`'s namespace.
+
+    Args:
+        storage: Storage backend to migrate
+        user_id: User whose namespace receives the blobs
+        apply: Copy and delete; otherwise only report
+
+    Returns:
+        Dict with the "moved" blob names and the "skipped" ones whose target exists
+    """
+    result: Dict[str, List[str]] = {"moved": [], "skipped": []}
+    root_blobs = [info.name for info in storage.list_blobs() if not UserNamespace.is_user_blob(info.name)]
+    for name in root_blobs:
+        target = storage.blob_path(name, user_id)
+        if storage.exists(name, user_id):
+            result["skipped"].append(name)
+            continue
+        if apply:
+            storage.copy(name, target)
+            storage.delete(name)
+        result["moved"].append(name)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--user-id",
+        default=UserNamespace.DEFAULT_USER_ID,
+        help=f"Namespace receiving the blobs (default: {UserNamespace.DEFAULT_USER_ID})"
+    )
+    parser.add_argument("--apply", action="store_true", help="Move the blobs instead of listing them")
+    args = parser.parse_args()
+
+    result = migrate(get_storage(), args.user_id, args.apply)
+    print(json.dumps({"user_id": args.user_id, "applied": args.apply, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
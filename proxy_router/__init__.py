@@ -61,6 +61,46 @@ ACTION_MAP = {
         "method": "GET",
         "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_interaction_history",
         "code": os.getenv("FUNCTION_CODE_GET_HISTORY", "")
+    },
+    "manage_indexes": {
+        "method": "POST",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/manage_indexes",
+        "code": os.getenv("FUNCTION_CODE_MANAGE_INDEXES", "")
+    },
+    "get_file_stats": {
+        "method": "GET",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_file_stats",
+        "code": os.getenv("FUNCTION_CODE_GET_FILE_STATS", "")
+    },
+    "query_files": {
+        "method": "POST",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/query_files",
+        "code": os.getenv("FUNCTION_CODE_QUERY_FILES", "")
+    },
+    "list_threads": {
+        "method": "GET",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/list_threads",
+        "code": os.getenv("FUNCTION_CODE_LIST_THREADS", "")
+    },
+    "get_search": {
+        "method": "POST",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_search",
+        "code": os.getenv("FUNCTION_CODE_GET_SEARCH", "")
+    },
+    "get_date_range": {
+        "method": "POST",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_date_range",
+        "code": os.getenv("FUNCTION_CODE_GET_DATE_RANGE", "")
+    },
+    "get_due_today": {
+        "method": "GET",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_due_today",
+        "code": os.getenv("FUNCTION_CODE_GET_DUE_TODAY", "")
+    },
+    "get_summary_stats": {
+        "method": "GET",
+        "url": os.getenv("FUNCTION_URL_BASE", "https://agentbackendservice.azurewebsites.net") + "/api/get_summary_stats",
+        "code": os.getenv("FUNCTION_CODE_GET_SUMMARY_STATS", "")
     }
 }
 
@@ -68,12 +108,15 @@ ACTION_MAP = {
 ACTION_SCHEMA = {
     "read_blob_file": ["file_name"],
     "get_filtered_data": ["target_blob_name"],
-    "remove_data_entry": ["target_blob_name", "key_to_find", "value_to_find"],
-    "update_data_entry": ["target_blob_name", "find_key", "find_value", "update_key", "update_value"],
+    # key/value or a bulk "query" is checked by the function itself
+    "remove_data_entry": ["target_blob_name"],
+    "update_data_entry": ["target_blob_name"],
     "upload_data_or_file": ["target_blob_name", "file_content"],
     "add_new_data": ["target_blob_name", "new_entry"],
     "manage_files": ["operation"],
     "save_interaction": ["user_message", "assistant_response"],
+    "manage_indexes": ["target_blob_name", "operation"],
+    "get_search": ["query"],
     # Other actions don't require parameters
 }
 
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import json
+import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError, AzureError
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import AzureConfig
+from shared.data_store import DataStore
+from shared.storage import get_storage
+from shared.user_manager import extract_user_id
+
+
+async def query_file(semaphore: asyncio.Semaphore, file_name: str, user_id: str, match, limit):
+    """Filter one file; returns (file_name, entries, total) or raises"""
+    async with semaphore:
+        entries, total = await asyncio.to_thread(DataStore.read, file_name, user_id, match, limit)
+    if entries is None:
+        raise ResourceNotFoundError(f"Blob '{file_name}' not found")
+    return file_name, entries, total
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Filter all of a user's JSON files (or a chosen subset) in one call.
+    
+    Files are read concurrently, at most AzureConfig.QUERY_MAX_CONCURRENCY at a
+    time, with the same reader as get_filtered_data (segment pruning, field
+    indexes, streaming). A file that cannot be read is reported in "errors"
+    without failing the others.
+    
+    Parameters (in JSON body):
+    - key (optional): Field name to filter by (e.g., "status")
+    - value (optional): Value to match (e.g., "open")
+    - files (optional): File names to query; all .json files of the user when omitted.
+      Internal blobs (segments, indexes) are reported in "errors" and not read
+    - prefix (optional): Only query files whose name starts with this prefix
+    - limit (optional): Maximum number of entries taken from each file
+    - user_id (optional): User ID (extracted from header/query/body)
+    
+    Returns:
+    - Matching entries tagged with their file, per-file counts and per-file errors
+    """
+    logging.info('query_files: Processing HTTP request with user isolation')
+    
+    try:
+        req_body = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid JSON in request body"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    key = req_body.get('key')
+    value = req_body.get('value')
+    files = req_body.get('files')
+    prefix = req_body.get('prefix')
+    limit = req_body.get('limit')
+    
+    if files is not None and (not isinstance(files, list) or not all(isinstance(name, str) for name in files)):
+        return func.HttpResponse(
+            json.dumps({"error": "'files' must be a list of file names"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        return func.HttpResponse(
+            json.dumps({"error": "'limit' must be a positive integer"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    user_id = extract_user_id(req)
+    logging.info(f"query_files: user_id={user_id}, filter={key}={value if key else 'none'}, files={files}, prefix={prefix}")
+    
+    try:
+        errors = []
+        if files is None:
+            # One list call instead of a list_blobs round-trip through the proxy
+            names = await get_storage().alist_user_blobs(user_id, prefix)
+            files = [name for name in names if name.endswith(".json") and not DataStore.is_internal_blob(name)]
+        else:
+            if prefix:
+                files = [name for name in files if name.startswith(prefix)]
+            # Segments, indexes and other internal blobs are not queryable files
+            errors.extend({"file": name, "error": "Not a user file"} for name in files if DataStore.is_internal_blob(name))
+            files = [name for name in files if not DataStore.is_internal_blob(name)]
+        
+        match = (key, value) if key and value else None
+        semaphore = asyncio.Semaphore(AzureConfig.QUERY_MAX_CONCURRENCY)
+        outcomes = await asyncio.gather(
+            *(query_file(semaphore, name, user_id, match, limit) for name in files),
+            return_exceptions=True
+        )
+        
+        data = []
+        per_file = []
+        for name, outcome in zip(files, outcomes):
+            if isinstance(outcome, ResourceNotFoundError):
+                errors.append({"file": name, "error": "File not found"})
+            elif isinstance(outcome, BaseException):
+                logging.warning(f"query_files: could not query {name} for user {user_id}: {str(outcome)}")
+                errors.append({"file": name, "error": str(outcome)})
+            else:
+                _, entries, total = outcome
+                if not isinstance(entries, list):
+                    per_file.append({"file": name, "count": 0, "total": total, "skipped": "not a JSON array"})
+                    continue
+                data.extend({"file": name, "entry": entry} for entry in entries)
+                per_file.append({"file": name, "count": len(entries), "total": total})
+        
+        response = {
+            "status": "partial" if errors else "success",
+            "user_id": user_id,
+            "filter": {"key": key, "value": value} if match else None,
+            "data": data,
+            "count": len(data),
+            "files": per_file,
+            "errors": errors
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response, ensure_ascii=False),
+            mimetype="application/json",
+            status_code=200
+        )
+    
+    except AzureError as e:
+        logging.error(f"Azure error in query_files: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Azure storage error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Unexpected error in query_files: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": f"Server error: {str(e)}"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import azure.functions as func
@@ -8,11 +9,12 @@ import os
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient, AzureBlobError
+from shared.data_store import DataStore
+from shared.storage import get_storage
 from shared.user_manager import extract_user_id, UserValidator
 
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
+async def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     Read blob file with user isolation.
     
@@ -36,11 +38,16 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(f"read_blob_file: user_id={user_id}, file_name={file_name}")
     
     try:
-        # Get blob client with user isolation
-        blob_client = AzureBlobClient.get_blob_client(file_name, user_id)
+        # Download blob data with user isolation (revalidated against the worker cache)
+        blob_data, _ = await get_storage().aread_bytes(file_name, user_id)
+        
+        # Segmented collections are returned as the assembled JSON array
+        if DataStore.is_manifest_bytes(blob_data):
+            document, _ = await asyncio.to_thread(DataStore.read, file_name, user_id)
+            if document is None:
+                raise ResourceNotFoundError(f"Blob '{file_name}' not found")
+            blob_data = json.dumps(document, ensure_ascii=False).encode('utf-8')
         
-        # Download and return blob data
-        blob_data = blob_client.download_blob().readall()
         return func.HttpResponse(blob_data, mimetype="application/json")
 
     except ResourceNotFoundError:
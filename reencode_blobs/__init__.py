@@ -0,0 +1,64 @@
+import logging
+import azure.functions as func
+import sys
+import os
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import StorageConfig
+from shared.storage import BlobInfo, get_storage
+from shared.storage.encoding import CONTENT_TYPES, ENCODINGS, JSON_CONTENT_TYPE, PRETTY, blob_encoding
+
+# Content types of blobs that hold a (possibly compressed) JSON document
+JSON_DOCUMENT_TYPES = {JSON_CONTENT_TYPE, *CONTENT_TYPES.values()}
+
+
+def is_candidate(info: BlobInfo, encoding: str) -> bool:
+    """JSON block blob that is not yet stored in the target encoding"""
+    if info.committed_block_count is not None:
+        return False
+    if not (info.name.endswith(".json") or info.content_type in JSON_DOCUMENT_TYPES):
+        return False
+    return (blob_encoding(info.metadata) or PRETTY) != encoding
+
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Background re-encode of JSON blobs into StorageConfig.JSON_ENCODING.
+    
+    Blobs written before an encoding change keep working (readers decode by
+    metadata), this only converts them so they get the size benefits too.
+    At most StorageConfig.REENCODE_MAX_BLOBS blobs are rewritten per run;
+    the next run continues with whatever is left.
+    """
+    encoding = StorageConfig.JSON_ENCODING
+    if encoding not in ENCODINGS:
+        logging.error(f"reencode_blobs: unknown STORAGE_JSON_ENCODING '{encoding}', nothing to do")
+        return
+    
+    if timer.past_due:
+        logging.info("reencode_blobs: timer is past due")
+    
+    storage = get_storage()
+    rewritten = skipped = failed = 0
+    
+    for info in storage.list_blobs(include_metadata=True):
+        if rewritten >= StorageConfig.REENCODE_MAX_BLOBS:
+            break
+        if not is_candidate(info, encoding):
+            continue
+        
+        try:
+            if storage.reencode_json(info.name, encoding):
+                rewritten += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            failed += 1
+            logging.warning(f"reencode_blobs: could not re-encode {info.name}: {str(e)}")
+    
+    logging.info(
+        f"reencode_blobs: encoding={encoding}, rewritten={rewritten}, "
+        f"skipped={skipped}, failed={failed}"
+    )
@@ -1,9 +1,16 @@
 import logging
 import json
 import azure.functions as func
+import sys
 import os
-from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import ResourceNotFoundError
+
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.azure_client import ConcurrencyConflictError
+from shared.data_store import DataStore, NotAnArrayError
+from shared.query import Query, QueryError
+from shared.user_manager import extract_user_id
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('remove_data_entry: Przetwarzanie żądania HTTP do usunięcia pojedynczego wpisu.')
@@ -12,72 +19,75 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         req_body = req.get_json()
     except ValueError:
         return func.HttpResponse("Proszę przesłać poprawny JSON w ciele żądania.", status_code=400)
-
+    
     target_blob_name = req_body.get('target_blob_name')
     # Key i Value identyfikują wpis do usunięcia (np. key='id', value='T008')
     key_to_find = req_body.get('key_to_find')
     value_to_find = req_body.get('value_to_find')
-
-    if not all([target_blob_name, key_to_find, value_to_find]):
+    # Tryb wsadowy: 'query' ({"where": ...}, jak w get_filtered_data) zamiast key/value
+    query_spec = req_body.get('query')
+    
+    query = None
+    if query_spec is not None:
+        if not target_blob_name:
+            return func.HttpResponse("Brak wymaganego pola 'target_blob_name'.", status_code=400)
+        try:
+            query = Query.compile(query_spec, filter_only=True)
+        except QueryError as e:
+            return func.HttpResponse(f"Nieprawidłowe zapytanie: {e}", status_code=400)
+        if query.where is None:
+            return func.HttpResponse("Zapytanie musi zawierać 'where'; usunięcie całej zawartości pliku nie jest dozwolone.", status_code=400)
+    
+    elif not all([target_blob_name, key_to_find, value_to_find]):
         return func.HttpResponse(
              "Brak wymaganych pól: 'target_blob_name', 'key_to_find' lub 'value_to_find'.",
              status_code=400
         )
-
+    
+    # Plik użytkownika (users/<user_id>/...), jak w pozostałych endpointach
+    user_id = extract_user_id(req)
+    logging.info(f"remove_data_entry: user_id={user_id}, file_name={target_blob_name}")
+    
     try:
-        connect_str = os.environ["AZURE_STORAGE_CONNECTION_STRING"]
-        container_name = os.environ["AZURE_BLOB_CONTAINER_NAME"]
-        
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-        container_client = blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(target_blob_name)
-        
-        # 1. Odczyt istniejących danych
+        # 1-3. Usunięcie wpisów pasujących do kryterium: duże pliki dostają jeden wpis w logu operacji,
+        # pozostałe są odczytywane i zapisywane warunkowo (If-Match) z ponowieniem przy konflikcie
         try:
-            blob_data = blob_client.download_blob()
-            data_str = blob_data.readall().decode('utf-8')
-            data_list = json.loads(data_str)
-        except ResourceNotFoundError:
-            return func.HttpResponse(
-                json.dumps({"status": "error", "message": f"Plik '{target_blob_name}' nie istnieje."}),
-                mimetype="application/json",
-                status_code=404
-            )
-        
-        if not isinstance(data_list, list):
+            if query is not None:
+                deleted_count = DataStore.remove_query(target_blob_name, query, user_id)
+            else:
+                deleted_count = DataStore.remove_where(target_blob_name, key_to_find, value_to_find, user_id)
+        except NotAnArrayError:
             return func.HttpResponse(
                  json.dumps({"status": "error", "message": "Plik docelowy nie jest listą, operacja DELETE niemożliwa."}),
                  mimetype="application/json",
                  status_code=500
             )
-
-        # 2. Usuwanie wpisu
-        
-        # Nowa lista zawierająca tylko te wpisy, które NIE pasują do kryterium
-        initial_count = len(data_list)
         
-        # Używamy list comprehension do utworzenia nowej listy bez pasujących elementów
-        modified_data_list = [
-            entry for entry in data_list 
-            if str(entry.get(key_to_find)) != str(value_to_find)
-        ]
+        if deleted_count is None:
+            return func.HttpResponse(
+                json.dumps({"status": "error", "message": f"Plik '{target_blob_name}' nie istnieje."}),
+                mimetype="application/json",
+                status_code=404
+            )
         
-        deleted_count = initial_count - len(modified_data_list)
-
+        criterion = json.dumps(query_spec, ensure_ascii=False) if query is not None else f"{key_to_find}={value_to_find}"
         if deleted_count == 0:
             return func.HttpResponse(
-                json.dumps({"status": "not_found", "message": f"Nie znaleziono wpisu spełniającego kryterium {key_to_find}={value_to_find} do usunięcia."}),
+                json.dumps({"status": "not_found", "message": f"Nie znaleziono wpisu spełniającego kryterium {criterion} do usunięcia."}),
                 mimetype="application/json",
                 status_code=404
             )
-
-        # 3. Zapis zmodyfikowanej listy (nadpisanie)
-        upload_data = json.dumps(modified_data_list, indent=2, ensure_ascii=False)
-        blob_client.upload_blob(upload_data.encode('utf-8'), overwrite=True)
-
+        
+        if deleted_count == DataStore.UNCOUNTED:
+            # Duży plik: operacja zapisana w logu bez liczenia pasujących wpisów (zbyt wiele segmentów do odczytu)
+            message = f"Zapisano usunięcie wpisów spełniających kryterium {criterion}."
+        else:
+            message = f"Pomyślnie usunięto {deleted_count} wpisów spełniających kryterium {criterion}."
         response_data = {
             "status": "success",
-            "message": f"Pomyślnie usunięto {deleted_count} wpisów spełniających kryterium {key_to_find}={value_to_find}."
+            "message": message,
+            "deleted_count": deleted_count if deleted_count != DataStore.UNCOUNTED else None,
+            "user_id": user_id
         }
         
         return func.HttpResponse(
@@ -85,7 +95,14 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             status_code=200
         )
-
+    
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Konflikt zapisu w remove_data_entry: {e}")
+        return func.HttpResponse(
+             json.dumps({"status": "conflict", "message": f"Plik był równolegle modyfikowany, spróbuj ponownie: {e}"}),
+             mimetype="application/json",
+             status_code=409
+        )
     except Exception as e:
         logging.error(f"Krytyczny błąd w remove_data_entry: {e}")
         return func.HttpResponse(
@@ -1,7 +1,7 @@
 import logging
 import json
 import azure.functions as func
-from azure.core.exceptions import ResourceNotFoundError, AzureError
+from azure.core.exceptions import AzureError
 import sys
 import os
 from datetime import datetime
@@ -9,7 +9,7 @@ from datetime import datetime
 # Add parent directory to path for shared imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.azure_client import AzureBlobClient
+from shared.interaction_log import InteractionLog
 from shared.user_manager import extract_user_id
 
 
@@ -61,25 +61,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info(f"save_interaction: user_id={user_id}, thread_id={thread_id}")
     
     try:
-        # Use a dedicated file for interaction logs
-        target_blob_name = "interaction_logs.json"
-        
-        # Get blob client with user isolation
-        blob_client = AzureBlobClient.get_blob_client(target_blob_name, user_id)
-        
-        # 1. Read existing logs or create empty list
-        try:
-            blob_data = blob_client.download_blob()
-            data_str = blob_data.readall().decode('utf-8')
-            logs = json.loads(data_str)
-        except ResourceNotFoundError:
-            logs = []
-        
-        # 2. Ensure logs is a list
-        if not isinstance(logs, list):
-            logs = []
-        
-        # 3. Create new interaction entry
+        # 1. Create new interaction entry
         now = datetime.utcnow()
         interaction_entry = {
             "interaction_id": f"INT_{now.strftime('%Y%m%d_%H%M%S_%f')}",
@@ -92,19 +74,16 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "metadata": metadata
         }
         
-        # 4. Append new interaction
-        logs.append(interaction_entry)
-        
-        # 5. Write updated logs back
-        upload_data = json.dumps(logs, indent=2, ensure_ascii=False)
-        blob_client.upload_blob(upload_data.encode('utf-8'), overwrite=True)
+        # 2. Append as a single JSONL line to the day's partition (no download of the existing history)
+        target_blob_name = InteractionLog.partition_name(interaction_entry["timestamp"])
+        total_interactions = InteractionLog.append(user_id, interaction_entry)
         
         response_data = {
             "status": "success",
             "message": "Interaction successfully saved",
             "interaction_id": interaction_entry["interaction_id"],
             "timestamp": interaction_entry["timestamp"],
-            "total_interactions": len(logs),
+            "total_interactions": total_interactions,
             "user_id": user_id,
             "storage_location": f"users/{user_id}/{target_blob_name}"
         }
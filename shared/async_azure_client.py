@@ -0,0 +1,259 @@
+"""
+Async Azure Blob Storage client factory with user isolation support
+"""
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+import aiohttp
+from azure.core import MatchConditions
+from azure.core.exceptions import AzureError, ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobProperties, ContentSettings
+from azure.storage.blob.aio import BlobClient, BlobServiceClient, ContainerClient, ExponentialRetry
+
+from .azure_client import client_options
+from .config import AzureConfig, UserNamespace
+
+
+class AsyncAzureBlobClient:
+    """
+    Async counterpart of AzureBlobClient for `async def main` entry points.
+    
+    All clients share one aiohttp session (and therefore one connection pool)
+    per worker event loop, so concurrent downloads reuse warm TLS connections.
+    """
+    
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _session: Optional[aiohttp.ClientSession] = None
+    _service_client: Optional[BlobServiceClient] = None
+    _container_client: Optional[ContainerClient] = None
+    
+    # Closing clients of previous event loops (referenced until done)
+    _closing: Set[asyncio.Task] = set()
+    
+    @classmethod
+    def get_service_client(cls) -> BlobServiceClient:
+        """Get or create the async Blob Service client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if cls._service_client is None or cls._loop is not loop:
+            # aiohttp sessions are tied to the loop that created them
+            cls._close_previous()
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=AzureConfig.ASYNC_POOL_SIZE)
+            )
+            transport = AioHttpTransport(
+                session=cls._session,
+                session_owner=False,
+                connection_timeout=AzureConfig.CONNECTION_TIMEOUT,
+                read_timeout=AzureConfig.READ_TIMEOUT
+            )
+            try:
+                cls._service_client = BlobServiceClient.from_connection_string(
+                    AzureConfig.CONNECTION_STRING,
+                    transport=transport,
+                    **client_options(ExponentialRetry)
+                )
+            except AzureError as e:
+                logging.error(f"Failed to initialize async Blob Service client: {e}")
+                raise
+            cls._container_client = None
+            cls._loop = loop
+            logging.info("Async Azure Blob Service client initialized successfully")
+        
+        return cls._service_client
+    
+    @classmethod
+    def get_container_client(cls) -> ContainerClient:
+        """Get or create the async container client"""
+        service_client = cls.get_service_client()
+        if cls._container_client is None:
+            cls._container_client = service_client.get_container_client(
+                AzureConfig.CONTAINER_NAME
+            )
+        return cls._container_client
+    
+    @classmethod
+    async def get_blob_client(
+        cls,
+        blob_name: str,
+        user_id: Optional[str] = None
+    ) -> BlobClient:
+        """
+        Get async blob client with optional user isolation.
+        
+        Args:
+            blob_name: Name of the blob file (e.g., "tasks.json")
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            Async BlobClient for the specified blob
+        """
+        if user_id:
+            blob_name = UserNamespace.get_user_blob_name(user_id, blob_name)
+        return cls.get_container_client().get_blob_client(blob_name)
+    
+    @classmethod
+    async def list_user_blobs(
+        cls,
+        user_id: str,
+        prefix: Optional[str] = None
+    ) -> List[str]:
+        """
+        List all blobs for a specific user.
+        
+        Args:
+            user_id: User ID to filter by
+            prefix: Optional prefix filter within user namespace
+        
+        Returns:
+            List of blob names (without user prefix, just filenames)
+        """
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        full_prefix = f"{user_namespace_prefix}{prefix or ''}"
+        
+        try:
+            filenames = []
+            async for blob in cls.get_container_client().list_blobs(name_starts_with=full_prefix):
+                filename = blob.name[len(user_namespace_prefix):]
+                if filename:
+                    filenames.append(filename)
+            
+            logging.info(f"Listed {len(filenames)} blobs for user {user_id}")
+            return filenames
+        except AzureError as e:
+            logging.error(f"Failed to list blobs for user {user_id}: {e}")
+            raise
+    
+    @classmethod
+    async def blob_exists(
+        cls,
+        blob_name: str,
+        user_id: Optional[str] = None
+    ) -> bool:
+        """
+        Check if a blob exists.
+        
+        Args:
+            blob_name: Name of the blob
+            user_id: Optional user ID
+        
+        Returns:
+            True if blob exists, False otherwise
+        """
+        try:
+            blob_client = await cls.get_blob_client(blob_name, user_id)
+            await blob_client.get_blob_properties()
+            return True
+        except ResourceNotFoundError:
+            return False
+        except AzureError as e:
+            logging.warning(f"Error checking blob existence: {e}")
+            return False
+    
+    @classmethod
+    async def download_blob(
+        cls,
+        blob_name: str,
+        user_id: Optional[str] = None,
+        etag: Optional[str] = None
+    ) -> Tuple[bytes, BlobProperties]:
+        """
+        Download a blob's content and properties.
+        
+        Args:
+            blob_name: Name of the blob
+            user_id: Optional user ID for namespace isolation
+            etag: If given, only download when the blob no longer has this ETag
+        
+        Returns:
+            Tuple of (content, blob properties)
+        
+        Raises:
+            ResourceNotFoundError: If the blob does not exist
+            ResourceNotModifiedError: If `etag` still matches (HTTP 304)
+        """
+        blob_client = await cls.get_blob_client(blob_name, user_id)
+        if etag is None:
+            downloader = await blob_client.download_blob(max_concurrency=AzureConfig.MAX_CONCURRENCY)
+        else:
+            downloader = await blob_client.download_blob(
+                etag=etag,
+                match_condition=MatchConditions.IfModified,
+                max_concurrency=AzureConfig.MAX_CONCURRENCY
+            )
+        return await downloader.readall(), downloader.properties
+    
+    @classmethod
+    async def upload_bytes(
+        cls,
+        blob_name: str,
+        data: bytes,
+        user_id: Optional[str] = None,
+        content_type: str = "application/json"
+    ) -> str:
+        """
+        Upload (overwrite) a blob.
+        
+        Args:
+            blob_name: Name of the blob
+            data: Content to store
+            user_id: Optional user ID for namespace isolation
+            content_type: MIME type stored with the blob
+        
+        Returns:
+            ETag of the written blob
+        """
+        blob_client = await cls.get_blob_client(blob_name, user_id)
+        result = await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+            max_concurrency=AzureConfig.MAX_CONCURRENCY
+        )
+        return result["etag"]
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared client and connection pool (e.g. on worker shutdown)"""
+        service_client, session = cls._service_client, cls._session
+        cls._service_client = None
+        cls._container_client = None
+        cls._session = None
+        cls._loop = None
+        await cls._close_clients(service_client, session)
+    
+    @classmethod
+    def _close_previous(cls) -> None:
+        """Close the client and session of a previous event loop before they are replaced"""
+        if cls._service_client is None and cls._session is None:
+            return
+        closing = cls._close_clients(cls._service_client, cls._session)
+        previous_loop = cls._loop
+        cls._service_client = None
+        cls._container_client = None
+        cls._session = None
+        
+        if previous_loop is not None and previous_loop.is_running():
+            # Still running in another thread: close where the session lives
+            asyncio.run_coroutine_threadsafe(closing, previous_loop)
+            return
+        # The previous loop has ended; release what is left of its pool from here
+        task = asyncio.get_running_loop().create_task(closing)
+        cls._closing.add(task)
+        task.add_done_callback(cls._closing.discard)
+    
+    @staticmethod
+    async def _close_clients(
+        service_client: Optional[BlobServiceClient],
+        session: Optional[aiohttp.ClientSession]
+    ) -> None:
+        """Close a service client and the session it shares, logging failures"""
+        try:
+            if service_client is not None:
+                await service_client.close()
+            if session is not None:
+                await session.close()
+        except Exception as e:
+            # Connections of a closed event loop cannot be shut down cleanly any more
+            logging.warning(f"Could not close the async Blob Service client: {e}")
@@ -2,34 +2,111 @@
 Azure Blob Storage client factory with user isolation support
 """
 import logging
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from azure.storage.blob import BlobServiceClient, BlobClient, BlobProperties, ContainerClient, ExponentialRetry
 from azure.core.exceptions import AzureError, ResourceNotFoundError
-from typing import Optional, List
+from azure.core.pipeline.transport import RequestsTransport
+from typing import Any, Dict, Optional, List, Tuple, Type
 
 from .config import AzureConfig, UserNamespace
 
 
+def client_options(retry_class: Type[ExponentialRetry] = ExponentialRetry) -> Dict[str, Any]:
+    """
+    Keyword arguments shared by the sync and async service clients.
+    
+    Args:
+        retry_class: ExponentialRetry of azure.storage.blob or of its aio package
+    
+    Returns:
+        Retry policy and download sizes configured in AzureConfig
+    """
+    return {
+        "retry_policy": retry_class(
+            initial_backoff=AzureConfig.RETRY_INITIAL_BACKOFF,
+            increment_base=AzureConfig.RETRY_INCREMENT_BASE,
+            retry_total=AzureConfig.RETRY_TOTAL,
+            random_jitter_range=AzureConfig.RETRY_JITTER
+        ),
+        "max_single_get_size": AzureConfig.MAX_SINGLE_GET_SIZE,
+        "max_chunk_get_size": AzureConfig.MAX_CHUNK_GET_SIZE,
+    }
+
+
 class AzureBlobClient:
-    """Factory for Azure Blob Storage clients with user isolation"""
+    """
+    Factory for Azure Blob Storage clients with user isolation.
+    
+    All clients share one requests session, so every handler thread of a warm
+    worker reuses the same pool of keep-alive TLS connections instead of
+    opening a new one per request.
+    """
     
     _service_client: Optional[BlobServiceClient] = None
     _container_client: Optional[ContainerClient] = None
+    _session: Optional[requests.Session] = None
+    _lock = threading.Lock()
     
     @classmethod
     def get_service_client(cls) -> BlobServiceClient:
         """Get or create Azure Blob Service client (singleton pattern)"""
         if cls._service_client is None:
-            try:
-                cls._service_client = BlobServiceClient.from_connection_string(
-                    AzureConfig.CONNECTION_STRING
-                )
-                logging.info("Azure Blob Service client initialized successfully")
-            except AzureError as e:
-                logging.error(f"Failed to initialize Blob Service client: {e}")
-                raise
+            with cls._lock:
+                if cls._service_client is None:
+                    cls._service_client = cls._create_service_client()
         
         return cls._service_client
     
+    @classmethod
+    def _create_service_client(cls) -> BlobServiceClient:
+        session = requests.Session()
+        # Retries are done by the SDK pipeline; urllib3 must not retry on its own
+        adapter = HTTPAdapter(
+            pool_connections=AzureConfig.POOL_SIZE,
+            pool_maxsize=AzureConfig.POOL_SIZE,
+            max_retries=Retry(total=False, redirect=False, raise_on_status=False)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        transport = RequestsTransport(
+            session=session,
+            session_owner=False,
+            connection_timeout=AzureConfig.CONNECTION_TIMEOUT,
+            read_timeout=AzureConfig.READ_TIMEOUT
+        )
+        try:
+            service_client = BlobServiceClient.from_connection_string(
+                AzureConfig.CONNECTION_STRING,
+                transport=transport,
+                **client_options()
+            )
+        except AzureError as e:
+            session.close()
+            logging.error(f"Failed to initialize Blob Service client: {e}")
+            raise
+        
+        cls._session = session
+        logging.info(
+            f"Azure Blob Service client initialized successfully "
+            f"(pool={AzureConfig.POOL_SIZE}, retries={AzureConfig.RETRY_TOTAL})"
+        )
+        return service_client
+    
+    @classmethod
+    def close(cls) -> None:
+        """Close the shared client and connection pool (e.g. on worker shutdown)"""
+        with cls._lock:
+            if cls._service_client is not None:
+                cls._service_client.close()
+            if cls._session is not None:
+                cls._session.close()
+            cls._service_client = None
+            cls._container_client = None
+            cls._session = None
+    
     @classmethod
     def get_container_client(cls) -> ContainerClient:
         """Get or create container client (singleton pattern)"""
@@ -58,7 +135,7 @@ class AzureBlobClient:
         Args:
             blob_name: Name of the blob file (e.g., "tasks.json")
             user_id: Optional user ID for namespace isolation
-            
+        
         Returns:
             BlobClient for the specified blob
         """
@@ -87,12 +164,12 @@ class AzureBlobClient:
         Args:
             user_id: User ID to filter by
             prefix: Optional prefix filter within user namespace (e.g., "tasks" to find "tasks*.json")
-            
+        
         Returns:
             List of blob names (without user prefix, just filenames)
         """
         container_client = cls.get_container_client()
-        user_namespace_prefix = f"users{UserNamespace.USER_PREFIX_SEPARATOR}{user_id}{UserNamespace.USER_PREFIX_SEPARATOR}"
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
         
         if prefix:
             full_prefix = f"{user_namespace_prefix}{prefix}"
@@ -115,6 +192,45 @@ class AzureBlobClient:
             logging.error(f"Failed to list blobs for user {user_id}: {e}")
             raise
     
+    @classmethod
+    def list_user_blobs_page(
+        cls,
+        user_id: str,
+        prefix: Optional[str] = None,
+        max_results: int = 5000,
+        continuation_token: Optional[str] = None
+    ) -> Tuple[List[BlobProperties], Optional[str]]:
+        """
+        List one page of a user's blobs (one List Blobs request).
+        
+        Args:
+            user_id: User ID to filter by
+            prefix: Optional prefix filter within user namespace
+            max_results: Page size (Azure caps it at 5000)
+            continuation_token: Marker returned with the previous page
+        
+        Returns:
+            Tuple of (blob properties with the user prefix removed from
+            `name`, marker of the next page or None after the last one)
+        """
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        full_prefix = f"{user_namespace_prefix}{prefix or ''}"
+        
+        try:
+            pages = cls.get_container_client().list_blobs(
+                name_starts_with=full_prefix,
+                results_per_page=max_results
+            ).by_page(continuation_token=continuation_token)
+            blobs = []
+            for blob in next(pages, []):
+                blob.name = blob.name[len(user_namespace_prefix):]
+                if blob.name:
+                    blobs.append(blob)
+            return blobs, pages.continuation_token or None
+        except AzureError as e:
+            logging.error(f"Failed to list blobs for user {user_id}: {e}")
+            raise
+    
     @classmethod
     def blob_exists(
         cls,
@@ -127,7 +243,7 @@ class AzureBlobClient:
         Args:
             blob_name: Name of the blob
             user_id: Optional user ID
-            
+        
         Returns:
             True if blob exists, False otherwise
         """
@@ -145,3 +261,8 @@ class AzureBlobClient:
 class AzureBlobError(Exception):
     """Custom exception for Azure Blob operations"""
     pass
+
+
+class ConcurrencyConflictError(AzureBlobError):
+    """Raised when an optimistic-concurrency write keeps losing to other writers"""
+    pass
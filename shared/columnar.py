@@ -0,0 +1,324 @@
+"""
+Columnar views of large collections, for filtering and sorting them with vectorized operations
+"""
+import io
+import json
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from azure.core.exceptions import ResourceNotFoundError
+
+from .config import ColumnarConfig
+from .query import Query
+from .storage import get_storage
+
+
+class _Unsupported(Exception):
+    """A query part the view cannot evaluate; the caller falls back to reading rows"""
+
+
+class ColumnarView:
+    """
+    Column arrays of a collection stored beside it in `<name>.columns.npz`.
+    
+    For each top-level field (the ColumnarConfig.MAX_FIELDS most frequent)
+    the view holds the entries' values as codes into the list of distinct
+    values, and as float64 numbers and datetime64 instants read the way the
+    range operators of Query read them. A query is evaluated over the
+    columns: range comparisons with a number or date bound run over the
+    number and instant arrays, every other comparison is decided once per
+    distinct value and spread over the entries through the codes, and sorts
+    rank the distinct values once and order the matches with
+    `numpy.lexsort`. Only the entries in the result are then read, from the
+    segments holding them.
+    
+    Writers do not maintain views: a view records the collection version
+    (ETag and pending operation count) it was built from, and the first
+    query after a write rebuilds it. A field with more distinct values than
+    MAX_DICTIONARY_BYTES can hold keeps no codes; queries comparing or
+    sorting on it other than by range are answered row by row.
+    """
+    
+    VIEW_SUFFIX = ".columns.npz"
+    CONTENT_TYPE = "application/octet-stream"
+    
+    RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+    
+    # Parsed views by blob path, with the ETag of the blob they were parsed from
+    _views: "OrderedDict[str, Tuple[str, ColumnarView]]" = OrderedDict()
+    _lock = threading.Lock()
+    
+    def __init__(self, header: Dict[str, Any], arrays: Dict[str, Any]):
+        self.header = header
+        self.arrays = arrays
+    
+    @classmethod
+    def index_name(cls, name: str) -> str:
+        """Blob name of a collection's columnar view"""
+        return f"{name}{cls.VIEW_SUFFIX}"
+    
+    @classmethod
+    def is_view_blob(cls, blob_name: str) -> bool:
+        """Check if a blob is a columnar view"""
+        return blob_name.endswith(cls.VIEW_SUFFIX)
+    
+    @property
+    def count(self) -> int:
+        return self.header["count"]
+    
+    def describes(self, etag: str, oplog_ops: int = 0) -> bool:
+        """Whether the view is current for a collection version (and pending operation count)"""
+        return self.header.get("etag") == etag and self.header.get("oplog_ops") == oplog_ops
+    
+    @classmethod
+    def build(cls, entries: List[Any], etag: str, oplog_ops: int = 0) -> "ColumnarView":
+        """
+        Build the view of a collection version.
+        
+        Args:
+            entries: All entries of the collection
+            etag: ETag of the collection version the entries were read from
+            oplog_ops: Pending operations folded into the entries
+        
+        Returns:
+            The view (not stored; see `save`)
+        """
+        count = len(entries)
+        frequency = Counter(key for entry in entries if isinstance(entry, dict) for key in entry)
+        header: Dict[str, Any] = {
+            "etag": etag,
+            "oplog_ops": oplog_ops,
+            "count": count,
+            # Every field of the entries has a column: a missing column means no entry has it
+            "complete": len(frequency) <= ColumnarConfig.MAX_FIELDS,
+            "columns": {}
+        }
+        arrays = {"objects": np.fromiter((isinstance(entry, dict) for entry in entries), dtype=bool, count=count)}
+        
+        for number, (field_name, _) in enumerate(frequency.most_common(ColumnarConfig.MAX_FIELDS)):
+            column: Dict[str, Any] = {"key": f"c{number}"}
+            values = [entry.get(field_name) if isinstance(entry, dict) else None for entry in entries]
+            
+            distinct: Dict[Tuple[str, Any], int] = {}
+            codes = np.fromiter(
+                (distinct.setdefault(cls._value_key(value), len(distinct)) for value in values),
+                dtype=np.int32,
+                count=count
+            )
+            dictionary = [json.loads(key[1]) if key[0] == "json" else key[1] for key in distinct]
+            if len(json.dumps(dictionary)) <= ColumnarConfig.MAX_DICTIONARY_BYTES:
+                column["values"] = dictionary
+                arrays[f"{column['key']}.codes"] = codes
+                # Numbers and instants are read once per distinct value
+                values = dictionary
+            
+            numbers = np.array([cls._float(Query.number(value)) for value in values], dtype=np.float64)
+            instants = np.array([Query.instant(value) for value in values], dtype="datetime64[us]")
+            if "values" in column:
+                numbers, instants = numbers[codes], instants[codes]
+            if not np.isnan(numbers).all():
+                arrays[f"{column['key']}.numbers"] = numbers
+            if not np.isnat(instants).all():
+                arrays[f"{column['key']}.instants"] = instants
+            # Sorting without codes is only possible when numbers are all there is
+            column["numeric"] = all(
+                value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+                for value in values
+            )
+            header["columns"][field_name] = column
+        
+        return cls(header, arrays)
+    
+    def select(self, query: Query, start: int = 0) -> Optional[Tuple[List[int], int, Optional[int]]]:
+        """
+        Evaluate a query's filter and sort over the columns.
+        
+        Args:
+            query: Compiled query (see Query.compile); its `match` is implied by `clause`
+            start: Where the page starts: an offset into the sorted results,
+                or for unsorted queries the entry position to resume at
+        
+        Returns:
+            Tuple of (positions of the page's entries in result order, at
+            most the query's limit, number of matching entries, `start` of
+            the next page or None), or None if the query needs a column the
+            view does not have
+        """
+        try:
+            if query.clause is not None:
+                mask = self._mask(query.clause)
+            else:
+                mask = np.ones(self.count, dtype=bool)
+            positions = np.flatnonzero(mask)
+            
+            if query.order:
+                # lexsort orders by the last key first
+                keys = []
+                for field_name, descending in reversed(query.order):
+                    missing, ordinals = self._sort_columns(field_name)
+                    ordinals = ordinals[positions]
+                    keys.append(-ordinals if descending else ordinals)
+                    keys.append(missing[positions])
+                positions = positions[np.lexsort(keys)]
+        except _Unsupported:
+            return None
+        
+        matched = len(positions)
+        first = start if query.order else int(np.searchsorted(positions, start))
+        end = matched if query.limit is None else min(first + query.limit, matched)
+        next_start = None
+        if end < matched:
+            next_start = end if query.order else int(positions[end])
+        return positions[first:end].tolist(), matched, next_start
+    
+    def _mask(self, clause: Any) -> Any:
+        objects = self.arrays["objects"]
+        if isinstance(clause, list):
+            clause = {"and": clause}
+        
+        if "and" in clause:
+            mask = np.ones(self.count, dtype=bool)
+            for child in clause["and"]:
+                mask &= self._mask(child)
+            return mask
+        if "or" in clause:
+            mask = np.zeros(self.count, dtype=bool)
+            for child in clause["or"]:
+                mask |= self._mask(child)
+            return mask
+        if "not" in clause:
+            return objects & ~self._mask(clause["not"])
+        
+        field_name = clause["field"]
+        op = clause.get("op", "eq")
+        value = clause.get("value")
+        column = self.header["columns"].get(field_name)
+        predicate = Query.compile({"where": clause}).where
+        if column is None:
+            if not self.header["complete"]:
+                raise _Unsupported(field_name)
+            # No entry has the field: the comparison has the same outcome for every object
+            return objects & predicate({})
+        
+        if op in self.RANGE_OPERATORS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return self._compare(self._array(column, "numbers", np.nan), op, value)
+        if op in self.RANGE_OPERATORS and Query.is_iso_date(value):
+            bound = Query.instant(value)
+            if bound is None:
+                raise _Unsupported(field_name)
+            return self._compare(self._array(column, "instants", np.datetime64("NaT")), op, np.datetime64(bound, "us"))
+        
+        if "values" not in column:
+            raise _Unsupported(field_name)
+        outcomes = np.fromiter((predicate({field_name: item}) for item in column["values"]), dtype=bool)
+        return objects & outcomes[self.arrays[f"{column['key']}.codes"]]
+    
+    def _sort_columns(self, field_name: str) -> Tuple[Any, Any]:
+        """Per entry: whether the field is missing, and its rank among the field's values"""
+        column = self.header["columns"].get(field_name)
+        if column is None:
+            if not self.header["complete"]:
+                raise _Unsupported(field_name)
+            return np.ones(self.count, dtype=bool), np.zeros(self.count, dtype=np.int64)
+        
+        if "values" in column:
+            values = column["values"]
+            ranks = [None if value is None else Query.rank(value) for value in values]
+            ordinal = {rank: number for number, rank in enumerate(sorted(set(rank for rank in ranks if rank is not None)))}
+            missing = np.array([rank is None for rank in ranks], dtype=bool)
+            ordinals = np.array([0 if rank is None else ordinal[rank] for rank in ranks], dtype=np.int64)
+            codes = self.arrays[f"{column['key']}.codes"]
+            return missing[codes], ordinals[codes]
+        
+        if column["numeric"]:
+            numbers = self._array(column, "numbers", np.nan)
+            missing = np.isnan(numbers)
+            return missing, np.where(missing, 0.0, numbers)
+        raise _Unsupported(field_name)
+    
+    def _array(self, column: Dict[str, Any], kind: str, fill: Any) -> Any:
+        array = self.arrays.get(f"{column['key']}.{kind}")
+        if array is None:
+            # No entry has a value of this kind
+            return np.full(self.count, fill)
+        return array
+    
+    @staticmethod
+    def _compare(actual: Any, op: str, bound: Any) -> Any:
+        # NaN and NaT compare False, like the None of Query's coercions
+        if op == "gt":
+            return actual > bound
+        if op == "gte":
+            return actual >= bound
+        if op == "lt":
+            return actual < bound
+        return actual <= bound
+    
+    @staticmethod
+    def _value_key(value: Any) -> Tuple[str, Any]:
+        """Hashable key of a JSON value that keeps 1, 1.0, True and "1" apart"""
+        if isinstance(value, (dict, list)):
+            return "json", json.dumps(value, sort_keys=True)
+        return type(value).__name__, value
+    
+    @staticmethod
+    def _float(value: Any) -> float:
+        return np.nan if value is None else float(value)
+    
+    def to_bytes(self) -> bytes:
+        header = np.frombuffer(json.dumps(self.header).encode("utf-8"), dtype=np.uint8)
+        buffer = io.BytesIO()
+        np.savez(buffer, header=header, **self.arrays)
+        return buffer.getvalue()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ColumnarView":
+        with np.load(io.BytesIO(data), allow_pickle=False) as stored:
+            arrays = {key: stored[key] for key in stored.files}
+        header = json.loads(arrays.pop("header").tobytes().decode("utf-8"))
+        return cls(header, arrays)
+    
+    @classmethod
+    def load(cls, name: str, user_id: Optional[str] = None) -> Optional["ColumnarView"]:
+        """Read a collection's stored view (None if there is none or it cannot be parsed)"""
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        try:
+            data, etag = storage.read_bytes(cls.index_name(name), user_id)
+        except ResourceNotFoundError:
+            return None
+        
+        with cls._lock:
+            cached = cls._views.get(path)
+            if cached is not None and cached[0] == etag:
+                cls._views.move_to_end(path)
+                return cached[1]
+        try:
+            view = cls.from_bytes(data)
+        except (ValueError, KeyError, OSError) as e:
+            logging.warning(f"Ignoring unreadable columnar view of '{name}': {str(e)}")
+            return None
+        cls._remember(path, etag, view)
+        return view
+    
+    @classmethod
+    def save(cls, name: str, view: "ColumnarView", user_id: Optional[str] = None) -> None:
+        """Store a view beside its collection; failures only cost a rebuild by the next query"""
+        storage = get_storage()
+        try:
+            etag = storage.write_bytes(cls.index_name(name), view.to_bytes(), user_id, cls.CONTENT_TYPE)
+        except Exception as e:
+            logging.warning(f"Could not store the columnar view of '{name}': {str(e)}")
+            return
+        cls._remember(storage.blob_path(cls.index_name(name), user_id), etag, view)
+    
+    @classmethod
+    def _remember(cls, path: str, etag: str, view: "ColumnarView") -> None:
+        with cls._lock:
+            cls._views[path] = (etag, view)
+            cls._views.move_to_end(path)
+            while len(cls._views) > ColumnarConfig.CACHE_ENTRIES:
+                cls._views.popitem(last=False)
@@ -21,6 +21,183 @@ class AzureConfig:
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
     
     PROXY_URL = os.environ.get("PROXY_URL", "")
+    
+    # Optimistic concurrency for read-modify-write endpoints
+    WRITE_MAX_ATTEMPTS = int(os.environ.get("BLOB_WRITE_MAX_ATTEMPTS", "6"))
+    WRITE_RETRY_BASE_DELAY = float(os.environ.get("BLOB_WRITE_RETRY_BASE_DELAY", "0.05"))
+    WRITE_RETRY_MAX_DELAY = float(os.environ.get("BLOB_WRITE_RETRY_MAX_DELAY", "1.0"))
+    
+    # In-process cache of downloaded blobs, revalidated with If-None-Match
+    BLOB_CACHE_MAX_BYTES = int(os.environ.get("BLOB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    BLOB_CACHE_MAX_ENTRIES = int(os.environ.get("BLOB_CACHE_MAX_ENTRIES", "256"))
+    
+    # Shared aiohttp connection pool for the async client (one per worker)
+    ASYNC_POOL_SIZE = int(os.environ.get("BLOB_ASYNC_POOL_SIZE", "100"))
+    
+    # Keep-alive connections of the sync client, shared by all handler threads
+    POOL_SIZE = int(os.environ.get("BLOB_POOL_SIZE", "32"))
+    
+    # Retries of transient failures: the n-th retry waits INITIAL_BACKOFF +
+    # INCREMENT_BASE**n seconds (+/- JITTER), about 8 s in total; the SDK
+    # default (15 + 3**n) is far longer than an HTTP caller waits
+    RETRY_TOTAL = int(os.environ.get("BLOB_RETRY_TOTAL", "3"))
+    RETRY_INITIAL_BACKOFF = float(os.environ.get("BLOB_RETRY_INITIAL_BACKOFF", "0.25"))
+    RETRY_INCREMENT_BASE = float(os.environ.get("BLOB_RETRY_INCREMENT_BASE", "1.5"))
+    RETRY_JITTER = float(os.environ.get("BLOB_RETRY_JITTER", "0.25"))
+    
+    # Socket timeouts in seconds (SDK default: 300 each)
+    CONNECTION_TIMEOUT = float(os.environ.get("BLOB_CONNECTION_TIMEOUT", "5"))
+    READ_TIMEOUT = float(os.environ.get("BLOB_READ_TIMEOUT", "60"))
+    
+    # Downloads up to MAX_SINGLE_GET_SIZE take one request; larger blobs are
+    # fetched in MAX_CHUNK_GET_SIZE ranges, MAX_CONCURRENCY at a time
+    MAX_SINGLE_GET_SIZE = int(os.environ.get("BLOB_MAX_SINGLE_GET_SIZE", str(8 * 1024 * 1024)))
+    MAX_CHUNK_GET_SIZE = int(os.environ.get("BLOB_MAX_CHUNK_GET_SIZE", str(4 * 1024 * 1024)))
+    MAX_CONCURRENCY = int(os.environ.get("BLOB_MAX_CONCURRENCY", "4"))
+    
+    # Files read at the same time by cross-file queries (query_files)
+    QUERY_MAX_CONCURRENCY = int(os.environ.get("QUERY_MAX_CONCURRENCY", "8"))
+    
+    # Server-side copies run at the same time by batch renames (manage_files)
+    COPY_MAX_CONCURRENCY = int(os.environ.get("BLOB_COPY_MAX_CONCURRENCY", "8"))
+
+
+class StorageConfig:
+    """Storage backend selection"""
+    
+    # "azure" (default), "memory" or "local"
+    BACKEND = os.environ.get("STORAGE_BACKEND", "azure").strip().lower()
+    
+    # Root directory of the "local" backend (one subdirectory per container)
+    LOCAL_ROOT = os.environ.get("STORAGE_LOCAL_ROOT", ".local_storage")
+    
+    # Encoding of JSON documents written by the backend: "pretty" (indented,
+    # the original format and the default), "compact", "gzip" or "zstd"
+    # (needs `zstandard`)
+    JSON_ENCODING = os.environ.get("STORAGE_JSON_ENCODING", "pretty").strip().lower()
+    
+    # Upper bound on blobs rewritten per run of the reencode_blobs timer
+    REENCODE_MAX_BLOBS = int(os.environ.get("STORAGE_REENCODE_MAX_BLOBS", "500"))
+    
+    # Upper bound on users whose thread index is built per run of the build_thread_indexes timer
+    THREAD_INDEX_MAX_USERS = int(os.environ.get("STORAGE_THREAD_INDEX_MAX_USERS", "50"))
+    
+    # JSON arrays stored larger than this are parsed element by element while
+    # streaming instead of being downloaded, cached and parsed as a whole
+    STREAM_MIN_BYTES = int(os.environ.get("STORAGE_STREAM_MIN_BYTES", str(4 * 1024 * 1024)))
+    
+    # Appends to the same blob arriving within this many seconds on one instance
+    # are merged into a single read-modify-write (0 only merges writes that
+    # queue up behind a running commit)
+    COALESCE_WINDOW = float(os.environ.get("STORAGE_COALESCE_WINDOW", "0.005"))
+    COALESCE_MAX_BATCH = int(os.environ.get("STORAGE_COALESCE_MAX_BATCH", "100"))
+    
+    # Listing pages are reused for this many seconds on one instance (0
+    # disables); writes from the same instance drop the affected pages
+    LIST_CACHE_TTL = float(os.environ.get("STORAGE_LIST_CACHE_TTL", "5"))
+    LIST_CACHE_MAX_ENTRIES = int(os.environ.get("STORAGE_LIST_CACHE_MAX_ENTRIES", "256"))
+    
+    # get_filtered_data results are reused on one instance while the file
+    # version is unchanged, within this memory budget (0 disables); writes
+    # from the same instance drop the affected results
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "512"))
+    
+    # Largest page a listing endpoint returns (Azure's List Blobs limit)
+    LIST_MAX_RESULTS = int(os.environ.get("STORAGE_LIST_MAX_RESULTS", "5000"))
+
+
+class SegmentConfig:
+    """Segmented layout for large JSON collections (see shared/data_store.py)"""
+    
+    # Entries per segment blob
+    SEGMENT_SIZE = int(os.environ.get("DATA_SEGMENT_SIZE", "1000"))
+    
+    # Plain files are converted once they grow past this many entries (0 disables)
+    SEGMENT_THRESHOLD = int(os.environ.get("DATA_SEGMENT_THRESHOLD", "5000"))
+
+
+class OplogConfig:
+    """Snapshot + operation log mode for large collections (see shared/data_oplog.py)"""
+    
+    # Collections with at least this many entries record appends, updates and
+    # removals in an operation log instead of rewriting data (0 disables)
+    MIN_ENTRIES = int(os.environ.get("DATA_OPLOG_MIN_ENTRIES", "1000"))
+    
+    # A write that leaves more operations (or log bytes) than this pending
+    # folds them into a new snapshot
+    COMPACT_OPS = int(os.environ.get("DATA_OPLOG_COMPACT_OPS", "200"))
+    COMPACT_BYTES = int(os.environ.get("DATA_OPLOG_COMPACT_BYTES", str(1024 * 1024)))
+    
+    # Logging an operation reports how many entries it changed (and how many
+    # remain) only if working that out reads at most this many segments
+    COUNT_MAX_SEGMENTS = int(os.environ.get("DATA_OPLOG_COUNT_MAX_SEGMENTS", "8"))
+    
+    # Upper bound on collections compacted per run of the compact_oplogs timer
+    COMPACT_MAX_BLOBS = int(os.environ.get("DATA_OPLOG_COMPACT_MAX_BLOBS", "500"))
+
+
+class SearchConfig:
+    """Full-text search indexes (see shared/search_index.py)"""
+    
+    # Keep search indexes current on every collection write; when disabled,
+    # get_search (re)builds them on demand
+    ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    
+    # Hits returned by get_search by default and at most
+    DEFAULT_LIMIT = int(os.environ.get("SEARCH_DEFAULT_LIMIT", "20"))
+    MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", "200"))
+
+
+class DateIndexConfig:
+    """Per-user date index for date-range queries (see shared/date_index.py)"""
+    
+    # Keep the date index current on every collection write; when disabled,
+    # get_date_range and get_due_today bring it up to date on demand
+    ENABLED = os.environ.get("DATE_INDEX_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    
+    # Entry fields holding ISO dates or datetimes, comma-separated
+    FIELDS = [
+        field.strip()
+        for field in os.environ.get("DATE_INDEX_FIELDS", "due,date,created").split(",")
+        if field.strip()
+    ]
+    
+    # Hits returned by get_date_range and get_due_today by default and at most
+    DEFAULT_LIMIT = int(os.environ.get("DATE_RANGE_DEFAULT_LIMIT", "100"))
+    MAX_LIMIT = int(os.environ.get("DATE_RANGE_MAX_LIMIT", "1000"))
+
+
+class SummaryConfig:
+    """Per-user aggregate counts for dashboard overviews (see shared/summary_stats.py)"""
+    
+    # Keep the aggregates current on every collection write; when disabled,
+    # get_summary_stats brings them up to date on demand
+    ENABLED = os.environ.get("SUMMARY_STATS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    
+    # Entry fields whose values are counted, comma-separated
+    GROUP_FIELDS = [
+        field.strip()
+        for field in os.environ.get("SUMMARY_GROUP_FIELDS", "category,status").split(",")
+        if field.strip()
+    ]
+
+
+class ColumnarConfig:
+    """Columnar views of large collections for vectorized queries (see shared/columnar.py)"""
+    
+    # Collections with at least this many entries get a columnar view for
+    # structured queries (0 disables views)
+    MIN_ENTRIES = int(os.environ.get("COLUMNAR_MIN_ENTRIES", "5000"))
+    
+    # Fields with columns per view (the most frequent ones)
+    MAX_FIELDS = int(os.environ.get("COLUMNAR_MAX_FIELDS", "64"))
+    
+    # Largest list of a field's distinct values a view keeps (JSON bytes)
+    MAX_DICTIONARY_BYTES = int(os.environ.get("COLUMNAR_MAX_DICTIONARY_BYTES", str(1024 * 1024)))
+    
+    # Parsed views kept in memory per worker
+    CACHE_ENTRIES = int(os.environ.get("COLUMNAR_CACHE_ENTRIES", "16"))
 
 
 class UserNamespace:
@@ -40,7 +217,7 @@ class UserNamespace:
         Args:
             user_id: Unique user identifier
             file_name: Original blob/file name (e.g., "tasks.json", "ideas.json")
-            
+        
         Returns:
             Namespaced blob name: "users/{user_id}/{file_name}"
         """
@@ -52,6 +229,19 @@ class UserNamespace:
         
         return f"users{UserNamespace.USER_PREFIX_SEPARATOR}{user_id}{UserNamespace.USER_PREFIX_SEPARATOR}{file_name}"
     
+    @staticmethod
+    def get_user_prefix(user_id: str) -> str:
+        """
+        Blob name prefix of a user's namespace, e.g. "users/user_123/".
+        
+        Args:
+            user_id: Unique user identifier
+        
+        Returns:
+            Namespace prefix including the trailing separator
+        """
+        return UserNamespace.get_user_blob_name(user_id, "")
+    
     @staticmethod
     def extract_user_id_from_blob_name(blob_name: str) -> Optional[str]:
         """
@@ -61,7 +251,7 @@ class UserNamespace:
         
         Args:
             blob_name: Full namespaced blob name
-            
+        
         Returns:
             User ID or None if not in expected format
         """
@@ -0,0 +1,278 @@
+"""
+Opt-in hash indexes (field value -> entry positions) for JSON collections
+"""
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .storage import get_storage
+
+
+@dataclass
+class ChangeSet:
+    """
+    Entries changed by one committed write to a collection.
+    
+    Positions of `updated` and `removed` refer to the collection before the
+    write; `appended` entries were added at the end. `oplog` names the
+    operation log of the new version, if it has one. Updates and removals
+    recorded in an operation log carry None positions (see
+    DataStore._record).
+    """
+    previous_etag: Optional[str]
+    etag: str
+    count: int
+    appended: List[Any] = field(default_factory=list)
+    updated: List[Tuple[Optional[int], Any, Any]] = field(default_factory=list)
+    removed: List[Tuple[Optional[int], Any]] = field(default_factory=list)
+    oplog: Optional[str] = None
+
+
+class FieldIndex:
+    """
+    Per-collection hash indexes stored beside the data in `<name>.fieldindex.json`.
+    
+    For every indexed field the blob maps `str(entry.get(field))` (the value
+    get_filtered_data compares against) to the sorted positions of matching
+    entries, plus the ETag of the collection version it describes. Writers
+    apply a ChangeSet after each commit; the delta is only applied if the index
+    still describes the version the write started from, otherwise it is left
+    stale and readers fall back to a scan and rebuild it.
+    """
+    
+    INDEX_SUFFIX = ".fieldindex.json"
+    
+    # Collections found without an index are remembered briefly so writes skip
+    # the lookup; an index created meanwhile on another worker just goes stale
+    MISSING_TTL = 30.0
+    _missing_until: Dict[str, float] = {}
+    
+    @classmethod
+    def index_name(cls, name: str) -> str:
+        """Blob name of a collection's index"""
+        return f"{name}{cls.INDEX_SUFFIX}"
+    
+    @classmethod
+    def is_index_blob(cls, blob_name: str) -> bool:
+        """Check if a blob is a collection index"""
+        return blob_name.endswith(cls.INDEX_SUFFIX)
+    
+    @staticmethod
+    def value_key(entry: Any, field_name: str) -> Optional[str]:
+        """Bucket of an entry for a field; None for entries that are not objects"""
+        if not isinstance(entry, dict):
+            return None
+        return str(entry.get(field_name))
+    
+    @classmethod
+    def build(cls, fields: Iterable[str], entries: Iterable[Any]) -> Dict[str, Dict[str, List[int]]]:
+        """Build the buckets of the given fields in one pass over the entries"""
+        index: Dict[str, Dict[str, List[int]]] = {field_name: {} for field_name in fields}
+        for position, entry in enumerate(entries):
+            cls.add_entry(index, position, entry)
+        return index
+    
+    @classmethod
+    def add_entry(cls, index: Dict[str, Dict[str, List[int]]], position: int, entry: Any) -> None:
+        """Add the entry at `position` to buckets being built (positions must increase)"""
+        for field_name, buckets in index.items():
+            key = cls.value_key(entry, field_name)
+            if key is not None:
+                buckets.setdefault(key, []).append(position)
+    
+    @classmethod
+    def load(cls, name: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Read a collection's index document (None if the collection has none)"""
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        if cls._missing_until.get(path, 0.0) > time.monotonic():
+            return None
+        document, _ = storage.read_json(path)
+        if document is None:
+            cls._missing_until[path] = time.monotonic() + cls.MISSING_TTL
+        return document
+    
+    @staticmethod
+    def positions(index: Dict[str, Any], field_name: str, value: Any) -> Optional[List[int]]:
+        """Positions of entries whose field equals `value` as a string; None if not indexed"""
+        buckets = index["fields"].get(field_name)
+        if buckets is None:
+            return None
+        return buckets.get(str(value), [])
+    
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        fields: List[str],
+        entries: List[Any],
+        etag: str,
+        user_id: Optional[str] = None
+    ) -> List[str]:
+        """
+        Index additional fields of a collection.
+        
+        Args:
+            name: Logical blob name of the collection
+            fields: Field names to index
+            entries: Current entries of the collection
+            etag: ETag of the collection version `entries` was read from
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            All indexed fields after the change
+        """
+        def add_fields(index):
+            indexed = set(fields) | set(index["fields"] if index else ())
+            if index and index.get("source_etag") == etag:
+                built = dict(index["fields"])
+                built.update(cls.build(indexed - set(built), entries))
+            else:
+                # Fields indexed earlier are rebuilt along with the new ones
+                built = cls.build(indexed, entries)
+            return {"source_etag": etag, "count": len(entries), "fields": built}
+        
+        storage = get_storage()
+        cls._missing_until.pop(storage.blob_path(cls.index_name(name), user_id), None)
+        index = storage.update_json(cls.index_name(name), add_fields, user_id, default_factory=lambda: None)
+        return sorted(index["fields"])
+    
+    @classmethod
+    def drop(cls, name: str, fields: Optional[List[str]] = None, user_id: Optional[str] = None) -> List[str]:
+        """
+        Stop indexing some (or all) fields of a collection.
+        
+        Returns:
+            Fields that remain indexed
+        """
+        storage = get_storage()
+        
+        def remove_fields(index):
+            if index is None:
+                return None
+            remaining = {} if fields is None else {
+                field_name: buckets for field_name, buckets in index["fields"].items()
+                if field_name not in fields
+            }
+            return {**index, "fields": remaining}
+        
+        index = storage.update_json(cls.index_name(name), remove_fields, user_id, default_factory=lambda: None)
+        if index is not None and not index["fields"]:
+            storage.delete_blob(cls.index_name(name), user_id)
+            return []
+        return sorted(index["fields"]) if index else []
+    
+    @classmethod
+    def rebuild(
+        cls,
+        name: str,
+        built: Dict[str, Dict[str, List[int]]],
+        count: int,
+        etag: str,
+        user_id: Optional[str] = None
+    ) -> None:
+        """
+        Bring a stale index up to date with buckets built from a full read.
+        
+        Args:
+            name: Logical blob name of the collection
+            built: Buckets of (at least) every indexed field, see `build`
+            count: Number of entries the buckets were built from
+            etag: ETag of the collection version that was read
+            user_id: Optional user ID for namespace isolation
+        """
+        def replace(index):
+            if index is None or index.get("source_etag") == etag:
+                return None
+            if not set(index["fields"]) <= set(built):
+                # A field was indexed meanwhile; leave it to the next reader
+                return None
+            return {
+                "source_etag": etag,
+                "count": count,
+                "fields": {field_name: built[field_name] for field_name in index["fields"]},
+            }
+        
+        try:
+            get_storage().update_json(cls.index_name(name), replace, user_id, default_factory=lambda: None)
+        except Exception as e:
+            logging.warning(f"Could not rebuild field index of '{name}': {str(e)}")
+    
+    @classmethod
+    def apply(cls, name: str, changes: ChangeSet, user_id: Optional[str] = None) -> None:
+        """Apply a committed ChangeSet to the collection's index, if it has one"""
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        if cls._missing_until.get(path, 0.0) > time.monotonic():
+            return
+        
+        def apply_changes(index):
+            if index is None:
+                cls._missing_until[path] = time.monotonic() + cls.MISSING_TTL
+                return None
+            if index.get("source_etag") != changes.previous_etag:
+                # The index already lags behind; readers will rebuild it
+                return None
+            return {
+                "source_etag": changes.etag,
+                "count": changes.count,
+                "fields": {
+                    field_name: cls._apply_to_buckets(field_name, buckets, changes)
+                    for field_name, buckets in index["fields"].items()
+                },
+            }
+        
+        try:
+            storage.update_json(path, apply_changes, default_factory=lambda: None)
+        except Exception as e:
+            # The data write already succeeded; a stale index is repaired on the next read
+            logging.warning(f"Could not update field index of '{name}': {str(e)}")
+    
+    @classmethod
+    def _apply_to_buckets(
+        cls,
+        field_name: str,
+        buckets: Dict[str, List[int]],
+        changes: ChangeSet
+    ) -> Dict[str, List[int]]:
+        # Copy on write: the index document may be the shared cached copy
+        buckets = dict(buckets)
+        touched = set()
+        
+        def bucket(key: str) -> List[int]:
+            if key not in touched:
+                buckets[key] = list(buckets.get(key, []))
+                touched.add(key)
+            return buckets[key]
+        
+        for position, old_entry, new_entry in changes.updated:
+            old_key = cls.value_key(old_entry, field_name)
+            new_key = cls.value_key(new_entry, field_name)
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                bucket(old_key).remove(position)
+            if new_key is not None:
+                bisect.insort(bucket(new_key), position)
+        
+        removed = sorted(position for position, _ in changes.removed)
+        if removed:
+            for position, old_entry in changes.removed:
+                old_key = cls.value_key(old_entry, field_name)
+                if old_key is not None:
+                    bucket(old_key).remove(position)
+            # Entries after a removed one move up
+            buckets = {
+                key: [position - bisect.bisect_left(removed, position) for position in positions]
+                for key, positions in buckets.items()
+            }
+        
+        start = changes.count - len(changes.appended)
+        for offset, entry in enumerate(changes.appended):
+            key = cls.value_key(entry, field_name)
+            if key is not None:
+                bucket(key).append(start + offset)
+        
+        return {key: positions for key, positions in buckets.items() if positions}
@@ -0,0 +1,266 @@
+"""
+Operation records for collections kept as a snapshot plus an operation log
+"""
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class OpLog:
+    """
+    Append, update and remove operations stored one per line in an append blob.
+    
+    Operations describe the change rather than its result ("set status=done
+    on the first entry whose id is T002"), so replaying the log in order onto
+    the snapshot it belongs to always gives the same collection, whichever
+    worker appended each record.
+    """
+    
+    LOG_SUFFIX = ".oplog"
+    CONTENT_TYPE = "application/x-ndjson"
+    
+    # Append blocks are limited to 4 MiB; larger operations are written directly
+    MAX_BLOCK_BYTES = 4 * 1024 * 1024
+    
+    @classmethod
+    def is_log_blob(cls, blob_name: str) -> bool:
+        """Check if a blob is the operation log of a collection"""
+        return f"{cls.LOG_SUFFIX}/" in blob_name
+    
+    @staticmethod
+    def add(entries: List[Any]) -> Dict[str, Any]:
+        """Operation appending entries at the end"""
+        return {"op": "add", "entries": list(entries)}
+    
+    @staticmethod
+    def update(
+        key: str,
+        value: Any,
+        changes: Dict[str, Any],
+        first_only: bool = False,
+        ignore_case: bool = False
+    ) -> Dict[str, Any]:
+        """Operation setting fields on the entries whose `key` equals `value` as a string"""
+        return {
+            "op": "update",
+            "key": key,
+            "value": str(value),
+            "set": dict(changes),
+            "first": first_only,
+            "ignore_case": ignore_case,
+        }
+    
+    @staticmethod
+    def remove(key: str, value: Any, ignore_case: bool = False) -> Dict[str, Any]:
+        """Operation dropping the entries whose `key` equals `value` as a string"""
+        return {"op": "remove", "key": key, "value": str(value), "ignore_case": ignore_case}
+    
+    @staticmethod
+    def matches(entry: Any, op: Dict[str, Any]) -> bool:
+        """Whether an update or remove operation applies to an entry"""
+        if not isinstance(entry, dict):
+            return False
+        actual = str(entry.get(op["key"]))
+        if op.get("ignore_case"):
+            return actual.lower() == op["value"].lower()
+        return actual == op["value"]
+    
+    @staticmethod
+    def encode(op: Dict[str, Any]) -> bytes:
+        """Serialize one operation as a single JSONL line"""
+        return (json.dumps(op, ensure_ascii=False) + "\n").encode('utf-8')
+    
+    @staticmethod
+    def decode(data: bytes) -> List[Dict[str, Any]]:
+        """Operations of a log, in append order"""
+        return [json.loads(line) for line in data.split(b"\n") if line.strip()]
+
+
+class Fold:
+    """
+    A segmented snapshot with operations applied on top of it.
+    
+    Segments are only loaded when an operation or a filter could touch them:
+    an operation on key=value reads the segments whose bounds admit the value
+    (plus those already loaded, which may have been changed by earlier
+    operations). Untouched segments are still exactly as the snapshot
+    describes them, so their bounds and counts stay valid.
+    """
+    
+    def __init__(
+        self,
+        segments: List[Dict[str, Any]],
+        load_segment: Callable[[Dict[str, Any]], List[Any]],
+        may_contain: Callable[[Dict[str, Any], str, Any], bool]
+    ):
+        self.segments = segments
+        self._load_segment = load_segment
+        self._may_contain = may_contain
+        self._loaded: Dict[int, List[Any]] = {}
+        self._changed = set()
+        self.tail: List[Any] = []
+    
+    @property
+    def count(self) -> int:
+        """Number of entries after the applied operations"""
+        return sum(self._size(position) for position in range(len(self.segments))) + len(self.tail)
+    
+    def apply(self, op: Dict[str, Any], diff: Optional[List[Tuple[Any, Any]]] = None) -> int:
+        """
+        Apply one operation.
+        
+        Args:
+            op: Operation record (see OpLog)
+            diff: Optional list receiving `(old entry, new entry)` for every
+                  updated entry and `(old entry, None)` for every removed one
+        
+        Returns:
+            Number of entries added, updated or removed
+        """
+        if op["op"] == "add":
+            self.tail.extend(op["entries"])
+            return len(op["entries"])
+        
+        changed = 0
+        for position, entries in self._candidates(op["key"], op["value"]):
+            if op["op"] == "remove":
+                kept = [entry for entry in entries if not OpLog.matches(entry, op)]
+                hits = len(entries) - len(kept)
+                if diff is not None and hits:
+                    diff.extend((entry, None) for entry in entries if OpLog.matches(entry, op))
+                entries[:] = kept
+            else:
+                hits = 0
+                for offset, entry in enumerate(entries):
+                    if OpLog.matches(entry, op):
+                        # Copy on write: snapshot entries may be shared cached objects
+                        entries[offset] = {**entry, **op["set"]}
+                        if diff is not None:
+                            diff.append((entry, entries[offset]))
+                        hits += 1
+                        if op.get("first"):
+                            break
+            if hits:
+                changed += hits
+                if position is not None:
+                    self._changed.add(position)
+                if op.get("first"):
+                    break
+        return changed
+    
+    def loads(self, ops: List[Dict[str, Any]]) -> int:
+        """Number of snapshot segments applying `ops` would read (appends read none)"""
+        positions = set(self._loaded)
+        for op in ops:
+            if op["op"] != "add":
+                positions.update(
+                    position for position, segment in enumerate(self.segments)
+                    if self._may_contain(segment, op["key"], op["value"])
+                )
+        return len(positions)
+    
+    def parts(self) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[List[Any]]]]:
+        """
+        The collection without reading anything more: (descriptor, None) for
+        segments still as the snapshot describes them, (descriptor, entries)
+        for loaded ones, then (None, appended entries).
+        """
+        for position, segment in enumerate(self.segments):
+            yield segment, self._loaded.get(position)
+        yield None, self.tail
+    
+    def entries(self) -> List[Any]:
+        """All entries, in order"""
+        result: List[Any] = []
+        for position in range(len(self.segments)):
+            result.extend(self._load(position))
+        result.extend(self.tail)
+        return result
+    
+    def entries_at(self, positions: List[int]) -> List[Any]:
+        """Entries at sorted positions, loading only the segments that hold them"""
+        result: List[Any] = []
+        index = 0
+        offset = 0
+        for position in range(len(self.segments)):
+            size = self._size(position)
+            if index < len(positions) and positions[index] < offset + size:
+                entries = self._load(position)
+                while index < len(positions) and positions[index] < offset + size:
+                    result.append(entries[positions[index] - offset])
+                    index += 1
+            offset += size
+        result.extend(self.tail[wanted - offset] for wanted in positions[index:])
+        return result
+    
+    def select(self, match: Optional[Tuple[str, Any]], predicate: Callable[..., bool], limit: Optional[int]) -> List[Any]:
+        """Entries for which `predicate(entry, *match)` holds (all without a match), at most `limit`"""
+        result: List[Any] = []
+        candidates = self._candidates(*match) if match else self._all()
+        for _, entries in candidates:
+            for entry in entries:
+                if limit is not None and len(result) >= limit:
+                    return result
+                if not match or predicate(entry, *match):
+                    result.append(entry)
+        return result
+    
+    def compacted(
+        self,
+        segment_size: int,
+        write_segment: Callable[[List[Any]], Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Segments of a new snapshot: changed segments are rewritten and the
+        appended entries fill up the last segment, then new ones.
+        
+        Args:
+            segment_size: Entries per segment
+            write_segment: Stores a list of entries, returns its segment descriptor
+        
+        Returns:
+            Tuple of (segment descriptors, refs of the segments they supersede)
+        """
+        pending = list(self.tail)
+        last = len(self.segments) - 1
+        if pending and last >= 0 and self._size(last) < segment_size:
+            self._load(last)
+            self._changed.add(last)
+        
+        segments: List[Dict[str, Any]] = []
+        replaced: List[str] = []
+        for position, segment in enumerate(self.segments):
+            if position not in self._changed:
+                segments.append(segment)
+                continue
+            replaced.append(segment["blob"])
+            entries = self._loaded[position]
+            if position == last:
+                entries, pending = entries + pending, []
+            for start in range(0, len(entries), segment_size):
+                segments.append(write_segment(entries[start:start + segment_size]))
+        
+        for start in range(0, len(pending), segment_size):
+            segments.append(write_segment(pending[start:start + segment_size]))
+        return segments, replaced
+    
+    def _size(self, position: int) -> int:
+        if position in self._loaded:
+            return len(self._loaded[position])
+        return self.segments[position]["count"]
+    
+    def _load(self, position: int) -> List[Any]:
+        if position not in self._loaded:
+            self._loaded[position] = list(self._load_segment(self.segments[position]))
+        return self._loaded[position]
+    
+    def _all(self) -> Iterator[Tuple[Optional[int], List[Any]]]:
+        for position in range(len(self.segments)):
+            yield position, self._load(position)
+        yield None, self.tail
+    
+    def _candidates(self, key: str, value: Any) -> Iterator[Tuple[Optional[int], List[Any]]]:
+        """Entry lists that may hold key=value: bounds-admitted or already loaded segments, then the tail"""
+        for position, segment in enumerate(self.segments):
+            if position in self._loaded or self._may_contain(segment, key, value):
+                yield position, self._load(position)
+        yield None, self.tail
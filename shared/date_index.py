@@ -0,0 +1,167 @@
+"""
+Sorted per-user index of the date fields of all collections, for date-range queries
+"""
+import bisect
+import heapq
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import DateIndexConfig
+from .data_index import ChangeSet
+from .query import Query
+from .search_index import SearchIndex
+from .user_index import UserIndex
+
+
+@dataclass
+class DateRangeResult:
+    """Outcome of a date-range query over a user's collections"""
+    hits: List[Dict[str, Any]]
+    matched: int
+    files: int
+    rebuilt: List[str] = field(default_factory=list)
+    errors: List[Dict[str, str]] = field(default_factory=list)
+
+
+class DateIndex(UserIndex):
+    """
+    Date index of a user's collections in `__indexes__/dates.json`.
+    
+    Each section maps every indexed field (DateIndexConfig.FIELDS) to rows
+    `[date key, position, id]` sorted by key, so a range query is two binary
+    searches per file and a merge of the slices. Date keys are "YYYY-MM-DD"
+    for dates and "YYYY-MM-DDTHH:MM:SS" in UTC for datetimes: they sort as
+    strings, and a day's date-only key sorts before its datetimes. Values
+    that are not ISO dates are not indexed.
+    """
+    
+    BLOB_NAME = "dates.json"
+    
+    # Sorts after every key starting with the bound, making an end date inclusive
+    _END = "\uffff"
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        return DateIndexConfig.ENABLED
+    
+    @classmethod
+    def signature(cls) -> Any:
+        return list(DateIndexConfig.FIELDS)
+    
+    @staticmethod
+    def date_key(value: Any) -> Optional[str]:
+        """Sortable key of an ISO date or datetime string; None for anything else"""
+        if not isinstance(value, str) or not Query.is_iso_date(value):
+            return None
+        instant = Query.instant(value)
+        if instant is None:
+            return None
+        if len(value) == 10:
+            return instant.date().isoformat()
+        return instant.isoformat(timespec="seconds")
+    
+    @classmethod
+    def entry_rows(cls, position: int, entry: Any) -> Dict[str, list]:
+        """Row of each indexed field the entry has a date in"""
+        if not isinstance(entry, dict):
+            return {}
+        rows = {}
+        for field_name in DateIndexConfig.FIELDS:
+            key = cls.date_key(entry.get(field_name))
+            if key is not None:
+                rows[field_name] = [key, position, SearchIndex.entry_id(entry)]
+        return rows
+    
+    @classmethod
+    def build_section(cls, entries: List[Any]) -> Dict[str, Any]:
+        fields: Dict[str, List[list]] = {}
+        for position, entry in enumerate(entries):
+            for field_name, row in cls.entry_rows(position, entry).items():
+                fields.setdefault(field_name, []).append(row)
+        for rows in fields.values():
+            rows.sort(key=lambda row: (row[0], row[1]))
+        return {"fields": fields}
+    
+    @classmethod
+    def apply_changes(cls, section: Dict[str, Any], changes: ChangeSet) -> Optional[Dict[str, Any]]:
+        # Copy on write: the section may belong to the shared cached document
+        fields = {field_name: list(rows) for field_name, rows in section.get("fields", {}).items()}
+        
+        def insert(position: int, entry: Any) -> None:
+            for field_name, row in cls.entry_rows(position, entry).items():
+                rows = fields.setdefault(field_name, [])
+                rows.insert(bisect.bisect_left(rows, row[:2]), row)
+        
+        def drop(positions: set) -> None:
+            for field_name, rows in fields.items():
+                rows[:] = [row for row in rows if row[1] not in positions]
+        
+        if changes.updated:
+            drop({position for position, _, _ in changes.updated})
+            for position, _, new_entry in changes.updated:
+                insert(position, new_entry)
+        
+        removed = sorted(position for position, _ in changes.removed)
+        if removed:
+            drop(set(removed))
+            # Entries after a removed one move up
+            fields = {
+                field_name: [[key, position - bisect.bisect_left(removed, position), entry_id] for key, position, entry_id in rows]
+                for field_name, rows in fields.items()
+            }
+        
+        start = changes.count - len(changes.appended)
+        for offset, entry in enumerate(changes.appended):
+            insert(start + offset, entry)
+        
+        return {"fields": {field_name: rows for field_name, rows in fields.items() if rows}}
+    
+    @classmethod
+    def range(
+        cls,
+        sections: Dict[str, Dict[str, Any]],
+        start: Optional[str],
+        end: Optional[str],
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Entries with a date between two bounds, across several collections.
+        
+        Args:
+            sections: Section per logical file name
+            start: First date or datetime to include (None: no lower bound)
+            end: Last date or datetime to include; a date includes the whole day (None: no upper bound)
+            fields: Date fields to look at (default: all indexed fields); an
+                entry with several of them in range is returned once per field
+            limit: Maximum number of hits
+        
+        Returns:
+            Tuple of (hits with file, field, date, position and id in date
+            order, number of hits before the limit)
+        """
+        low = [cls.date_key(start)] if start is not None else None
+        high = [cls.date_key(end) + cls._END] if end is not None else None
+        
+        slices = []
+        matched = 0
+        for file_name in sorted(sections):
+            for field_name, rows in sections[file_name].get("fields", {}).items():
+                if fields is not None and field_name not in fields:
+                    continue
+                first = bisect.bisect_left(rows, low) if low else 0
+                last = bisect.bisect_left(rows, high) if high else len(rows)
+                if first < last:
+                    matched += last - first
+                    slices.append([
+                        (key, file_name, position, field_name, entry_id)
+                        for key, position, entry_id in rows[first:last]
+                    ])
+        
+        merged = heapq.merge(*slices, key=lambda row: row[:4])
+        hits = []
+        for key, file_name, position, field_name, entry_id in merged:
+            if limit is not None and len(hits) >= limit:
+                break
+            hits.append({"file": file_name, "field": field_name, "date": key, "position": position, "id": entry_id})
+        return hits, matched
@@ -0,0 +1,122 @@
+"""
+Entry and per-category counts of JSON collections kept in blob metadata
+"""
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from .storage import BlobInfo
+
+
+class FileStats:
+    """
+    Summary statistics written into a collection's blob metadata on every write.
+    
+    get_file_stats answers from a properties (or list) call instead of
+    downloading and parsing the file. The byte size is the blob's own size,
+    plus the `segment_bytes` recorded for segmented collections, whose entries
+    live in separate segment blobs. Metadata values must be ASCII, so category
+    counts are stored as escaped JSON.
+    """
+    
+    ENTRY_COUNT_KEY = "entry_count"
+    CATEGORY_COUNTS_KEY = "category_counts"
+    CATEGORIES_PARTIAL_KEY = "category_counts_partial"
+    SEGMENT_BYTES_KEY = "segment_bytes"
+    OPLOG_KEY = "oplog"
+    
+    # Field whose values are counted per category
+    CATEGORY_FIELD = "category"
+    
+    # Blob metadata is limited to 8 KiB in total; the rarest categories are left out beyond this
+    MAX_CATEGORY_BYTES = 4096
+    
+    @classmethod
+    def category_counts(cls, entries: Iterable[Any]) -> Dict[str, int]:
+        """Number of entries per `category` value (entries without one are not counted)"""
+        return dict(Counter(
+            str(entry[cls.CATEGORY_FIELD])
+            for entry in entries
+            if isinstance(entry, dict) and cls.CATEGORY_FIELD in entry
+        ))
+    
+    @classmethod
+    def metadata(
+        cls,
+        entry_count: Optional[int],
+        category_counts: Optional[Dict[str, int]] = None,
+        segment_bytes: Optional[int] = None,
+        oplog: bool = False
+    ) -> Dict[str, str]:
+        """
+        Blob metadata recording the given statistics.
+        
+        Args:
+            entry_count: Number of entries (None for documents that are not arrays)
+            category_counts: Entries per category, if known
+            segment_bytes: Stored size of the segments of a segmented collection
+            oplog: The collection is in snapshot + operation log mode, so the
+                statistics leave out operations logged after this write
+        
+        Returns:
+            Metadata dict to merge into the blob's metadata
+        """
+        metadata: Dict[str, str] = {}
+        if entry_count is not None:
+            metadata[cls.ENTRY_COUNT_KEY] = str(entry_count)
+        if segment_bytes is not None:
+            metadata[cls.SEGMENT_BYTES_KEY] = str(segment_bytes)
+        if oplog:
+            metadata[cls.OPLOG_KEY] = "true"
+        if category_counts is not None:
+            counts = sorted(category_counts.items(), key=lambda item: (-item[1], item[0]))
+            encoded = json.dumps(dict(counts), separators=(",", ":"))
+            if len(encoded) > cls.MAX_CATEGORY_BYTES:
+                while len(encoded) > cls.MAX_CATEGORY_BYTES:
+                    counts = counts[:len(counts) * cls.MAX_CATEGORY_BYTES // len(encoded)]
+                    encoded = json.dumps(dict(counts), separators=(",", ":"))
+                metadata[cls.CATEGORIES_PARTIAL_KEY] = "true"
+            metadata[cls.CATEGORY_COUNTS_KEY] = encoded
+        return metadata
+    
+    @classmethod
+    def for_document(cls, document: Any) -> Dict[str, str]:
+        """Metadata for a plain (single blob) JSON document"""
+        if isinstance(document, list):
+            return cls.metadata(len(document), cls.category_counts(document))
+        return cls.metadata(None)
+    
+    @classmethod
+    def has_oplog(cls, info: BlobInfo) -> bool:
+        """Whether operations may have been logged since the statistics were written"""
+        return (info.metadata or {}).get(cls.OPLOG_KEY) == "true"
+    
+    @classmethod
+    def from_info(cls, info: BlobInfo) -> Dict[str, Any]:
+        """
+        Statistics of a blob as reported by get_file_stats.
+        
+        `entry_count` and `category_counts` are None for blobs written before
+        statistics were recorded (or that are not JSON arrays).
+        """
+        metadata = info.metadata or {}
+        stats: Dict[str, Any] = {
+            "entry_count": None,
+            "byte_size": info.size,
+            "category_counts": None,
+            "last_modified": info.last_modified.isoformat() if info.last_modified else None,
+            "segmented": cls.SEGMENT_BYTES_KEY in metadata,
+        }
+        try:
+            if cls.ENTRY_COUNT_KEY in metadata:
+                stats["entry_count"] = int(metadata[cls.ENTRY_COUNT_KEY])
+            if cls.SEGMENT_BYTES_KEY in metadata:
+                stats["byte_size"] += int(metadata[cls.SEGMENT_BYTES_KEY])
+            if cls.CATEGORY_COUNTS_KEY in metadata:
+                stats["category_counts"] = json.loads(metadata[cls.CATEGORY_COUNTS_KEY])
+                if metadata.get(cls.CATEGORIES_PARTIAL_KEY):
+                    stats["category_counts_partial"] = True
+        except ValueError as e:
+            logging.warning(f"Ignoring malformed stats metadata on {info.name}: {str(e)}")
+        return stats
@@ -0,0 +1,654 @@
+"""
+Append-only, day-partitioned JSONL storage for per-user interaction logs
+"""
+import heapq
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+from .storage import BlobInfo, get_storage
+from .storage.cache import ResultCache
+from .storage.json_stream import NotJsonArrayError
+
+
+class InteractionLog:
+    """
+    Interaction log stored as day-partitioned append blobs, one JSON object per line.
+    
+    Each save is a single `append_block` call on the partition of the entry's
+    UTC day (`interaction_logs/YYYY-MM-DD.jsonl`), so its cost does not depend
+    on the size of the history. Readers page newest-first: one list call
+    yields every partition with its metadata, and a partition's entry count
+    is its committed block count. Each new partition records the count and
+    ETag of the log before it, so counts of unchanged older partitions come
+    from the listing and only the current day costs a properties call (once
+    per ETag); partitions before the requested page are skipped without being
+    read and the walk stops as soon as the page is full.
+    
+    History written before partitioning is read as the oldest part of the
+    log: the single `interaction_logs.jsonl` log, preceded by the legacy
+    `interaction_logs.json` array, which is never copied or rewritten.
+    
+    Every entry with a thread_id is also appended to that thread's own log
+    (`interaction_threads/<quoted thread_id>.jsonl`) once the user's thread
+    index exists, so thread-scoped reads and the thread listing never touch
+    other conversations. `build_thread_index` copies existing history into
+    the thread logs; it runs from the `build_thread_indexes` timer, never on a
+    request. The `interaction_threads.jsonl` marker is created when a build
+    starts and gets its first block once it has finished; until then readers
+    filter the day partitions.
+    """
+    
+    LOG_PREFIX = "interaction_logs"
+    PARTITION_PREFIX = "interaction_logs/"
+    PARTITION_SUFFIX = ".jsonl"
+    BLOB_NAME = "interaction_logs.jsonl"
+    LEGACY_BLOB_NAME = "interaction_logs.json"
+    CONTENT_TYPE = "application/x-ndjson"
+    
+    # Append blocks are limited to 4 MiB; history copied into thread logs is split accordingly
+    MAX_BLOCK_BYTES = 4 * 1024 * 1024
+    
+    # Per-thread logs and the marker recording that they cover all history
+    THREAD_PREFIX = "interaction_threads/"
+    THREAD_INDEX_BLOB_NAME = "interaction_threads.jsonl"
+    
+    # An unfinished thread index build older than this is assumed to have died
+    THREAD_INDEX_BUILD_TIMEOUT = timedelta(minutes=10)
+    
+    # Metadata of a thread log created by the index build: entries copied from
+    # existing history, the blocks they were packed into, and the newest one's timestamp
+    COPIED_ENTRIES_KEY = "copied_entries"
+    COPIED_BLOCKS_KEY = "copied_blocks"
+    LAST_ACTIVITY_KEY = "last_activity"
+    
+    # Metadata of the pre-partitioning JSONL log recording how many entries the legacy array holds
+    LEGACY_ENTRIES_KEY = "legacy_entries"
+    
+    # Metadata of a new partition recording the entry count of the log before it
+    PREVIOUS_NAME_KEY = "previous_log"
+    PREVIOUS_ETAG_KEY = "previous_etag"
+    PREVIOUS_ENTRIES_KEY = "previous_entries"
+    
+    # Counts remembered by this worker: committed block counts of log blobs by
+    # path (versioned by ETag; listings do not carry them), and per user the
+    # entries outside the current partition (versioned by partition), so
+    # appends can report the total without listing
+    COUNT_CACHE_ENTRIES = 4096
+    _counts = ResultCache(COUNT_CACHE_ENTRIES, COUNT_CACHE_ENTRIES)
+    
+    # Thread index state seen by this worker, per user: "started" while it is
+    # being built (saves must already write thread logs), "ready" once it is
+    # complete. The state only moves forward, so entries are not versioned.
+    _thread_index_state = ResultCache(COUNT_CACHE_ENTRIES, COUNT_CACHE_ENTRIES)
+    
+    @staticmethod
+    def encode_entry(entry: Dict[str, Any]) -> bytes:
+        """Serialize one interaction as a single JSONL line"""
+        return (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+    
+    @staticmethod
+    def sort_key(entry: Dict[str, Any]) -> str:
+        """Ordering of interactions (ISO timestamps sort chronologically)"""
+        return entry.get('timestamp', '')
+    
+    @classmethod
+    def partition_name(cls, timestamp: str) -> str:
+        """Blob name of the partition holding an entry with this ISO timestamp"""
+        return f"{cls.PARTITION_PREFIX}{timestamp[:10]}{cls.PARTITION_SUFFIX}"
+    
+    @classmethod
+    def thread_blob_name(cls, thread_id: Any) -> str:
+        """Blob name of the log of one thread"""
+        return f"{cls.THREAD_PREFIX}{quote(str(thread_id), safe='')}{cls.PARTITION_SUFFIX}"
+    
+    @classmethod
+    def is_thread_blob(cls, blob_name: str) -> bool:
+        """Check if a (plain or namespaced) blob name is a per-thread log or the thread index marker"""
+        padded = f"/{blob_name}"
+        return f"/{cls.THREAD_PREFIX}" in padded or padded.endswith(f"/{cls.THREAD_INDEX_BLOB_NAME}")
+    
+    @classmethod
+    def append(cls, user_id: str, entry: Dict[str, Any]) -> int:
+        """
+        Append one interaction to the partition of its day.
+        
+        Args:
+            user_id: User ID for namespace isolation
+            entry: Interaction record to store (its `timestamp` picks the partition)
+        
+        Returns:
+            Total number of interactions in the log after the append
+        """
+        storage = get_storage()
+        partition = cls.partition_name(entry.get('timestamp') or datetime.utcnow().isoformat())
+        path = storage.blob_path(partition, user_id)
+        line = cls.encode_entry(entry)
+        
+        try:
+            block_count = storage.append_block(path, line)
+        except ResourceNotFoundError:
+            # First entry of the day: created with If-None-Match, so concurrent savers share one blob
+            try:
+                storage.create_append_blob(
+                    path,
+                    content_type=cls.CONTENT_TYPE,
+                    metadata=cls._previous_metadata(user_id, path)
+                )
+            except ResourceExistsError:
+                pass
+            block_count = storage.append_block(path, line)
+        
+        thread_id = entry.get('thread_id')
+        if thread_id and cls._thread_index_started(user_id):
+            cls._append_line(storage.blob_path(cls.thread_blob_name(thread_id), user_id), line)
+        
+        return block_count + cls._count_older(user_id, partition)
+    
+    @classmethod
+    def page(
+        cls,
+        user_id: str,
+        offset: int,
+        limit: int,
+        thread_id: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+        """
+        Newest-first page of interactions, reading only the partitions it needs.
+        
+        A thread-filtered page reads just that thread's log once the thread
+        index is complete, and then has an exact total.
+        
+        Args:
+            user_id: User ID for namespace isolation
+            offset: Number of (matching) interactions to skip
+            limit: Maximum number of interactions to return
+            thread_id: Optional thread filter
+        
+        Returns:
+            Tuple of (interactions, total, has_more). Without a thread filter the
+            total comes from partition entry counts; with one it is only known
+            (otherwise None) when the walk had to read every partition anyway.
+        """
+        if thread_id and cls._thread_index_ready(user_id):
+            return cls._thread_page(user_id, thread_id, offset, limit)
+        
+        sources = cls._sources(user_id)
+        counts = cls._source_counts(user_id, sources)
+        page: List[Dict[str, Any]] = []
+        seen = 0
+        
+        for position, info in enumerate(sources):
+            count = counts[position]
+            if thread_id is None and count is not None and seen + count <= offset:
+                seen += count
+                continue
+            
+            entries: Iterable[Dict[str, Any]] = cls._iter_source(user_id, info)
+            if thread_id:
+                entries = (entry for entry in entries if cls._in_thread(entry, thread_id))
+            counted = _Counted(entries)
+            newest = heapq.nlargest(offset + limit - seen, counted, key=cls.sort_key)
+            
+            skip = max(0, offset - seen)
+            taken = newest[skip:skip + limit - len(page)]
+            page.extend(taken)
+            seen += counted.count
+            
+            if len(page) >= limit:
+                older = sources[position + 1:]
+                has_more = counted.count > skip + len(taken) or bool(older)
+                if thread_id:
+                    return page, None if older else seen, has_more
+                return page, seen + sum(
+                    cls._count_source(user_id, info, count) for info, count in zip(older, counts[position + 1:])
+                ), has_more
+        
+        return page, seen, False
+    
+    @classmethod
+    def list_threads(cls, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Threads of a user with their interaction count and last activity.
+        
+        Served from one list call over the thread logs once the thread index
+        is complete; until then the history is scanned.
+        
+        Args:
+            user_id: User ID for namespace isolation
+        
+        Returns:
+            List of {thread_id, interaction_count, last_activity}, most recently
+            active first
+        """
+        threads = []
+        if cls._thread_index_ready(user_id):
+            storage = get_storage()
+            thread_prefix = storage.blob_path(cls.THREAD_PREFIX, user_id)
+            marker = storage.blob_path(cls.THREAD_INDEX_BLOB_NAME, user_id)
+            infos = list(storage.list_blobs(storage.blob_path(cls.THREAD_PREFIX.rstrip("/"), user_id), include_metadata=True))
+            duplicates = cls._build_duplicates(next((info for info in infos if info.name == marker), None))
+            for info in infos:
+                if not info.name.startswith(thread_prefix) or not info.name.endswith(cls.PARTITION_SUFFIX):
+                    continue
+                thread_id = unquote(info.name[len(thread_prefix):-len(cls.PARTITION_SUFFIX)])
+                metadata = info.metadata or {}
+                blocks = cls._committed_blocks(info)
+                last_activity = metadata.get(cls.LAST_ACTIVITY_KEY)
+                # Appended to since it was built: the last write is the last interaction
+                if last_activity is None or blocks != int(metadata.get(cls.COPIED_BLOCKS_KEY, 0)):
+                    if info.last_modified:
+                        last_activity = info.last_modified.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+                threads.append({
+                    "thread_id": thread_id,
+                    "interaction_count": (
+                        blocks
+                        + int(metadata.get(cls.COPIED_ENTRIES_KEY, 0))
+                        - int(metadata.get(cls.COPIED_BLOCKS_KEY, 0))
+                        - duplicates.get(thread_id, 0)
+                    ),
+                    "last_activity": last_activity,
+                })
+        else:
+            for thread_id, entries in cls._group_by_thread(user_id).items():
+                threads.append({
+                    "thread_id": thread_id,
+                    "interaction_count": len(entries),
+                    "last_activity": max(cls.sort_key(entry) for entry in entries) or None,
+                })
+        
+        threads.sort(key=lambda thread: thread["last_activity"] or "", reverse=True)
+        return threads
+    
+    @classmethod
+    def build_thread_index(cls, user_id: str) -> bool:
+        """
+        Copy a user's existing history into per-thread logs (one build per user).
+        
+        The marker is created first, so saves from then on write their own
+        thread entries; entries already present in a thread log (from those
+        saves, or from an earlier build that died) are not copied again. A
+        save racing the copy of its thread can still land in the log twice:
+        the build counts such duplicates once it is done and records them in
+        the marker, so thread counts and pages exclude them.
+        
+        Args:
+            user_id: User ID for namespace isolation
+        
+        Returns:
+            True if this call built the index; False if it was already built or
+            another build is in progress
+        """
+        storage = get_storage()
+        marker = storage.blob_path(cls.THREAD_INDEX_BLOB_NAME, user_id)
+        try:
+            info = storage.get_properties(marker)
+        except ResourceNotFoundError:
+            info = None
+        if info is not None:
+            if info.committed_block_count:
+                cls._thread_index_state.put(user_id, None, "ready", 1)
+                return False
+            if not info.last_modified or datetime.now(timezone.utc) - info.last_modified <= cls.THREAD_INDEX_BUILD_TIMEOUT:
+                return False
+            logging.warning(f"Restarting abandoned thread index build for user {user_id}")
+            storage.delete(marker)
+        
+        try:
+            storage.create_append_blob(marker, content_type=cls.CONTENT_TYPE)
+        except ResourceExistsError:
+            return False
+        cls._thread_index_state.put(user_id, None, "started", 1)
+        
+        threads = cls._group_by_thread(user_id)
+        entry_count = 0
+        duplicates: Dict[str, int] = {}
+        for thread_id, entries in threads.items():
+            entries.sort(key=cls.sort_key)
+            entry_count += len(entries)
+            path = storage.blob_path(cls.thread_blob_name(thread_id), user_id)
+            blocks = cls._pack_blocks(entries)
+            expected = len(blocks)
+            try:
+                storage.create_append_blob(
+                    path,
+                    content_type=cls.CONTENT_TYPE,
+                    metadata={
+                        cls.COPIED_ENTRIES_KEY: str(len(entries)),
+                        cls.COPIED_BLOCKS_KEY: str(len(blocks)),
+                        cls.LAST_ACTIVITY_KEY: cls.sort_key(entries[-1]),
+                    }
+                )
+            except ResourceExistsError:
+                # Already receiving saves: add only what is missing, one entry per block
+                present = [cls._entry_key(entry) for entry in cls._iter_lines(path)]
+                present_keys = set(present)
+                blocks = [cls.encode_entry(entry) for entry in entries if cls._entry_key(entry) not in present_keys]
+                expected = len(present) + len(blocks)
+            
+            block_count = 0
+            for block in blocks:
+                block_count = storage.append_block(path, block)
+            if blocks and block_count > expected:
+                # Saves landed while copying; any of them may also have been copied
+                keys = [cls._entry_key(entry) for entry in cls._iter_lines(path)]
+                if len(keys) > len(set(keys)):
+                    duplicates[thread_id] = len(keys) - len(set(keys))
+        
+        storage.append_block(marker, cls.encode_entry({
+            "built_at": datetime.utcnow().isoformat(),
+            "threads": len(threads),
+            "entries": entry_count,
+            "duplicates": duplicates,
+        }))
+        cls._thread_index_state.put(user_id, None, "ready", 1)
+        logging.info(f"Built thread index for user {user_id}: {len(threads)} threads, {entry_count} interactions")
+        return True
+    
+    @classmethod
+    def iter_entries(cls, user_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all interactions, oldest partition first, without loading the whole log.
+        
+        Args:
+            user_id: User ID for namespace isolation
+        
+        Yields:
+            Interaction records
+        """
+        for info in reversed(cls._sources(user_id)):
+            yield from cls._iter_source(user_id, info)
+    
+    @classmethod
+    def _sources(cls, user_id: str) -> List[BlobInfo]:
+        """Log blobs of a user, newest first: day partitions, then pre-partitioning history"""
+        storage = get_storage()
+        user_prefix = storage.blob_path("", user_id)
+        partitions = []
+        archive: Dict[str, BlobInfo] = {}
+        for info in storage.list_blobs(storage.blob_path(cls.LOG_PREFIX, user_id), include_metadata=True):
+            name = info.name[len(user_prefix):]
+            if name.startswith(cls.PARTITION_PREFIX) and name.endswith(cls.PARTITION_SUFFIX):
+                partitions.append(info)
+            elif name in (cls.BLOB_NAME, cls.LEGACY_BLOB_NAME):
+                archive[name] = info
+        
+        partitions.sort(key=lambda info: info.name, reverse=True)
+        # The JSONL log continues the legacy array, which was never copied into it
+        for name in (cls.BLOB_NAME, cls.LEGACY_BLOB_NAME):
+            if name in archive:
+                partitions.append(archive[name])
+        return partitions
+    
+    @classmethod
+    def _entry_count(cls, info: BlobInfo) -> Optional[int]:
+        """Entries in a log blob from its properties; None for the legacy array"""
+        if cls._is_legacy(info):
+            return None
+        return cls._committed_blocks(info)
+    
+    @classmethod
+    def _is_legacy(cls, info: BlobInfo) -> bool:
+        """Whether a log blob is the legacy JSON array (a block blob)"""
+        return info.name.endswith(f"/{cls.LEGACY_BLOB_NAME}") or info.name == cls.LEGACY_BLOB_NAME
+    
+    @classmethod
+    def _source_counts(cls, user_id: str, sources: List[BlobInfo]) -> List[Optional[int]]:
+        """
+        Entry counts of the log blobs from `_sources` (None for the legacy array
+        when no log recorded its size).
+        
+        A log still at the ETag the next partition recorded for it when that
+        partition was created is counted from the listing alone, and so is the
+        legacy array, whose size the pre-partitioning log recorded.
+        """
+        user_prefix = get_storage().blob_path("", user_id)
+        recorded: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        for info in sources:
+            metadata = info.metadata or {}
+            if cls.PREVIOUS_NAME_KEY in metadata:
+                recorded[metadata[cls.PREVIOUS_NAME_KEY]] = (
+                    metadata.get(cls.PREVIOUS_ETAG_KEY),
+                    metadata.get(cls.PREVIOUS_ENTRIES_KEY)
+                )
+            if cls.LEGACY_ENTRIES_KEY in metadata:
+                # The legacy array is read-only once the log exists
+                recorded.setdefault(cls.LEGACY_BLOB_NAME, (None, metadata[cls.LEGACY_ENTRIES_KEY]))
+        
+        counts = []
+        for info in sources:
+            etag, entries = recorded.get(info.name[len(user_prefix):], (None, None))
+            if entries is not None and entries.isdigit() and (etag is None or etag == info.etag):
+                counts.append(int(entries))
+            else:
+                counts.append(cls._entry_count(info))
+        return counts
+    
+    @classmethod
+    def _previous_metadata(cls, user_id: str, path: str) -> Dict[str, str]:
+        """Metadata of a new partition recording the log before it (see `_source_counts`)"""
+        sources = cls._sources(user_id)
+        older = [
+            (info, count)
+            for info, count in zip(sources, cls._source_counts(user_id, sources))
+            if info.name < path
+        ]
+        if not older:
+            return {}
+        info, count = older[0]
+        return {
+            cls.PREVIOUS_NAME_KEY: info.name[len(get_storage().blob_path("", user_id)):],
+            cls.PREVIOUS_ETAG_KEY: info.etag,
+            cls.PREVIOUS_ENTRIES_KEY: str(cls._count_source(user_id, info, count)),
+        }
+    
+    @classmethod
+    def _committed_blocks(cls, info: BlobInfo) -> int:
+        """Committed block count of an append blob, with one properties call per new ETag"""
+        if info.committed_block_count is not None:
+            return info.committed_block_count
+        cached = cls._counts.get(("blocks", info.name), info.etag)
+        if cached is not None:
+            return cached
+        try:
+            properties = get_storage().get_properties(info.name)
+        except ResourceNotFoundError:
+            return 0
+        count = properties.committed_block_count or 0
+        cls._counts.put(("blocks", info.name), properties.etag, count, 1)
+        return count
+    
+    @classmethod
+    def _count_source(cls, user_id: str, info: BlobInfo, count: Optional[int]) -> int:
+        """Entries of a log blob given its count from `_source_counts`; the legacy array is read"""
+        if count is None:
+            count = sum(1 for _ in cls._iter_source(user_id, info))
+        return count
+    
+    @classmethod
+    def _count_older(cls, user_id: str, partition: str) -> int:
+        """Entries outside `partition` (cached per worker until the partition changes)"""
+        cached = cls._counts.get(("older", user_id), partition)
+        if cached is not None:
+            return cached
+        
+        path = get_storage().blob_path(partition, user_id)
+        sources = cls._sources(user_id)
+        count = sum(
+            cls._count_source(user_id, info, info_count)
+            for info, info_count in zip(sources, cls._source_counts(user_id, sources))
+            if info.name != path
+        )
+        cls._counts.put(("older", user_id), partition, count, 1)
+        return count
+    
+    @staticmethod
+    def _in_thread(entry: Dict[str, Any], thread_id: Any) -> bool:
+        """Whether an entry belongs to a thread (ids compared as strings, like thread log names)"""
+        entry_thread = entry.get('thread_id')
+        return entry_thread is not None and str(entry_thread) == str(thread_id)
+    
+    @classmethod
+    def _entry_key(cls, entry: Dict[str, Any]) -> str:
+        """Identity of an interaction when de-duplicating thread logs"""
+        return entry.get('interaction_id') or cls.sort_key(entry)
+    
+    @classmethod
+    def _thread_page(
+        cls,
+        user_id: str,
+        thread_id: Any,
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """Newest-first page of one thread, from its own log"""
+        path = get_storage().blob_path(cls.thread_blob_name(thread_id), user_id)
+        # A save racing the index build can land in the log twice
+        entries = {}
+        for entry in cls._iter_lines(path):
+            entries.setdefault(cls._entry_key(entry), entry)
+        
+        ordered = sorted(entries.values(), key=cls.sort_key, reverse=True)
+        return ordered[offset:offset + limit], len(ordered), offset + limit < len(ordered)
+    
+    @classmethod
+    def _thread_index_started(cls, user_id: str) -> bool:
+        """Whether saves must write thread logs (the index build has at least started)"""
+        if cls._thread_index_state.get(user_id, None) is not None:
+            return True
+        storage = get_storage()
+        try:
+            info = storage.get_properties(storage.blob_path(cls.THREAD_INDEX_BLOB_NAME, user_id))
+        except ResourceNotFoundError:
+            return False
+        cls._thread_index_state.put(user_id, None, "ready" if info.committed_block_count else "started", 1)
+        return True
+    
+    @classmethod
+    def _thread_index_ready(cls, user_id: str) -> bool:
+        """Whether the thread logs cover the user's whole history (the index build has finished)"""
+        if cls._thread_index_state.get(user_id, None) == "ready":
+            return True
+        storage = get_storage()
+        try:
+            info = storage.get_properties(storage.blob_path(cls.THREAD_INDEX_BLOB_NAME, user_id))
+        except ResourceNotFoundError:
+            return False
+        state = "ready" if info.committed_block_count else "started"
+        cls._thread_index_state.put(user_id, None, state, 1)
+        return state == "ready"
+    
+    @classmethod
+    def _build_duplicates(cls, marker: Optional[BlobInfo]) -> Dict[str, int]:
+        """Duplicates per thread recorded by the finished index build (read once per marker version)"""
+        if marker is None:
+            return {}
+        cached = cls._counts.get(("duplicates", marker.name), marker.etag)
+        if cached is not None:
+            return cached
+        duplicates: Dict[str, int] = {}
+        for record in cls._iter_lines(marker.name):
+            duplicates = record.get("duplicates") or {}
+        cls._counts.put(("duplicates", marker.name), marker.etag, duplicates, 1)
+        return duplicates
+    
+    @classmethod
+    def _group_by_thread(cls, user_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """All interactions that have a thread_id, grouped by it (as a string)"""
+        threads: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in cls.iter_entries(user_id):
+            thread_id = entry.get('thread_id')
+            if thread_id:
+                threads.setdefault(str(thread_id), []).append(entry)
+        return threads
+    
+    @classmethod
+    def _append_line(cls, path: str, line: bytes) -> int:
+        """Append to a JSONL append blob, creating it on first use"""
+        storage = get_storage()
+        try:
+            return storage.append_block(path, line)
+        except ResourceNotFoundError:
+            try:
+                storage.create_append_blob(path, content_type=cls.CONTENT_TYPE)
+            except ResourceExistsError:
+                pass
+            return storage.append_block(path, line)
+    
+    @classmethod
+    def _pack_blocks(cls, entries: List[Dict[str, Any]]) -> List[bytes]:
+        """Group encoded entries into append blocks no larger than MAX_BLOCK_BYTES"""
+        blocks = []
+        current = bytearray()
+        for entry in entries:
+            line = cls.encode_entry(entry)
+            if current and len(current) + len(line) > cls.MAX_BLOCK_BYTES:
+                blocks.append(bytes(current))
+                current = bytearray()
+            current += line
+        if current:
+            blocks.append(bytes(current))
+        return blocks
+    
+    @classmethod
+    def _iter_source(cls, user_id: str, info: BlobInfo) -> Iterator[Dict[str, Any]]:
+        """Entries of one log blob in append order"""
+        if cls._is_legacy(info):
+            yield from cls._iter_legacy(user_id)
+            return
+        yield from cls._iter_lines(info.name)
+    
+    @classmethod
+    def _iter_lines(cls, path: str) -> Iterator[Dict[str, Any]]:
+        """Entries of a JSONL append blob (none if it does not exist)"""
+        try:
+            _, chunks = get_storage().open_stream(path)
+        except ResourceNotFoundError:
+            return
+        
+        pending = b""
+        for chunk in chunks:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if pending.strip():
+            yield json.loads(pending)
+    
+    @classmethod
+    def _iter_legacy(cls, user_id: str) -> Iterator[Dict[str, Any]]:
+        """Entries of the legacy JSON array, parsed while streaming when the file is large"""
+        try:
+            opened = get_storage().open_json(cls.LEGACY_BLOB_NAME, user_id)
+        except ResourceNotFoundError:
+            return
+        
+        if not opened.streaming:
+            if isinstance(opened.document, list):
+                yield from opened.document
+            return
+        try:
+            yield from opened.items
+        except NotJsonArrayError:
+            return
+
+
+class _Counted:
+    """Iterator wrapper counting the items consumed"""
+    
+    def __init__(self, items: Iterable[Any]):
+        self._items = iter(items)
+        self.count = 0
+    
+    def __iter__(self) -> "_Counted":
+        return self
+    
+    def __next__(self) -> Any:
+        item = next(self._items)
+        self.count += 1
+        return item
@@ -0,0 +1,442 @@
+"""
+Structured query specs for JSON collections, compiled once into a filter/sort/projection pipeline
+"""
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Predicate = Callable[[Any], bool]
+
+
+class QueryError(ValueError):
+    """Raised when a query spec is malformed"""
+
+
+class CursorError(QueryError):
+    """Raised when a pagination cursor is malformed or belongs to another file or query"""
+
+
+class CursorExpiredError(CursorError):
+    """Raised when the file changed since a pagination cursor was issued"""
+
+
+class _Descending:
+    """Sort key wrapper inverting the order of the wrapped value"""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+    
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+class Query:
+    """
+    A compiled query spec.
+    
+    Spec (every part optional):
+        
+        {
+          "where": {"and": [
+            {"field": "status", "op": "in", "value": ["open", "blocked"]},
+            {"field": "due", "op": "lt", "value": "2026-11-01"},
+            {"or": [{"field": "tags", "op": "contains", "value": "work"},
+                    {"not": {"field": "owner", "op": "exists"}}]}
+          ]},
+          "sort": ["-priority", "due"],
+          "limit": 20,
+          "fields": ["id", "title", "due"]
+        }
+    
+    Operators: eq, ne, in, nin (compared as strings, like get_filtered_data),
+    gt, gte, lt, lte (numbers numerically, ISO dates/datetimes as points in
+    time, other strings lexically), contains (case-insensitive substring, or
+    membership for list fields) and exists. A bare list under "where" is an
+    implicit "and". Sorting puts entries without the field last in either
+    direction.
+    
+    The spec is validated and turned into closures once; evaluating it is a
+    single pass of `where` over the entries followed by `finish`.
+    """
+    
+    OPERATORS = ("eq", "ne", "in", "nin", "gt", "gte", "lt", "lte", "contains", "exists")
+    
+    # Upper bound on clauses per spec, so a request cannot build a huge predicate tree
+    MAX_CLAUSES = 100
+    
+    _ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+    
+    def __init__(
+        self,
+        where: Optional[Predicate] = None,
+        match: Optional[Tuple[str, Any]] = None,
+        sort_key: Optional[Callable[[Any], Tuple]] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        clause: Any = None,
+        order: Optional[List[Tuple[str, bool]]] = None
+    ):
+        self.where = where
+        self.match = match
+        self.sort_key = sort_key
+        self.limit = limit
+        self.fields = fields
+        # The validated spec behind `where` and `sort_key`, for evaluators
+        # other than the compiled closures (see ColumnarView)
+        self.clause = clause
+        self.order = order
+    
+    @classmethod
+    def compile(cls, spec: Any, filter_only: bool = False) -> "Query":
+        """
+        Validate a query spec and build its pipeline.
+        
+        Args:
+            spec: Query spec (see the class docstring)
+            filter_only: Only accept "where" (bulk updates and removals)
+        
+        Returns:
+            Compiled query
+        
+        Raises:
+            QueryError: If the spec is malformed
+        """
+        if not isinstance(spec, dict):
+            raise QueryError("Query must be a JSON object")
+        allowed = {"where"} if filter_only else {"where", "sort", "limit", "fields"}
+        unknown = sorted(set(spec) - allowed)
+        if unknown:
+            raise QueryError(f"Unsupported query keys: {', '.join(unknown)}")
+        
+        where = spec.get("where")
+        predicate = None
+        match = None
+        if where is not None:
+            budget = [cls.MAX_CLAUSES]
+            predicate = cls._compile_clause(where, budget)
+            match = cls._equality(where)
+        
+        limit = spec.get("limit")
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+            raise QueryError("'limit' must be a positive integer")
+        
+        fields = spec.get("fields")
+        if fields is not None and (
+            not isinstance(fields, list) or not fields
+            or not all(isinstance(name, str) and name for name in fields)
+        ):
+            raise QueryError("'fields' must be a non-empty list of field names")
+        
+        sort = spec.get("sort")
+        order = cls._sort_order(sort) if sort is not None else None
+        sort_key = cls._compile_sort(order) if order is not None else None
+        
+        return cls(predicate, match, sort_key, limit, fields, where, order)
+    
+    def finish(self, entries: List[Any], start: int = 0) -> List[Any]:
+        """Sort, skip `start` entries, limit and project entries that already passed `where`"""
+        if self.sort_key is not None:
+            if self.limit is not None:
+                entries = heapq.nsmallest(start + self.limit, entries, key=self.sort_key)[start:]
+            else:
+                entries = sorted(entries, key=self.sort_key)[start:]
+        elif self.limit is not None:
+            entries = entries[start:start + self.limit]
+        elif start:
+            entries = entries[start:]
+        
+        if self.fields is None:
+            return list(entries)
+        return [self.project(entry) for entry in entries]
+    
+    def selection_key(self) -> str:
+        """Canonical JSON of the filter and sort, which decide what a result position refers to"""
+        return json.dumps({
+            "where": self._normalized(self.clause) if self.clause is not None else None,
+            "sort": self.order
+        }, sort_keys=True)
+    
+    def cache_key(self) -> str:
+        """Canonical JSON of the query, equal for specs that only differ in spelling"""
+        return json.dumps([self.selection_key(), self.limit, self.fields])
+    
+    def project(self, entry: Any) -> Any:
+        """Keep only the requested fields of an entry (entries that are not objects pass unchanged)"""
+        if self.fields is None or not isinstance(entry, dict):
+            return entry
+        return {name: entry[name] for name in self.fields if name in entry}
+    
+    @classmethod
+    def _compile_clause(cls, clause: Any, budget: List[int]) -> Predicate:
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise QueryError(f"Query has more than {cls.MAX_CLAUSES} clauses")
+        
+        if isinstance(clause, list):
+            clause = {"and": clause}
+        if not isinstance(clause, dict):
+            raise QueryError(f"Invalid clause: {json.dumps(clause)}")
+        
+        for logical in ("and", "or"):
+            if logical in clause:
+                children = clause[logical]
+                if len(clause) != 1 or not isinstance(children, list) or not children:
+                    raise QueryError(f"'{logical}' must be the only key of its clause and hold a non-empty list")
+                predicates = [cls._compile_clause(child, budget) for child in children]
+                if len(predicates) == 1:
+                    return predicates[0]
+                if logical == "and":
+                    return lambda entry: all(predicate(entry) for predicate in predicates)
+                return lambda entry: any(predicate(entry) for predicate in predicates)
+        
+        if "not" in clause:
+            if len(clause) != 1:
+                raise QueryError("'not' must be the only key of its clause")
+            negated = cls._compile_clause(clause["not"], budget)
+            return lambda entry: isinstance(entry, dict) and not negated(entry)
+        
+        return cls._compile_comparison(clause)
+    
+    @classmethod
+    def _normalized(cls, clause: Any) -> Any:
+        """A validated clause with implicit "and", single-child groups and default operands spelled out"""
+        if isinstance(clause, list):
+            clause = {"and": clause}
+        for logical in ("and", "or"):
+            if logical in clause:
+                children = [cls._normalized(child) for child in clause[logical]]
+                return children[0] if len(children) == 1 else {logical: children}
+        if "not" in clause:
+            return {"not": cls._normalized(clause["not"])}
+        op = clause.get("op", "eq")
+        value = clause.get("value")
+        if op == "exists" and value is None:
+            value = True
+        return {"field": clause["field"], "op": op, "value": value}
+    
+    @classmethod
+    def _compile_comparison(cls, clause: Dict[str, Any]) -> Predicate:
+        field_name = clause.get("field")
+        op = clause.get("op", "eq")
+        if not isinstance(field_name, str) or not field_name:
+            raise QueryError(f"Clause needs a 'field': {json.dumps(clause)}")
+        if op not in cls.OPERATORS:
+            raise QueryError(f"Unknown operator '{op}' (expected one of: {', '.join(cls.OPERATORS)})")
+        unknown = sorted(set(clause) - {"field", "op", "value"})
+        if unknown:
+            raise QueryError(f"Unsupported clause keys: {', '.join(unknown)}")
+        if op != "exists" and "value" not in clause:
+            raise QueryError(f"Operator '{op}' needs a 'value'")
+        value = clause.get("value")
+        
+        if op == "exists":
+            wanted = True if value is None else value
+            if not isinstance(wanted, bool):
+                raise QueryError("'exists' takes true or false")
+            return lambda entry: isinstance(entry, dict) and (entry.get(field_name) is not None) == wanted
+        
+        if op in ("eq", "ne"):
+            expected = str(value)
+            if op == "eq":
+                return lambda entry: isinstance(entry, dict) and str(entry.get(field_name)) == expected
+            return lambda entry: isinstance(entry, dict) and str(entry.get(field_name)) != expected
+        
+        if op in ("in", "nin"):
+            if not isinstance(value, list):
+                raise QueryError(f"Operator '{op}' needs a list value")
+            members = {str(item) for item in value}
+            if op == "in":
+                return lambda entry: isinstance(entry, dict) and str(entry.get(field_name)) in members
+            return lambda entry: isinstance(entry, dict) and str(entry.get(field_name)) not in members
+        
+        if op == "contains":
+            if isinstance(value, (dict, list)):
+                raise QueryError("'contains' needs a scalar value")
+            needle = str(value).lower()
+            
+            def contains(entry: Any) -> bool:
+                if not isinstance(entry, dict):
+                    return False
+                actual = entry.get(field_name)
+                if isinstance(actual, list):
+                    return any(str(item).lower() == needle for item in actual)
+                return isinstance(actual, str) and needle in actual.lower()
+            
+            return contains
+        
+        return cls._compile_range(field_name, op, value)
+    
+    @classmethod
+    def _compile_range(cls, field_name: str, op: str, value: Any) -> Predicate:
+        compare = {
+            "gt": lambda actual, bound: actual > bound,
+            "gte": lambda actual, bound: actual >= bound,
+            "lt": lambda actual, bound: actual < bound,
+            "lte": lambda actual, bound: actual <= bound,
+        }[op]
+        
+        # The type of the bound decides how entry values are read, once per query
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            bound, coerce = value, cls.number
+        elif cls.is_iso_date(value):
+            bound, coerce = cls.instant(value), cls.instant
+        elif isinstance(value, str):
+            bound, coerce = value, lambda actual: actual if isinstance(actual, str) else None
+        else:
+            raise QueryError(f"Operator '{op}' needs a number, ISO date or string value")
+        
+        def in_range(entry: Any) -> bool:
+            if not isinstance(entry, dict):
+                return False
+            actual = coerce(entry.get(field_name))
+            return actual is not None and compare(actual, bound)
+        
+        return in_range
+    
+    @staticmethod
+    def _sort_order(sort: Any) -> List[Tuple[str, bool]]:
+        """Validated sort spec as (field, descending) pairs"""
+        if isinstance(sort, (str, dict)):
+            sort = [sort]
+        if not isinstance(sort, list) or not sort:
+            raise QueryError("'sort' must be a field name or a list of them")
+        
+        keys: List[Tuple[str, bool]] = []
+        for item in sort:
+            if isinstance(item, str) and item.lstrip("-"):
+                keys.append((item.lstrip("-"), item.startswith("-")))
+            elif isinstance(item, dict) and isinstance(item.get("field"), str) and item.get("order", "asc") in ("asc", "desc"):
+                keys.append((item["field"], item.get("order") == "desc"))
+            else:
+                raise QueryError(f"Invalid sort key: {json.dumps(item)}")
+        return keys
+    
+    @classmethod
+    def _compile_sort(cls, keys: List[Tuple[str, bool]]) -> Callable[[Any], Tuple]:
+        def sort_key(entry: Any) -> Tuple:
+            key = []
+            for field_name, descending in keys:
+                actual = entry.get(field_name) if isinstance(entry, dict) else None
+                missing = actual is None
+                ranked = (0, 0) if missing else cls.rank(actual)
+                key.append((missing, _Descending(ranked) if descending else ranked))
+            return tuple(key)
+        
+        return sort_key
+    
+    @staticmethod
+    def rank(value: Any) -> Tuple[int, Any]:
+        """Totally ordered key for values of mixed JSON types: numbers, then strings, then the rest"""
+        if isinstance(value, (int, float)):
+            return 0, value
+        if isinstance(value, str):
+            return 1, value
+        return 2, json.dumps(value, sort_keys=True)
+    
+    @staticmethod
+    def number(value: Any) -> Optional[float]:
+        """A value as a number for range comparisons (numbers and numeric strings; not booleans)"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return None
+        return None
+    
+    @classmethod
+    def is_iso_date(cls, value: Any) -> bool:
+        """Whether a value is an ISO 8601 date or datetime string"""
+        return isinstance(value, str) and cls._ISO_DATE.match(value) is not None
+    
+    @staticmethod
+    def instant(value: Any) -> Optional[datetime]:
+        """ISO date or datetime as a naive UTC datetime (dates are midnight); None if not one"""
+        if not isinstance(value, str):
+            return None
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                parsed = datetime.combine(date.fromisoformat(value[:10]), datetime.min.time())
+            except ValueError:
+                return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    
+    @classmethod
+    def _equality(cls, where: Any) -> Optional[Tuple[str, Any]]:
+        """
+        A top-level `field == value` clause every result must satisfy, if any.
+        
+        DataStore uses it like the key/value filter of get_filtered_data: to
+        skip segments by their bounds and to answer from a field index.
+        """
+        clauses = where if isinstance(where, list) else where.get("and", [where])
+        for clause in clauses:
+            if (
+                isinstance(clause, dict)
+                and clause.get("op", "eq") == "eq"
+                and isinstance(clause.get("field"), str)
+                and not isinstance(clause.get("value"), (dict, list))
+                and "value" in clause
+            ):
+                return clause["field"], clause["value"]
+        return None
+
+
+@dataclass
+class Cursor:
+    """
+    Where the next page of a query's results starts (see DataStore.find_page).
+    
+    Clients get it as an opaque token. `scope` and `version` are digests of
+    the file and query (filter and sort) and of the file version the
+    position refers to.
+    """
+    position: int
+    version: str
+    scope: str
+    
+    @staticmethod
+    def digest(*parts: Any) -> str:
+        """Short digest of JSON-serializable values"""
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+    
+    def encode(self) -> str:
+        """Opaque token handed to clients"""
+        return base64.urlsafe_b64encode(json.dumps([self.position, self.version, self.scope]).encode('utf-8')).decode('ascii')
+    
+    @classmethod
+    def decode(cls, token: Any) -> "Cursor":
+        """
+        Parse a token made by `encode`.
+        
+        Raises:
+            CursorError: If the token is malformed
+        """
+        try:
+            position, version, scope = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        except (ValueError, TypeError, AttributeError, UnicodeError, binascii.Error):
+            raise CursorError("Invalid cursor")
+        if (
+            isinstance(position, bool) or not isinstance(position, int) or position < 0
+            or not isinstance(version, str) or not isinstance(scope, str)
+        ):
+            raise CursorError("Invalid cursor")
+        return cls(position, version, scope)
@@ -0,0 +1,351 @@
+"""
+Per-collection inverted indexes for full-text search over a user's JSON files
+"""
+import bisect
+import heapq
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import SearchConfig
+from .data_index import ChangeSet
+from .storage import get_storage
+
+
+@dataclass
+class SearchResult:
+    """Outcome of a search over a user's collections"""
+    hits: List[Dict[str, Any]]
+    matched: int
+    files: int
+    rebuilt: List[str] = field(default_factory=list)
+    errors: List[Dict[str, str]] = field(default_factory=list)
+
+
+class SearchIndex:
+    """
+    Inverted indexes stored beside the data in `<name>.searchindex.json`.
+    
+    The blob maps every token of the entries' string values to postings
+    `[position, term frequency]` and keeps `[id, token count]` per entry (for
+    BM25 and for reporting hits), plus the ETag of the collection version it
+    describes and, in snapshot + operation log mode, the log it has read up
+    to. Like FieldIndex it is updated from the ChangeSet of every committed
+    write; appends recorded in an operation log are added as they are
+    logged. Anything else (logged updates/removals, compactions, concurrent
+    writers) leaves it stale, and the next search rebuilds it.
+    """
+    
+    INDEX_SUFFIX = ".searchindex.json"
+    
+    MIN_TOKEN_LENGTH = 2
+    MAX_TOKEN_LENGTH = 40
+    
+    # BM25 parameters (the usual defaults)
+    K1 = 1.2
+    B = 0.75
+    
+    _TOKEN = re.compile(r"\w+", re.UNICODE)
+    
+    # Collections found without an index are remembered briefly so writes skip the lookup
+    MISSING_TTL = 30.0
+    _missing_until: Dict[str, float] = {}
+    
+    @classmethod
+    def index_name(cls, name: str) -> str:
+        """Blob name of a collection's search index"""
+        return f"{name}{cls.INDEX_SUFFIX}"
+    
+    @classmethod
+    def is_index_blob(cls, blob_name: str) -> bool:
+        """Check if a blob is a search index"""
+        return blob_name.endswith(cls.INDEX_SUFFIX)
+    
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Lower-cased word tokens of a text (Unicode letters and digits)"""
+        return [
+            token for token in cls._TOKEN.findall(text.lower())
+            if cls.MIN_TOKEN_LENGTH <= len(token) <= cls.MAX_TOKEN_LENGTH
+        ]
+    
+    @classmethod
+    def entry_tokens(cls, entry: Any) -> List[str]:
+        """Tokens of every string value in an entry, nested lists and objects included"""
+        tokens: List[str] = []
+        pending = [entry]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, str):
+                tokens.extend(cls.tokenize(value))
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, list):
+                pending.extend(value)
+        return tokens
+    
+    @staticmethod
+    def entry_id(entry: Any) -> Any:
+        """The entry's `id` field, if it has a scalar one"""
+        if isinstance(entry, dict) and isinstance(entry.get("id"), (str, int, float)):
+            return entry["id"]
+        return None
+    
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[Any],
+        etag: str,
+        oplog: Optional[str] = None,
+        oplog_ops: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Index entries in one pass.
+        
+        Args:
+            entries: Entries of the collection (a non-array document indexes nothing)
+            etag: ETag of the collection version the entries were read from
+            oplog: Operation log the entries include, in snapshot + log mode
+            oplog_ops: Number of operations of that log folded into the entries
+        
+        Returns:
+            Index document
+        """
+        index = {"source_etag": etag, "oplog": oplog, "oplog_ops": oplog_ops, "docs": [], "terms": {}}
+        if isinstance(entries, list):
+            for entry in entries:
+                cls._add(index["docs"], index["terms"], len(index["docs"]), entry)
+        return index
+    
+    @classmethod
+    def load(cls, name: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Read a collection's search index (None if it has none)"""
+        document, _ = get_storage().read_json(cls.index_name(name), user_id)
+        return document
+    
+    @classmethod
+    def save(cls, name: str, index: Dict[str, Any], user_id: Optional[str] = None) -> None:
+        """Store a freshly built index unless a writer already brought the stored one to that version"""
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        cls._missing_until.pop(path, None)
+        
+        def replace(current):
+            if current is not None and cls.describes(current, index["source_etag"], index["oplog_ops"]):
+                return None
+            return index
+        
+        try:
+            storage.update_json(path, replace, default_factory=lambda: None)
+        except Exception as e:
+            # Searching still works from the index built in memory
+            logging.warning(f"Could not store search index of '{name}': {str(e)}")
+    
+    @staticmethod
+    def describes(index: Dict[str, Any], etag: str, oplog_ops: int = 0) -> bool:
+        """Whether the index is current for a collection version (and operation count)"""
+        return index.get("source_etag") == etag and index.get("oplog_ops", 0) == oplog_ops
+    
+    @classmethod
+    def apply(cls, name: str, changes: ChangeSet, user_id: Optional[str] = None) -> None:
+        """Apply a committed ChangeSet to the collection's search index, if it has one"""
+        if not SearchConfig.ENABLED:
+            return
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        if cls._missing_until.get(path, 0.0) > time.monotonic():
+            return
+        
+        def apply_changes(index):
+            if index is None:
+                cls._missing_until[path] = time.monotonic() + cls.MISSING_TTL
+                return None
+            if not cls.describes(index, changes.previous_etag):
+                # The index already lags behind; the next search rebuilds it
+                return None
+            updated = cls._apply_changes(index, changes)
+            if len(updated["docs"]) != changes.count:
+                return None
+            return {**updated, "source_etag": changes.etag, "oplog": changes.oplog, "oplog_ops": 0}
+        
+        cls._update(name, path, apply_changes)
+    
+    @classmethod
+    def apply_logged(
+        cls,
+        name: str,
+        etag: str,
+        oplog: str,
+        op_count: int,
+        start: int,
+        entries: List[Any],
+        user_id: Optional[str] = None
+    ) -> None:
+        """
+        Add entries appended through an operation log.
+        
+        Args:
+            name: Logical blob name of the collection
+            etag: ETag of the manifest naming the log
+            oplog: The log the append was recorded in
+            op_count: Operations in the log including this one
+            start: Position of the first appended entry
+            entries: Appended entries
+            user_id: Optional user ID for namespace isolation
+        """
+        if not SearchConfig.ENABLED:
+            return
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(name), user_id)
+        if cls._missing_until.get(path, 0.0) > time.monotonic():
+            return
+        
+        def append(index):
+            if index is None:
+                cls._missing_until[path] = time.monotonic() + cls.MISSING_TTL
+                return None
+            if index.get("oplog") != oplog or not cls.describes(index, etag, op_count - 1):
+                return None
+            if len(index["docs"]) != start:
+                return None
+            updated = cls._apply_changes(index, ChangeSet(
+                previous_etag=etag, etag=etag, count=start + len(entries), appended=entries
+            ))
+            return {**updated, "oplog_ops": op_count}
+        
+        cls._update(name, path, append)
+    
+    @classmethod
+    def rank(
+        cls,
+        indexes: Dict[str, Dict[str, Any]],
+        text: str,
+        limit: int,
+        require_all: bool = False,
+        scored: bool = True
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Find the entries matching a text across several collections.
+        
+        BM25 statistics (entry count, average length, document frequency)
+        are taken over all given collections together, so scores compare
+        across files.
+        
+        Args:
+            indexes: Search index per logical file name
+            text: Search text, tokenized like the entries
+            limit: Maximum number of hits to return
+            require_all: Only entries containing every token (default: any)
+            scored: Rank by BM25; otherwise hits come in file and entry order
+        
+        Returns:
+            Tuple of (hits with file, position, id and score, number of
+            matching entries before the limit)
+        """
+        tokens = list(dict.fromkeys(cls.tokenize(text)))
+        if not tokens:
+            return [], 0
+        
+        entry_count = sum(len(index["docs"]) for index in indexes.values())
+        if scored:
+            total_length = sum(doc[1] for index in indexes.values() for doc in index["docs"])
+            average_length = total_length / entry_count if entry_count else 0.0
+            idf = {}
+            for token in tokens:
+                frequency = sum(len(index["terms"].get(token, ())) for index in indexes.values())
+                idf[token] = math.log(1 + (entry_count - frequency + 0.5) / (frequency + 0.5))
+        
+        candidates = []
+        for file_name in sorted(indexes):
+            index = indexes[file_name]
+            scores: Dict[int, float] = {}
+            hits: Counter = Counter()
+            for token in tokens:
+                for position, term_frequency in index["terms"].get(token, ()):
+                    hits[position] += 1
+                    if scored:
+                        length = index["docs"][position][1]
+                        norm = 1 - cls.B + cls.B * length / average_length if average_length else 1.0
+                        scores[position] = scores.get(position, 0.0) + idf[token] * (
+                            term_frequency * (cls.K1 + 1) / (term_frequency + cls.K1 * norm)
+                        )
+            for position in sorted(hits):
+                if require_all and hits[position] < len(tokens):
+                    continue
+                candidates.append((scores.get(position, 0.0), file_name, position, index["docs"][position][0]))
+        
+        if scored:
+            selected = heapq.nsmallest(limit, candidates, key=lambda hit: (-hit[0], hit[1], hit[2]))
+        else:
+            selected = candidates[:limit]
+        hits = [
+            {"file": file_name, "position": position, "id": entry_id, **({"score": round(score, 4)} if scored else {})}
+            for score, file_name, position, entry_id in selected
+        ]
+        return hits, len(candidates)
+    
+    @classmethod
+    def _update(cls, name: str, path: str, mutator) -> None:
+        try:
+            get_storage().update_json(path, mutator, default_factory=lambda: None)
+        except Exception as e:
+            # The data write already succeeded; a stale index is rebuilt by the next search
+            logging.warning(f"Could not update search index of '{name}': {str(e)}")
+    
+    @classmethod
+    def _add(cls, docs: List[list], terms: Dict[str, List[list]], position: int, entry: Any) -> None:
+        """Index the entry at `position`, which must be after every indexed one"""
+        tokens = cls.entry_tokens(entry)
+        docs.append([cls.entry_id(entry), len(tokens)])
+        for token, frequency in Counter(tokens).items():
+            terms.setdefault(token, []).append([position, frequency])
+    
+    @classmethod
+    def _apply_changes(cls, index: Dict[str, Any], changes: ChangeSet) -> Dict[str, Any]:
+        # Copy on write: the index document may be the shared cached copy
+        docs = list(index["docs"])
+        terms = dict(index["terms"])
+        touched = set()
+        
+        def postings(token: str) -> List[list]:
+            if token not in touched:
+                terms[token] = list(terms.get(token, []))
+                touched.add(token)
+            return terms[token]
+        
+        def drop(position: int, entry: Any) -> None:
+            for token in set(cls.entry_tokens(entry)):
+                postings(token)[:] = [posting for posting in postings(token) if posting[0] != position]
+        
+        for position, old_entry, new_entry in changes.updated:
+            drop(position, old_entry)
+            tokens = cls.entry_tokens(new_entry)
+            for token, frequency in Counter(tokens).items():
+                bisect.insort(postings(token), [position, frequency])
+            docs[position] = [cls.entry_id(new_entry), len(tokens)]
+        
+        removed = sorted(position for position, _ in changes.removed)
+        if removed:
+            for position, old_entry in changes.removed:
+                drop(position, old_entry)
+            for position in reversed(removed):
+                del docs[position]
+            # Entries after a removed one move up
+            terms = {
+                token: [[position - bisect.bisect_left(removed, position), frequency] for position, frequency in entries]
+                for token, entries in terms.items()
+            }
+        
+        start = changes.count - len(changes.appended)
+        if len(docs) == start:
+            for offset, entry in enumerate(changes.appended):
+                tokens = cls.entry_tokens(entry)
+                docs.append([cls.entry_id(entry), len(tokens)])
+                for token, frequency in Counter(tokens).items():
+                    postings(token).append([start + offset, frequency])
+        
+        return {**index, "docs": docs, "terms": {token: entries for token, entries in terms.items() if entries}}
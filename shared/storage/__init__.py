@@ -0,0 +1,68 @@
+"""
+Pluggable blob storage used by all function handlers.
+
+The backend is selected with the STORAGE_BACKEND setting:
+- "azure"  (default): Azure Blob Storage via the shared AzureBlobClient
+- "memory": process-local dictionary, for benchmarks and load tests
+- "local":  files under STORAGE_LOCAL_ROOT with memory-mapped reads
+"""
+import logging
+import threading
+from typing import Optional
+
+from ..config import AzureConfig, StorageConfig
+from .base import BlobInfo, JsonBlob, StorageBackend
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: str) -> StorageBackend:
+    """
+    Build a storage backend by name.
+    
+    Args:
+        backend: "azure", "memory" or "local"
+    
+    Returns:
+        New StorageBackend instance
+    """
+    if backend == "azure":
+        from .azure_backend import AzureStorageBackend
+        return AzureStorageBackend()
+    if backend == "memory":
+        from .memory_backend import MemoryStorageBackend
+        return MemoryStorageBackend()
+    if backend == "local":
+        from .local_backend import LocalStorageBackend
+        return LocalStorageBackend(StorageConfig.LOCAL_ROOT, AzureConfig.CONTAINER_NAME)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_storage() -> StorageBackend:
+    """Get or create the configured storage backend (singleton pattern)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(StorageConfig.BACKEND)
+                logging.info(f"Storage backend initialized: {_storage.name}")
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """Replace the process-wide backend (benchmarks, load tests); None resets to config"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+
+
+__all__ = [
+    "BlobInfo",
+    "JsonBlob",
+    "StorageBackend",
+    "create_storage",
+    "get_storage",
+    "set_storage",
+]
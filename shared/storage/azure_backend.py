@@ -0,0 +1,203 @@
+"""
+Azure Blob Storage backend
+"""
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError, ResourceModifiedError, ResourceNotFoundError
+from azure.storage.blob import BlobProperties, ContentSettings
+
+from ..async_azure_client import AsyncAzureBlobClient
+from ..azure_client import AzureBlobClient
+from ..config import AzureConfig
+from .base import BlobInfo, StorageBackend
+
+
+class AzureStorageBackend(StorageBackend):
+    """Storage backend on the shared AzureBlobClient / AsyncAzureBlobClient singletons"""
+    
+    name = "azure"
+    
+    # Polling interval while waiting for a server-side copy to finish
+    COPY_POLL_INTERVAL = 0.2
+    
+    # Sub-requests allowed in one Blob Batch request
+    BATCH_DELETE_SIZE = 256
+    
+    @staticmethod
+    def _to_info(properties: BlobProperties) -> BlobInfo:
+        content_settings = properties.content_settings
+        return BlobInfo(
+            name=properties.name,
+            size=properties.size,
+            etag=properties.etag,
+            last_modified=properties.last_modified,
+            content_type=content_settings.content_type if content_settings else None,
+            metadata=dict(properties.metadata or {}),
+            committed_block_count=properties.append_blob_committed_block_count,
+        )
+    
+    def download(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        blob_client = AzureBlobClient.get_blob_client(path)
+        if etag is None:
+            downloader = blob_client.download_blob(max_concurrency=AzureConfig.MAX_CONCURRENCY)
+        else:
+            downloader = blob_client.download_blob(
+                etag=etag,
+                match_condition=MatchConditions.IfModified,
+                max_concurrency=AzureConfig.MAX_CONCURRENCY
+            )
+        data = downloader.readall()
+        return data, self._to_info(downloader.properties)
+    
+    def open_stream(self, path: str) -> Tuple[BlobInfo, Iterator[bytes]]:
+        downloader = AzureBlobClient.get_blob_client(path).download_blob()
+        return self._to_info(downloader.properties), downloader.chunks()
+    
+    def upload(
+        self,
+        path: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        if_missing: bool = False,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        kwargs = {}
+        if etag is not None:
+            kwargs.update(etag=etag, match_condition=MatchConditions.IfNotModified)
+        result = AzureBlobClient.get_blob_client(path).upload_blob(
+            data,
+            overwrite=not if_missing,
+            metadata=metadata,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            max_concurrency=AzureConfig.MAX_CONCURRENCY,
+            **kwargs
+        )
+        self._written(path)
+        return result["etag"]
+    
+    def get_properties(self, path: str) -> BlobInfo:
+        return self._to_info(AzureBlobClient.get_blob_client(path).get_blob_properties())
+    
+    def delete(self, path: str) -> None:
+        AzureBlobClient.get_blob_client(path).delete_blob()
+        self._written(path)
+    
+    def delete_many(self, paths: List[str]) -> List[Optional[Exception]]:
+        container_client = AzureBlobClient.get_container_client()
+        results: List[Optional[Exception]] = []
+        for start in range(0, len(paths), self.BATCH_DELETE_SIZE):
+            chunk = paths[start:start + self.BATCH_DELETE_SIZE]
+            responses = container_client.delete_blobs(*chunk, raise_on_any_failure=False)
+            for path, response in zip(chunk, responses):
+                self._written(path)
+                if 200 <= response.status_code < 300:
+                    results.append(None)
+                elif response.status_code == 404:
+                    results.append(ResourceNotFoundError(f"Blob '{path}' not found", response=response))
+                else:
+                    results.append(HttpResponseError(response=response))
+        return results
+    
+    def list_blobs(self, prefix: str = "", include_metadata: bool = False) -> Iterator[BlobInfo]:
+        container_client = AzureBlobClient.get_container_client()
+        include = ["metadata"] if include_metadata else None
+        for properties in container_client.list_blobs(name_starts_with=prefix, include=include):
+            yield self._to_info(properties)
+    
+    def list_page(
+        self,
+        prefix: str,
+        max_results: int,
+        marker: Optional[str] = None,
+        include_metadata: bool = False
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        container_client = AzureBlobClient.get_container_client()
+        include = ["metadata"] if include_metadata else None
+        pages = container_client.list_blobs(
+            name_starts_with=prefix,
+            include=include,
+            results_per_page=max_results
+        ).by_page(continuation_token=marker)
+        infos = [self._to_info(properties) for properties in next(pages, [])]
+        return infos, pages.continuation_token or None
+    
+    def copy(self, source_path: str, target_path: str) -> None:
+        source_client = AzureBlobClient.get_blob_client(source_path)
+        target_client = AzureBlobClient.get_blob_client(target_path)
+        target_client.start_copy_from_url(source_client.url)
+        
+        # Server-side copies may complete asynchronously; wait before returning
+        copy_props = target_client.get_blob_properties().copy
+        while copy_props.status == "pending":
+            time.sleep(self.COPY_POLL_INTERVAL)
+            copy_props = target_client.get_blob_properties().copy
+        if copy_props.status not in (None, "success"):
+            raise RuntimeError(
+                f"Copy of '{source_path}' to '{target_path}' ended with status "
+                f"'{copy_props.status}': {copy_props.status_description}"
+            )
+        self._written(target_path)
+    
+    def create_append_blob(
+        self,
+        path: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> None:
+        AzureBlobClient.get_blob_client(path).create_append_blob(
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            metadata=metadata,
+            match_condition=MatchConditions.IfMissing
+        )
+        self._written(path)
+    
+    def append_block(self, path: str, data: bytes, append_position: Optional[int] = None) -> int:
+        try:
+            result = AzureBlobClient.get_blob_client(path).append_block(data, appendpos_condition=append_position)
+        except HttpResponseError as e:
+            if e.error_code == "BlobIsSealed":
+                raise ResourceModifiedError(f"The blob is sealed: {path}") from e
+            if e.error_code == "AppendPositionConditionNotMet":
+                raise ResourceModifiedError(f"The append position condition was not met: {path}") from e
+            raise
+        self._written(path)
+        return result["blob_committed_block_count"]
+    
+    def seal_append_blob(self, path: str) -> None:
+        AzureBlobClient.get_blob_client(path).seal_append_blob()
+    
+    async def adownload(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        data, properties = await AsyncAzureBlobClient.download_blob(path, etag=etag)
+        return data, self._to_info(properties)
+    
+    async def alist(self, prefix: str = "", include_metadata: bool = False) -> List[BlobInfo]:
+        container_client = AsyncAzureBlobClient.get_container_client()
+        include = ["metadata"] if include_metadata else None
+        return [
+            self._to_info(properties)
+            async for properties in container_client.list_blobs(name_starts_with=prefix, include=include)
+        ]
+    
+    async def alist_page(
+        self,
+        prefix: str,
+        max_results: int,
+        marker: Optional[str] = None,
+        include_metadata: bool = False
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        container_client = AsyncAzureBlobClient.get_container_client()
+        include = ["metadata"] if include_metadata else None
+        pages = container_client.list_blobs(
+            name_starts_with=prefix,
+            include=include,
+            results_per_page=max_results
+        ).by_page(continuation_token=marker)
+        try:
+            page = await pages.__anext__()
+        except StopAsyncIteration:
+            return [], None
+        infos = [self._to_info(properties) async for properties in page]
+        return infos, pages.continuation_token or None
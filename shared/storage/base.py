@@ -0,0 +1,847 @@
+"""
+Storage backend interface shared by all function handlers
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+from ..azure_client import ConcurrencyConflictError
+from ..config import AzureConfig, StorageConfig, UserNamespace
+from .cache import BlobCache, CachedBlob, ListingCache, ResultCache
+from .encoding import PRETTY, EncodedDocument, blob_encoding, decode_blob, decode_chunks, encode_json
+from .json_stream import iter_array
+
+
+@dataclass
+class BlobInfo:
+    """Backend-neutral blob properties"""
+    name: str
+    size: int
+    etag: str
+    last_modified: Optional[datetime] = None
+    content_type: Optional[str] = None
+    metadata: Dict[str, str] = field(default_factory=dict)
+    committed_block_count: Optional[int] = None
+
+
+@dataclass
+class JsonBlob:
+    """
+    An opened JSON blob: either the parsed `document`, or for large arrays a
+    lazy iterator over the `items` parsed while the blob streams in.
+    """
+    etag: str
+    document: Any = None
+    items: Optional[Iterator[Any]] = None
+    
+    @property
+    def streaming(self) -> bool:
+        return self.items is not None
+
+
+def _encode_token(marker: Optional[str], skip: int) -> str:
+    """Opaque continuation token: backend page marker plus blobs already returned from that page"""
+    return base64.urlsafe_b64encode(json.dumps([marker, skip]).encode('utf-8')).decode('ascii')
+
+
+def _decode_token(token: Optional[str]) -> Tuple[Optional[str], int]:
+    if not token:
+        return None, 0
+    try:
+        marker, skip = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid continuation_token")
+    if (marker is not None and not isinstance(marker, str)) or not isinstance(skip, int) or skip < 0:
+        raise ValueError("Invalid continuation_token")
+    return marker, skip
+
+
+class StorageBackend(ABC):
+    """
+    Blob-style storage with ETags, metadata and append blobs.
+    
+    Backends implement a handful of primitives on full (already namespaced)
+    blob names and raise the azure.core exceptions handlers already catch:
+    ResourceNotFoundError, ResourceNotModifiedError (304),
+    ResourceModifiedError (412) and ResourceExistsError (409).
+    
+    The JSON document helpers (`read_json`, `update_json`, ...) are built on
+    those primitives, take the same `(blob_name, user_id)` arguments as
+    AzureBlobClient and apply user namespacing when `user_id` is given.
+    Documents are written in StorageConfig.JSON_ENCODING, and every cached
+    read decodes according to the blob's `json_encoding` metadata, so plain
+    and compressed blobs can be mixed freely.
+    """
+    
+    name = "abstract"
+    
+    def __init__(self):
+        self._cache = BlobCache(AzureConfig.BLOB_CACHE_MAX_BYTES, AzureConfig.BLOB_CACHE_MAX_ENTRIES)
+        self._listings = ListingCache(StorageConfig.LIST_CACHE_TTL, StorageConfig.LIST_CACHE_MAX_ENTRIES)
+        self._results = ResultCache(StorageConfig.RESULT_CACHE_MAX_BYTES, StorageConfig.RESULT_CACHE_MAX_ENTRIES)
+    
+    @abstractmethod
+    def download(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        """
+        Download a blob's content and properties.
+        
+        Args:
+            path: Full blob name
+            etag: If given, raise ResourceNotModifiedError while the blob still has this ETag
+        
+        Returns:
+            Tuple of (content, properties)
+        """
+    
+    @abstractmethod
+    def upload(
+        self,
+        path: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        if_missing: bool = False,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Create or overwrite a blob.
+        
+        Args:
+            path: Full blob name
+            data: Content to store
+            etag: Only overwrite while the blob still has this ETag (If-Match)
+            if_missing: Only create, never overwrite (If-None-Match: *)
+            content_type: MIME type stored with the blob
+            metadata: Blob metadata (replaces existing metadata)
+        
+        Returns:
+            ETag of the written blob
+        """
+    
+    @abstractmethod
+    def get_properties(self, path: str) -> BlobInfo:
+        """Return the properties of a blob (ResourceNotFoundError if missing)"""
+    
+    @abstractmethod
+    def delete(self, path: str) -> None:
+        """Delete a blob (ResourceNotFoundError if missing)"""
+    
+    @abstractmethod
+    def list_blobs(self, prefix: str = "", include_metadata: bool = False) -> Iterator[BlobInfo]:
+        """
+        Iterate over blobs whose full name starts with `prefix`, in name order.
+        
+        Like Azure's List Blobs, results do not carry `committed_block_count`;
+        append blob block counts need `get_properties`.
+        """
+    
+    def list_page(
+        self,
+        prefix: str,
+        max_results: int,
+        marker: Optional[str] = None,
+        include_metadata: bool = False
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        """
+        One page of `list_blobs`.
+        
+        Backends override this with server-side paging; the default resumes
+        after the last name of the previous page.
+        
+        Args:
+            prefix: Full blob name prefix
+            max_results: Largest number of blobs to return
+            marker: Marker returned with the previous page
+            include_metadata: Fill in blob metadata
+        
+        Returns:
+            Tuple of (blobs, marker of the next page or None after the last one)
+        """
+        infos: List[BlobInfo] = []
+        for info in self.list_blobs(prefix, include_metadata):
+            if marker is not None and info.name <= marker:
+                continue
+            if len(infos) == max_results:
+                return infos, infos[-1].name
+            infos.append(info)
+        return infos, None
+    
+    @abstractmethod
+    def copy(self, source_path: str, target_path: str) -> None:
+        """Copy a blob (overwriting the target) and wait until the copy is complete"""
+    
+    @abstractmethod
+    def create_append_blob(
+        self,
+        path: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Create an empty append blob (ResourceExistsError if it already exists)"""
+    
+    @abstractmethod
+    def append_block(self, path: str, data: bytes, append_position: Optional[int] = None) -> int:
+        """
+        Append one block to an existing append blob.
+        
+        Args:
+            path: Full blob name
+            data: Block content
+            append_position: Only append if the blob is exactly this many bytes long
+        
+        Returns:
+            Number of committed blocks after the append
+        
+        Raises:
+            ResourceModifiedError: If the blob has been sealed or its length
+                                   does not match `append_position`
+        """
+    
+    @abstractmethod
+    def seal_append_blob(self, path: str) -> None:
+        """Make an append blob read-only; later appends fail, sealing again is a no-op"""
+    
+    def open_stream(self, path: str) -> Tuple[BlobInfo, Iterator[bytes]]:
+        """
+        Start streaming a blob's stored content in chunks.
+        
+        Properties are fetched up front (ResourceNotFoundError is raised here,
+        not while iterating) so callers can pick a decoder before reading.
+        Backends override this to avoid buffering the whole blob.
+        
+        Returns:
+            Tuple of (properties, iterator over content chunks)
+        """
+        data, info = self.download(path)
+        return info, iter([data])
+    
+    def delete_many(self, paths: List[str]) -> List[Optional[Exception]]:
+        """
+        Delete several blobs, reporting a result per blob instead of stopping at
+        the first failure. Backends override this to batch the requests.
+        
+        Returns:
+            For each path, None if it was deleted or the exception it failed with
+        """
+        results: List[Optional[Exception]] = []
+        for path in paths:
+            try:
+                self.delete(path)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    async def adownload(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        """Async `download`; runs the sync primitive in a worker thread by default"""
+        return await asyncio.to_thread(self.download, path, etag)
+    
+    async def alist(self, prefix: str = "", include_metadata: bool = False) -> List[BlobInfo]:
+        """Async `list_blobs`; runs the sync primitive in a worker thread by default"""
+        return await asyncio.to_thread(lambda: list(self.list_blobs(prefix, include_metadata)))
+    
+    async def alist_page(
+        self,
+        prefix: str,
+        max_results: int,
+        marker: Optional[str] = None,
+        include_metadata: bool = False
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        """Async `list_page`; runs the sync primitive in a worker thread by default"""
+        return await asyncio.to_thread(self.list_page, prefix, max_results, marker, include_metadata)
+    
+    @staticmethod
+    def blob_path(blob_name: str, user_id: Optional[str] = None) -> str:
+        """Full blob name, namespaced under the user's prefix when user_id is given"""
+        if user_id:
+            return UserNamespace.get_user_blob_name(user_id, blob_name)
+        return blob_name
+    
+    def exists(self, blob_name: str, user_id: Optional[str] = None) -> bool:
+        """Check if a blob exists"""
+        try:
+            self.get_properties(self.blob_path(blob_name, user_id))
+            return True
+        except ResourceNotFoundError:
+            return False
+    
+    def list_user_blobs(self, user_id: str, prefix: Optional[str] = None) -> List[str]:
+        """
+        List all blobs for a specific user.
+        
+        Args:
+            user_id: User ID to filter by
+            prefix: Optional prefix filter within user namespace
+        
+        Returns:
+            List of blob names (without user prefix, just filenames)
+        """
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        return [
+            info.name[len(user_namespace_prefix):]
+            for info in self.list_blobs(f"{user_namespace_prefix}{prefix or ''}")
+            if len(info.name) > len(user_namespace_prefix)
+        ]
+    
+    async def alist_user_blobs(self, user_id: str, prefix: Optional[str] = None) -> List[str]:
+        """Async `list_user_blobs`"""
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        infos = await self.alist(f"{user_namespace_prefix}{prefix or ''}")
+        return [
+            info.name[len(user_namespace_prefix):]
+            for info in infos
+            if len(info.name) > len(user_namespace_prefix)
+        ]
+    
+    def list_user_page(
+        self,
+        user_id: str,
+        prefix: Optional[str] = None,
+        max_results: Optional[int] = None,
+        continuation_token: Optional[str] = None,
+        visible: Optional[Callable[[str], bool]] = None
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        """
+        List a user's blobs a page at a time.
+        
+        Pages are filled up to `max_results` visible blobs even when hidden
+        ones are skipped; the continuation token records the backend's page
+        marker and how many visible blobs of that page were already returned.
+        Pages are cached for StorageConfig.LIST_CACHE_TTL seconds.
+        
+        Args:
+            user_id: User ID to filter by
+            prefix: Optional prefix filter within user namespace
+            max_results: Page size (None lists everything in one page)
+            continuation_token: Token returned with the previous page
+            visible: Optional filter on names (without user prefix)
+        
+        Returns:
+            Tuple of (blob properties named without user prefix, token of the
+            next page or None after the last one)
+        
+        Raises:
+            ValueError: If the continuation token is malformed
+        """
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        full_prefix = f"{user_namespace_prefix}{prefix or ''}"
+        key = (full_prefix, max_results, continuation_token, visible)
+        cached = self._listings.get(key)
+        if cached is not None:
+            return cached
+        
+        relative = self._relative(user_namespace_prefix, visible)
+        if max_results is None:
+            page = (relative(self.list_blobs(full_prefix)), None)
+        else:
+            page = self._fill_page(full_prefix, max_results, continuation_token, relative)
+        self._listings.put(key, full_prefix, page)
+        return page
+    
+    async def alist_user_page(
+        self,
+        user_id: str,
+        prefix: Optional[str] = None,
+        max_results: Optional[int] = None,
+        continuation_token: Optional[str] = None,
+        visible: Optional[Callable[[str], bool]] = None
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        """Async `list_user_page`, listing through `alist` / `alist_page`"""
+        user_namespace_prefix = UserNamespace.get_user_prefix(user_id)
+        full_prefix = f"{user_namespace_prefix}{prefix or ''}"
+        key = (full_prefix, max_results, continuation_token, visible)
+        cached = self._listings.get(key)
+        if cached is not None:
+            return cached
+        
+        relative = self._relative(user_namespace_prefix, visible)
+        if max_results is None:
+            page = (relative(await self.alist(full_prefix)), None)
+        else:
+            page = await self._afill_page(full_prefix, max_results, continuation_token, relative)
+        self._listings.put(key, full_prefix, page)
+        return page
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters of the in-process blob cache"""
+        return self._cache.stats()
+    
+    def listing_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters of the in-process listing cache"""
+        return self._listings.stats()
+    
+    def result_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction/invalidation counters of the in-process result cache"""
+        return self._results.stats()
+    
+    def cached_result(self, key: Any, version: Any) -> Optional[Any]:
+        """
+        A result stored with `cache_result` for the same version, or None.
+        
+        Args:
+            key: Hashable key of the computation (e.g. blob path and normalized query)
+            version: Hashable version of the blobs it reads (e.g. their ETags)
+        """
+        return self._results.get(key, version)
+    
+    def cache_result(self, key: Any, version: Any, value: Any, paths: List[str]) -> bool:
+        """
+        Keep a JSON-serializable result computed from a version of some blobs.
+        
+        Writes to any of `paths` (full blob names) on this instance drop it;
+        results larger than the memory budget are not kept.
+        
+        Returns:
+            True if the result was stored
+        """
+        if self._results.max_bytes <= 0:
+            return False
+        size = len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        return self._results.put(key, version, value, size, paths)
+    
+    def _written(self, path: str) -> None:
+        """Called by backends after creating, changing or deleting a blob"""
+        self._listings.invalidate(path)
+        self._results.invalidate(path)
+    
+    @staticmethod
+    def _relative(
+        user_namespace_prefix: str,
+        visible: Optional[Callable[[str], bool]]
+    ) -> Callable[[Iterable[BlobInfo]], List[BlobInfo]]:
+        """Filter of listed blobs renaming them relative to the user namespace"""
+        def relative(infos: Iterable[BlobInfo]) -> List[BlobInfo]:
+            named = [
+                replace(info, name=info.name[len(user_namespace_prefix):])
+                for info in infos
+                if len(info.name) > len(user_namespace_prefix)
+            ]
+            return [info for info in named if visible is None or visible(info.name)]
+        return relative
+    
+    def _fill_page(
+        self,
+        prefix: str,
+        max_results: int,
+        continuation_token: Optional[str],
+        relative: Callable[[Iterable[BlobInfo]], List[BlobInfo]]
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        marker, skip = _decode_token(continuation_token)
+        results: List[BlobInfo] = []
+        while True:
+            infos, next_marker = self.list_page(prefix, max_results, marker)
+            page = self._take(results, relative(infos), skip, max_results, marker, next_marker)
+            if page is not None:
+                return page
+            marker, skip = next_marker, 0
+    
+    async def _afill_page(
+        self,
+        prefix: str,
+        max_results: int,
+        continuation_token: Optional[str],
+        relative: Callable[[Iterable[BlobInfo]], List[BlobInfo]]
+    ) -> Tuple[List[BlobInfo], Optional[str]]:
+        """Async `_fill_page`"""
+        marker, skip = _decode_token(continuation_token)
+        results: List[BlobInfo] = []
+        while True:
+            infos, next_marker = await self.alist_page(prefix, max_results, marker)
+            page = self._take(results, relative(infos), skip, max_results, marker, next_marker)
+            if page is not None:
+                return page
+            marker, skip = next_marker, 0
+    
+    @staticmethod
+    def _take(
+        results: List[BlobInfo],
+        shown: List[BlobInfo],
+        skip: int,
+        max_results: int,
+        marker: Optional[str],
+        next_marker: Optional[str]
+    ) -> Optional[Tuple[List[BlobInfo], Optional[str]]]:
+        """Add one backend page to `results`; returns the finished page, or None to list the next one"""
+        shown = shown[skip:]
+        wanted = max_results - len(results)
+        results.extend(shown[:wanted])
+        if len(shown) > wanted:
+            # Resume inside this backend page next time
+            return results, _encode_token(marker, skip + wanted)
+        if next_marker is None:
+            return results, None
+        if len(results) == max_results:
+            return results, _encode_token(next_marker, 0)
+        return None
+    
+    def _download_cached(self, path: str) -> CachedBlob:
+        """Download a blob, reusing the cached copy while its ETag is unchanged"""
+        cached = self._cache.get(path)
+        try:
+            data, info = self.download(path, etag=cached.etag if cached else None)
+        except ResourceNotModifiedError:
+            self._cache.record(hit=True)
+            return cached
+        except ResourceNotFoundError:
+            self._cache.invalidate(path)
+            raise
+        
+        self._cache.record(hit=False)
+        entry = CachedBlob(etag=info.etag, data=decode_blob(data, info.metadata))
+        self._cache.put(path, entry)
+        return entry
+    
+    async def _adownload_cached(self, path: str) -> CachedBlob:
+        """Async `_download_cached`"""
+        cached = self._cache.get(path)
+        try:
+            data, info = await self.adownload(path, etag=cached.etag if cached else None)
+        except ResourceNotModifiedError:
+            self._cache.record(hit=True)
+            return cached
+        except ResourceNotFoundError:
+            self._cache.invalidate(path)
+            raise
+        
+        self._cache.record(hit=False)
+        entry = CachedBlob(etag=info.etag, data=decode_blob(data, info.metadata))
+        self._cache.put(path, entry)
+        return entry
+    
+    def read_bytes(self, blob_name: str, user_id: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Download a blob's raw content through the in-process cache.
+        
+        Args:
+            blob_name: Name of the blob
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            Tuple of (content, etag)
+        
+        Raises:
+            ResourceNotFoundError: If the blob does not exist
+        """
+        entry = self._download_cached(self.blob_path(blob_name, user_id))
+        return entry.data, entry.etag
+    
+    async def aread_bytes(self, blob_name: str, user_id: Optional[str] = None) -> Tuple[bytes, str]:
+        """Async `read_bytes`"""
+        entry = await self._adownload_cached(self.blob_path(blob_name, user_id))
+        return entry.data, entry.etag
+    
+    def read_json(
+        self,
+        blob_name: str,
+        user_id: Optional[str] = None,
+        default: Any = None
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Download and parse a JSON blob together with its ETag.
+        
+        Parsed documents are cached and shared between callers, so the
+        returned document must not be modified in place.
+        
+        Args:
+            blob_name: Name of the blob
+            user_id: Optional user ID for namespace isolation
+            default: Value returned when the blob does not exist
+        
+        Returns:
+            Tuple of (parsed document, etag); etag is None if the blob is missing
+        """
+        try:
+            entry = self._download_cached(self.blob_path(blob_name, user_id))
+        except ResourceNotFoundError:
+            return default, None
+        return entry.json(), entry.etag
+    
+    def open_json(self, blob_name: str, user_id: Optional[str] = None) -> JsonBlob:
+        """
+        Open a JSON blob, streaming it when it is too large to parse at once.
+        
+        Blobs already in the cache, and blobs stored smaller than
+        StorageConfig.STREAM_MIN_BYTES, are read through the cache like
+        `read_json`. Larger blobs are not buffered: `items` parses the array
+        elements as the chunks arrive, so peak memory stays at roughly one
+        chunk plus whatever the caller keeps. Iterating `items` raises
+        NotJsonArrayError if the document turns out not to be an array.
+        
+        Args:
+            blob_name: Name of the blob
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            JsonBlob with either `document` or `items` set
+        
+        Raises:
+            ResourceNotFoundError: If the blob does not exist
+        """
+        path = self.blob_path(blob_name, user_id)
+        if self._cache.get(path) is not None:
+            entry = self._download_cached(path)
+            return JsonBlob(etag=entry.etag, document=entry.json())
+        
+        info, chunks = self.open_stream(path)
+        if info.size >= StorageConfig.STREAM_MIN_BYTES:
+            return JsonBlob(etag=info.etag, items=iter_array(decode_chunks(chunks, info.metadata)))
+        
+        self._cache.record(hit=False)
+        entry = CachedBlob(etag=info.etag, data=decode_blob(b"".join(chunks), info.metadata))
+        self._cache.put(path, entry)
+        return JsonBlob(etag=entry.etag, document=entry.json())
+    
+    async def aread_json(
+        self,
+        blob_name: str,
+        user_id: Optional[str] = None,
+        default: Any = None
+    ) -> Tuple[Any, Optional[str]]:
+        """Async `read_json`"""
+        try:
+            entry = await self._adownload_cached(self.blob_path(blob_name, user_id))
+        except ResourceNotFoundError:
+            return default, None
+        return entry.json(), entry.etag
+    
+    def write_bytes(
+        self,
+        blob_name: str,
+        data: bytes,
+        user_id: Optional[str] = None,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Unconditionally create or overwrite a blob.
+        
+        Args:
+            blob_name: Name of the blob
+            data: Content to store
+            user_id: Optional user ID for namespace isolation
+            content_type: MIME type stored with the blob
+            metadata: Optional blob metadata
+        
+        Returns:
+            ETag of the written blob
+        """
+        path = self.blob_path(blob_name, user_id)
+        etag = self.upload(path, data, content_type=content_type, metadata=metadata)
+        self._cache.put(path, CachedBlob(etag=etag, data=data))
+        return etag
+    
+    def write_json(self, blob_name: str, document: Any, user_id: Optional[str] = None) -> str:
+        """
+        Unconditionally write a JSON document in the configured storage encoding.
+        
+        Args:
+            blob_name: Name of the blob
+            document: JSON-serializable document
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            ETag of the written blob
+        """
+        return self.write_encoded(blob_name, encode_json(document, StorageConfig.JSON_ENCODING), user_id, document)
+    
+    def write_encoded(
+        self,
+        blob_name: str,
+        encoded: EncodedDocument,
+        user_id: Optional[str] = None,
+        document: Any = None
+    ) -> str:
+        """
+        Unconditionally write a document already encoded with `encode_json`.
+        
+        Args:
+            blob_name: Name of the blob
+            encoded: Encoded document (payload, content type and metadata)
+            user_id: Optional user ID for namespace isolation
+            document: The parsed document, cached alongside the bytes if given
+        
+        Returns:
+            ETag of the written blob
+        """
+        path = self.blob_path(blob_name, user_id)
+        etag = self.upload(path, encoded.payload, content_type=encoded.content_type, metadata=encoded.metadata)
+        entry = CachedBlob(etag=etag, data=encoded.raw)
+        if document is not None:
+            entry.document = document
+        self._cache.put(path, entry)
+        return etag
+    
+    def reencode_json(self, path: str, encoding: str) -> bool:
+        """
+        Rewrite a JSON blob in another storage encoding, keeping its content.
+        
+        Blobs that are already in `encoding`, append blobs and blobs that do not
+        parse as JSON are left alone. The rewrite is conditional on the ETag, so
+        a concurrent writer always wins.
+        
+        Args:
+            path: Full blob name
+            encoding: Target encoding (see shared/storage/encoding.py)
+        
+        Returns:
+            True if the blob was rewritten
+        """
+        data, info = self.download(path)
+        if info.committed_block_count is not None or (blob_encoding(info.metadata) or PRETTY) == encoding:
+            return False
+        
+        try:
+            document = json.loads(decode_blob(data, info.metadata).decode('utf-8'))
+        except ValueError:
+            return False
+        
+        encoded = encode_json(document, encoding)
+        try:
+            new_etag = self.upload(
+                path,
+                encoded.payload,
+                etag=info.etag,
+                content_type=encoded.content_type,
+                metadata={**info.metadata, **encoded.metadata}
+            )
+        except ResourceModifiedError:
+            return False
+        
+        self._cache.put(path, CachedBlob(etag=new_etag, data=encoded.raw, document=document))
+        return True
+    
+    def delete_blob(self, blob_name: str, user_id: Optional[str] = None) -> None:
+        """Delete a blob (ResourceNotFoundError if missing)"""
+        path = self.blob_path(blob_name, user_id)
+        self._cache.invalidate(path)
+        self.delete(path)
+    
+    def delete_blobs(self, blob_names: List[str], user_id: Optional[str] = None) -> List[Optional[Exception]]:
+        """Delete several blobs; see `delete_many` (missing blobs give ResourceNotFoundError)"""
+        paths = [self.blob_path(blob_name, user_id) for blob_name in blob_names]
+        for path in paths:
+            self._cache.invalidate(path)
+        return self.delete_many(paths)
+    
+    def copy_blob(
+        self,
+        source_name: str,
+        target_name: str,
+        user_id: Optional[str] = None
+    ) -> None:
+        """Copy a blob within the same namespace and wait for completion"""
+        target_path = self.blob_path(target_name, user_id)
+        self._cache.invalidate(target_path)
+        self.copy(self.blob_path(source_name, user_id), target_path)
+    
+    def update_json(
+        self,
+        blob_name: str,
+        mutator: Callable[[Any], Any],
+        user_id: Optional[str] = None,
+        default_factory: Callable[[], Any] = list
+    ) -> Any:
+        """
+        Read-modify-write a JSON blob; see `update_json_versioned`.
+        
+        Returns:
+            The document that was written, or None if the mutator skipped the write
+        """
+        document, _, _ = self.update_json_versioned(blob_name, mutator, user_id, default_factory)
+        return document
+    
+    def update_json_versioned(
+        self,
+        blob_name: str,
+        mutator: Callable[[Any], Any],
+        user_id: Optional[str] = None,
+        default_factory: Callable[[], Any] = list,
+        metadata_factory: Optional[Callable[[Any], Dict[str, str]]] = None
+    ) -> Tuple[Any, Optional[str], Optional[str]]:
+        """
+        Read-modify-write a JSON blob with ETag-based optimistic concurrency.
+        
+        The blob is read together with its ETag, passed to `mutator`, and written
+        back with `If-Match` (or `If-None-Match: *` when it did not exist yet).
+        If another writer got there first (412/409), the blob is re-read and the
+        mutator re-applied after a jittered exponential backoff. The mutator
+        must therefore be safe to call more than once, and it must not modify
+        its argument in place (it may be the shared cached copy): build and
+        return a new document instead. A mutator that finds its input stale
+        (e.g. a blob it references was already replaced) may raise
+        ResourceModifiedError to force a re-read.
+        
+        Args:
+            blob_name: Name of the blob
+            mutator: Receives the current document and returns the new document
+                     to store, or None to leave the blob untouched
+            user_id: Optional user ID for namespace isolation
+            default_factory: Builds the initial document when the blob is missing
+            metadata_factory: Optional extra blob metadata derived from the new document
+        
+        Returns:
+            Tuple of (written document, ETag the write was based on, new ETag);
+            (None, ETag read, None) if the mutator skipped the write
+        
+        Raises:
+            ConcurrencyConflictError: If the write kept conflicting after
+                                      AzureConfig.WRITE_MAX_ATTEMPTS attempts
+        """
+        path = self.blob_path(blob_name, user_id)
+        
+        for attempt in range(AzureConfig.WRITE_MAX_ATTEMPTS):
+            document, etag = self.read_json(path)
+            if etag is None:
+                document = default_factory()
+            
+            try:
+                updated = mutator(document)
+                if updated is None:
+                    return None, etag, None
+                
+                encoded = encode_json(updated, StorageConfig.JSON_ENCODING)
+                if metadata_factory is not None:
+                    encoded.metadata.update(metadata_factory(updated))
+                new_etag = self.upload(
+                    path,
+                    encoded.payload,
+                    etag=etag,
+                    if_missing=etag is None,
+                    content_type=encoded.content_type,
+                    metadata=encoded.metadata
+                )
+                # Write-through so the next read on this worker is a 304
+                self._cache.put(path, CachedBlob(etag=new_etag, data=encoded.raw, document=updated))
+                return updated, etag, new_etag
+            except (ResourceModifiedError, ResourceExistsError):
+                logging.info(
+                    f"Write conflict on {path} "
+                    f"(attempt {attempt + 1}/{AzureConfig.WRITE_MAX_ATTEMPTS}), re-merging"
+                )
+                if attempt < AzureConfig.WRITE_MAX_ATTEMPTS - 1:
+                    # Back off only before another attempt, not before giving up
+                    delay = min(
+                        AzureConfig.WRITE_RETRY_MAX_DELAY,
+                        AzureConfig.WRITE_RETRY_BASE_DELAY * (2 ** attempt)
+                    )
+                    time.sleep(random.uniform(0, delay))
+        
+        raise ConcurrencyConflictError(
+            f"Blob '{blob_name}' was modified concurrently; gave up after "
+            f"{AzureConfig.WRITE_MAX_ATTEMPTS} attempts"
+        )
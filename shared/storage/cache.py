@@ -0,0 +1,259 @@
+"""
+In-process caches: downloaded blobs (revalidated by ETag), listing pages (short TTL) and results computed from them
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+_UNPARSED = object()
+
+
+@dataclass
+class CachedBlob:
+    """A downloaded blob kept in the in-process cache"""
+    etag: str
+    data: bytes
+    document: Any = _UNPARSED
+    
+    def json(self) -> Any:
+        """Parsed JSON content, decoded once and then reused"""
+        if self.document is _UNPARSED:
+            self.document = json.loads(self.data.decode('utf-8'))
+        return self.document
+
+
+class BlobCache:
+    """
+    Size-bounded LRU cache of downloaded blobs, keyed by namespaced blob name.
+    
+    Entries are revalidated with a conditional GET (If-None-Match) on every
+    read, so a hit still costs one round-trip but skips the transfer and the
+    JSON parse. Cached documents are shared between callers and must be
+    treated as read-only.
+    """
+    
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedBlob]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[CachedBlob]:
+        """Return the cached entry (without counting a hit) and mark it recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key: str, entry: CachedBlob) -> None:
+        """Insert or replace an entry, evicting least recently used ones as needed"""
+        with self._lock:
+            self._remove(key)
+            if len(entry.data) > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += len(entry.data)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.data)
+                self.evictions += 1
+    
+    def invalidate(self, key: str) -> None:
+        """Drop an entry, e.g. after the blob was deleted"""
+        with self._lock:
+            self._remove(key)
+    
+    def record(self, hit: bool) -> None:
+        """Count a read as served from cache (304) or downloaded"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+    
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.data)
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of results computed from blobs, such as counts and query results.
+    
+    Each result is stored with a version (e.g. the ETags it was computed
+    from), which the caller passes again on lookup: a result stored for
+    another version is dropped instead of returned. Results also list the
+    full blob names they depend on; backends report every blob they create,
+    change or delete, which drops the dependent results right away. Sizes
+    are estimates supplied by the caller. Cached results are shared between
+    callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Any, int, Tuple[str, ...]]]" = OrderedDict()
+        self._by_path: Dict[str, set] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Return the result stored for `version`, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: Hashable, version: Hashable, value: Any, size: int, paths: Iterable[str] = ()) -> bool:
+        """Store a result, evicting least recently used ones as needed; False if it exceeds the budget"""
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return False
+            paths = tuple(paths)
+            self._entries[key] = (version, value, size, paths)
+            self._size += size
+            for path in paths:
+                self._by_path.setdefault(path, set()).add(key)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+    
+    def invalidate(self, path: str) -> None:
+        """Drop the results depending on a blob"""
+        with self._lock:
+            for key in list(self._by_path.get(path, ())):
+                self._remove(key)
+                self.invalidations += 1
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._by_path.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction/invalidation counters and current occupancy"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+    
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry[2]
+        for path in entry[3]:
+            keys = self._by_path.get(path)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_path[path]
+
+
+class ListingCache:
+    """
+    LRU cache of listing pages that expire after a few seconds.
+    
+    Each page is stored with the prefix it was listed under. Backends report
+    every blob they create, change or delete, which drops the pages whose
+    prefix covers it, so an instance always sees its own writes; writes from
+    other instances show up once the TTL has passed.
+    """
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a page that has not expired yet, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+    
+    def put(self, key: Hashable, prefix: str, value: Any) -> None:
+        """Store a page listed under `prefix` (no-op with a TTL of 0)"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, prefix, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, path: str) -> None:
+        """Drop the pages whose listing could include `path`"""
+        with self._lock:
+            if not self._entries:
+                return
+            for key in [key for key, (_, prefix, _) in self._entries.items() if path.startswith(prefix)]:
+                del self._entries[key]
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
@@ -0,0 +1,98 @@
+"""
+Per-instance write combining: concurrent writes to the same blob share one commit
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class _Batch:
+    items: List[Any] = field(default_factory=list)
+    done: threading.Event = field(default_factory=threading.Event)
+    results: Optional[List[Any]] = None
+    error: Optional[BaseException] = None
+
+
+class WriteCoalescer:
+    """
+    Group commit for read-modify-write cycles on one blob.
+    
+    The first writer for a key becomes the batch leader: it waits `window`
+    seconds, then for any commit already running on the same key, closes the
+    batch and commits every item that joined it with a single call. Writers
+    that joined the batch block until that commit finishes and receive their
+    own result (or the commit's exception). Items keep their arrival order.
+    """
+    
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._open: Dict[str, _Batch] = {}
+        # key -> [commit lock, number of leaders using it]
+        self._commit_locks: Dict[str, list] = {}
+        self._commits = 0
+        self._items = 0
+    
+    def submit(self, key: str, item: Any, commit: Callable[[List[Any]], List[Any]]) -> Any:
+        """
+        Add an item to the open batch of `key` and wait for it to be committed.
+        
+        Args:
+            key: Identity of the written blob (e.g. its namespaced path)
+            item: Item to write
+            commit: Writes a list of items and returns one result per item;
+                    called once per batch, by the batch leader's thread
+        
+        Returns:
+            The result `commit` produced for this item
+        """
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._open[key] = batch
+                commit_lock = self._commit_locks.setdefault(key, [threading.Lock(), 0])
+                commit_lock[1] += 1
+            slot = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                # Full: later writers start the next batch
+                del self._open[key]
+        
+        if not leader:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+            return batch.results[slot]
+        
+        if self.window > 0:
+            time.sleep(self.window)
+        try:
+            with commit_lock[0]:
+                with self._lock:
+                    if self._open.get(key) is batch:
+                        del self._open[key]
+                    self._commits += 1
+                    self._items += len(batch.items)
+                try:
+                    batch.results = commit(list(batch.items))
+                except BaseException as e:
+                    batch.error = e
+                    raise
+                finally:
+                    batch.done.set()
+        finally:
+            with self._lock:
+                commit_lock[1] -= 1
+                if commit_lock[1] == 0:
+                    del self._commit_locks[key]
+        return batch.results[slot]
+    
+    def stats(self) -> Dict[str, int]:
+        """Number of commits and of items written through them"""
+        with self._lock:
+            return {"commits": self._commits, "items": self._items}
@@ -0,0 +1,128 @@
+"""
+Storage encodings for JSON documents: pretty, compact, gzip and zstd
+"""
+import gzip
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, only needed for the "zstd" encoding
+    zstandard = None
+
+
+JSON_CONTENT_TYPE = "application/json"
+
+# Blob metadata key recording how a JSON document was encoded. Blobs without
+# it are plain JSON (everything written before encodings existed).
+ENCODING_METADATA_KEY = "json_encoding"
+
+PRETTY = "pretty"
+COMPACT = "compact"
+GZIP = "gzip"
+ZSTD = "zstd"
+ENCODINGS = (PRETTY, COMPACT, GZIP, ZSTD)
+
+CONTENT_TYPES = {
+    GZIP: "application/gzip",
+    ZSTD: "application/zstd",
+}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+@dataclass
+class EncodedDocument:
+    """A JSON document ready to upload"""
+    raw: bytes
+    payload: bytes
+    content_type: str
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError("The 'zstd' storage encoding requires the 'zstandard' package")
+
+
+def serialize_json(document: Any, encoding: str) -> bytes:
+    """JSON text of a document: indented for "pretty", minimal separators otherwise"""
+    if encoding == PRETTY:
+        return json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+
+def encode_json(document: Any, encoding: str) -> EncodedDocument:
+    """
+    Serialize and (optionally) compress a JSON document.
+    
+    Args:
+        document: JSON-serializable document
+        encoding: One of ENCODINGS
+    
+    Returns:
+        EncodedDocument with the plain JSON bytes, the bytes to store, and the
+        content type and metadata to store them with
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown storage encoding: {encoding}")
+    
+    raw = serialize_json(document, encoding)
+    if encoding == GZIP:
+        payload = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    elif encoding == ZSTD:
+        _require_zstandard()
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        payload = raw
+    
+    return EncodedDocument(
+        raw=raw,
+        payload=payload,
+        content_type=CONTENT_TYPES.get(encoding, JSON_CONTENT_TYPE),
+        metadata={ENCODING_METADATA_KEY: encoding},
+    )
+
+
+def blob_encoding(metadata: Optional[Dict[str, str]]) -> Optional[str]:
+    """Encoding recorded in a blob's metadata (None for plain, pre-encoding blobs)"""
+    return (metadata or {}).get(ENCODING_METADATA_KEY)
+
+
+def decode_blob(data: bytes, metadata: Optional[Dict[str, str]]) -> bytes:
+    """Undo the compression recorded in a blob's metadata; plain blobs pass through"""
+    encoding = blob_encoding(metadata)
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    if encoding == ZSTD:
+        _require_zstandard()
+        # Frames written by encode_json carry their content size
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def decode_chunks(chunks: Iterable[bytes], metadata: Optional[Dict[str, str]]) -> Iterator[bytes]:
+    """Streaming `decode_blob`: decompress chunk by chunk without buffering the blob"""
+    encoding = blob_encoding(metadata)
+    if encoding == GZIP:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == ZSTD:
+        _require_zstandard()
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        yield from chunks
+        return
+    
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if encoding == GZIP:
+        data = decompressor.flush()
+        if data:
+            yield data
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip stream")
@@ -0,0 +1,103 @@
+"""
+Incremental parsing of top-level JSON arrays from a stream of byte chunks
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+
+_WHITESPACE = " \t\r\n"
+
+
+class NotJsonArrayError(ValueError):
+    """The streamed document is not a top-level JSON array"""
+
+
+def iter_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Yield the elements of a UTF-8 encoded JSON array as they are parsed.
+    
+    Only the unparsed tail of the current chunk and the element being decoded
+    are held in memory, so peak memory depends on chunk and element size, not
+    on the size of the document.
+    
+    Args:
+        chunks: Byte chunks of the document, in order
+    
+    Yields:
+        Parsed array elements
+    
+    Raises:
+        NotJsonArrayError: If the document does not start with '['
+        json.JSONDecodeError: If the document is malformed or truncated
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunk_iter = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+    
+    def fill() -> bool:
+        # Append the next piece of text, dropping what was already consumed
+        nonlocal buffer, pos, eof
+        while not eof:
+            try:
+                text = utf8.decode(next(chunk_iter))
+            except StopIteration:
+                eof = True
+                text = utf8.decode(b"", final=True)
+            if text:
+                buffer = buffer[pos:] + text
+                pos = 0
+                return True
+        return False
+    
+    def peek() -> str:
+        # Next non-whitespace character ("" at the end of the stream)
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ""
+    
+    if peek() != "[":
+        raise NotJsonArrayError("Document is not a JSON array")
+    pos += 1
+    
+    if peek() == "]":
+        pos += 1
+    else:
+        while True:
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Element continues in the next chunk (or the document is broken)
+                    if not fill():
+                        raise
+                    continue
+                # Numbers cut at a chunk boundary ("12" of "12.5e3") still decode;
+                # only trust the value once the following ',' or ']' is buffered
+                delimiter = end
+                while delimiter < len(buffer) and buffer[delimiter] in _WHITESPACE:
+                    delimiter += 1
+                if (delimiter < len(buffer) and buffer[delimiter] in ",]") or not fill():
+                    break
+            
+            pos = end
+            yield value
+            
+            separator = peek()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos - 1)
+            peek()
+    
+    if peek():
+        raise json.JSONDecodeError("Extra data", buffer, pos)
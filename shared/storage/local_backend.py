@@ -0,0 +1,266 @@
+"""
+Local filesystem storage backend with memory-mapped reads
+"""
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+from .base import BlobInfo, StorageBackend
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Stores each blob as a file under `<root>/<container>/<blob name>`.
+    
+    Content type, metadata and append-block counts live in a sidecar JSON file
+    under `<root>/.meta/`. Writes go to a temporary file that is atomically
+    renamed into place, and the ETag is derived from the file's inode, size and
+    mtime, so a reader always gets content and ETag of the same version.
+    Conditional writes are serialized with an in-process lock, which makes the
+    backend suitable for single-process deployments, benchmarks and load tests.
+    """
+    
+    name = "local"
+    
+    CHUNK_SIZE = 4 * 1024 * 1024
+    META_DIR = ".meta"
+    
+    # Minimum mtime step between writes; keeps ETags unique on 100ns-resolution filesystems
+    MTIME_STEP_NS = 1000
+    
+    def __init__(self, root: str, container: str):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.data_root = os.path.join(self.root, container)
+        self.meta_root = os.path.join(self.root, self.META_DIR, container)
+        self._lock = threading.RLock()
+        self._last_mtime_ns = 0
+        os.makedirs(self.data_root, exist_ok=True)
+    
+    def _file_path(self, path: str) -> str:
+        # Blob names are flat keys; never let "." / ".." segments escape a user's prefix
+        if any(segment in (".", "..") for segment in path.split("/")):
+            raise ValueError(f"Invalid blob name: {path}")
+        file_path = os.path.normpath(os.path.join(self.data_root, path))
+        if not file_path.startswith(self.data_root + os.sep):
+            raise ValueError(f"Invalid blob name: {path}")
+        return file_path
+    
+    def _meta_path(self, path: str) -> str:
+        return os.path.join(self.meta_root, os.path.relpath(self._file_path(path), self.data_root) + ".json")
+    
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f'"0x{stat.st_ino:X}{stat.st_mtime_ns:X}{stat.st_size:X}"'
+    
+    def _read_meta(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    @staticmethod
+    def _atomic_write(file_path: str, data: bytes, mtime_ns: Optional[int] = None) -> None:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            if mtime_ns is not None:
+                os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _next_mtime_ns(self) -> int:
+        """Strictly increasing mtime for the next data write (caller holds the lock)"""
+        self._last_mtime_ns = max(time.time_ns(), self._last_mtime_ns + self.MTIME_STEP_NS)
+        return self._last_mtime_ns
+    
+    def _write_meta(self, path: str, meta: Dict[str, Any]) -> None:
+        self._atomic_write(self._meta_path(path), json.dumps(meta).encode("utf-8"))
+    
+    def _info(self, path: str, stat: os.stat_result, meta: Dict[str, Any]) -> BlobInfo:
+        return BlobInfo(
+            name=path,
+            size=stat.st_size,
+            etag=self._etag(stat),
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            content_type=meta.get("content_type"),
+            metadata=dict(meta.get("metadata") or {}),
+            committed_block_count=meta.get("committed_block_count"),
+        )
+    
+    def _current_etag(self, path: str) -> Optional[str]:
+        try:
+            return self._etag(os.stat(self._file_path(path)))
+        except FileNotFoundError:
+            return None
+    
+    def download(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        try:
+            f = open(self._file_path(path), "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+        
+        with f:
+            stat = os.fstat(f.fileno())
+            if etag is not None and etag == self._etag(stat):
+                raise ResourceNotModifiedError(f"The blob has not been modified: {path}")
+            if stat.st_size == 0:
+                data = b""
+            else:
+                with mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[:]
+        return data, self._info(path, stat, self._read_meta(path))
+    
+    def open_stream(self, path: str) -> Tuple[BlobInfo, Iterator[bytes]]:
+        try:
+            f = open(self._file_path(path), "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+        
+        stat = os.fstat(f.fileno())
+        
+        def chunks() -> Iterator[bytes]:
+            with f:
+                if stat.st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, stat.st_size, self.CHUNK_SIZE):
+                        yield mapped[offset:offset + self.CHUNK_SIZE]
+        
+        return self._info(path, stat, self._read_meta(path)), chunks()
+    
+    def upload(
+        self,
+        path: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        if_missing: bool = False,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        file_path = self._file_path(path)
+        with self._lock:
+            current_etag = self._current_etag(path)
+            if if_missing and current_etag is not None:
+                raise ResourceExistsError(f"The specified blob already exists: {path}")
+            if etag is not None and current_etag != etag:
+                raise ResourceModifiedError(f"The condition specified using HTTP conditional header(s) is not met: {path}")
+            
+            self._atomic_write(file_path, bytes(data), self._next_mtime_ns())
+            self._write_meta(path, {"content_type": content_type, "metadata": dict(metadata or {})})
+            self._written(path)
+            return self._etag(os.stat(file_path))
+    
+    def get_properties(self, path: str) -> BlobInfo:
+        try:
+            stat = os.stat(self._file_path(path))
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+        return self._info(path, stat, self._read_meta(path))
+    
+    def delete(self, path: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self._file_path(path))
+            except FileNotFoundError:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+            try:
+                os.remove(self._meta_path(path))
+            except FileNotFoundError:
+                pass
+            self._written(path)
+    
+    def list_blobs(self, prefix: str = "", include_metadata: bool = False) -> Iterator[BlobInfo]:
+        # Only the directory holding the prefix can contain matching blobs
+        directory_prefix = prefix.rpartition("/")[0]
+        start = self._file_path(directory_prefix) if directory_prefix else self.data_root
+        paths = []
+        for directory, _, files in os.walk(start):
+            for file_name in files:
+                if file_name.startswith(".tmp-"):
+                    continue
+                path = os.path.relpath(os.path.join(directory, file_name), self.data_root)
+                path = path.replace(os.sep, "/")
+                if path.startswith(prefix):
+                    paths.append(path)
+        
+        for path in sorted(paths):
+            try:
+                stat = os.stat(self._file_path(path))
+            except FileNotFoundError:
+                continue
+            info = self._info(path, stat, self._read_meta(path) if include_metadata else {})
+            info.committed_block_count = None
+            yield info
+    
+    def copy(self, source_path: str, target_path: str) -> None:
+        data, _ = self.download(source_path)
+        with self._lock:
+            self._atomic_write(self._file_path(target_path), data, self._next_mtime_ns())
+            self._write_meta(target_path, self._read_meta(source_path))
+            self._written(target_path)
+    
+    def create_append_blob(
+        self,
+        path: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> None:
+        with self._lock:
+            if self._current_etag(path) is not None:
+                raise ResourceExistsError(f"The specified blob already exists: {path}")
+            self._atomic_write(self._file_path(path), b"", self._next_mtime_ns())
+            self._write_meta(path, {
+                "content_type": content_type,
+                "metadata": dict(metadata or {}),
+                "committed_block_count": 0,
+            })
+            self._written(path)
+    
+    def append_block(self, path: str, data: bytes, append_position: Optional[int] = None) -> int:
+        with self._lock:
+            meta = self._read_meta(path)
+            if self._current_etag(path) is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+            if meta.get("committed_block_count") is None:
+                raise ResourceExistsError(f"The blob type is invalid for this operation: {path}")
+            if meta.get("sealed"):
+                raise ResourceModifiedError(f"The blob is sealed: {path}")
+            if append_position is not None and os.path.getsize(self._file_path(path)) != append_position:
+                raise ResourceModifiedError(f"The append position condition was not met: {path}")
+            with open(self._file_path(path), "ab") as f:
+                f.write(data)
+            mtime_ns = self._next_mtime_ns()
+            os.utime(self._file_path(path), ns=(mtime_ns, mtime_ns))
+            meta["committed_block_count"] += 1
+            self._write_meta(path, meta)
+            self._written(path)
+            return meta["committed_block_count"]
+    
+    def seal_append_blob(self, path: str) -> None:
+        with self._lock:
+            meta = self._read_meta(path)
+            if self._current_etag(path) is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+            if meta.get("committed_block_count") is None:
+                raise ResourceExistsError(f"The blob type is invalid for this operation: {path}")
+            meta["sealed"] = True
+            self._write_meta(path, meta)
@@ -0,0 +1,174 @@
+"""
+In-memory storage backend for benchmarks, load tests and local experiments
+"""
+import itertools
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+from .base import BlobInfo, StorageBackend
+
+
+@dataclass
+class _MemoryBlob:
+    data: bytes
+    etag: str
+    last_modified: datetime
+    content_type: Optional[str] = None
+    metadata: Dict[str, str] = field(default_factory=dict)
+    committed_block_count: Optional[int] = None
+    sealed: bool = False
+
+
+class MemoryStorageBackend(StorageBackend):
+    """Process-local storage; contents are lost when the worker recycles"""
+    
+    name = "memory"
+    
+    def __init__(self):
+        super().__init__()
+        self._blobs: Dict[str, _MemoryBlob] = {}
+        self._lock = threading.Lock()
+        self._etags = itertools.count(1)
+    
+    def _next_etag(self) -> str:
+        return f'"0x{next(self._etags):016X}"'
+    
+    def _get(self, path: str) -> _MemoryBlob:
+        blob = self._blobs.get(path)
+        if blob is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {path}")
+        return blob
+    
+    @staticmethod
+    def _to_info(path: str, blob: _MemoryBlob) -> BlobInfo:
+        return BlobInfo(
+            name=path,
+            size=len(blob.data),
+            etag=blob.etag,
+            last_modified=blob.last_modified,
+            content_type=blob.content_type,
+            metadata=dict(blob.metadata),
+            committed_block_count=blob.committed_block_count,
+        )
+    
+    def download(self, path: str, etag: Optional[str] = None) -> Tuple[bytes, BlobInfo]:
+        with self._lock:
+            blob = self._get(path)
+            if etag is not None and etag == blob.etag:
+                raise ResourceNotModifiedError(f"The blob has not been modified: {path}")
+            return blob.data, self._to_info(path, blob)
+    
+    def upload(
+        self,
+        path: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        if_missing: bool = False,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        with self._lock:
+            current = self._blobs.get(path)
+            if if_missing and current is not None:
+                raise ResourceExistsError(f"The specified blob already exists: {path}")
+            if etag is not None and (current is None or current.etag != etag):
+                raise ResourceModifiedError(f"The condition specified using HTTP conditional header(s) is not met: {path}")
+            
+            blob = _MemoryBlob(
+                data=bytes(data),
+                etag=self._next_etag(),
+                last_modified=datetime.now(timezone.utc),
+                content_type=content_type,
+                metadata=dict(metadata or {}),
+            )
+            self._blobs[path] = blob
+            self._written(path)
+            return blob.etag
+    
+    def get_properties(self, path: str) -> BlobInfo:
+        with self._lock:
+            return self._to_info(path, self._get(path))
+    
+    def delete(self, path: str) -> None:
+        with self._lock:
+            self._get(path)
+            del self._blobs[path]
+            self._written(path)
+    
+    def list_blobs(self, prefix: str = "", include_metadata: bool = False) -> Iterator[BlobInfo]:
+        with self._lock:
+            snapshot = sorted(
+                (path, blob) for path, blob in self._blobs.items() if path.startswith(prefix)
+            )
+        for path, blob in snapshot:
+            info = self._to_info(path, blob)
+            info.committed_block_count = None
+            if not include_metadata:
+                info.metadata = {}
+            yield info
+    
+    def copy(self, source_path: str, target_path: str) -> None:
+        with self._lock:
+            source = self._get(source_path)
+            self._blobs[target_path] = _MemoryBlob(
+                data=source.data,
+                etag=self._next_etag(),
+                last_modified=datetime.now(timezone.utc),
+                content_type=source.content_type,
+                metadata=dict(source.metadata),
+                committed_block_count=source.committed_block_count,
+            )
+            self._written(target_path)
+    
+    def create_append_blob(
+        self,
+        path: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> None:
+        with self._lock:
+            if path in self._blobs:
+                raise ResourceExistsError(f"The specified blob already exists: {path}")
+            self._blobs[path] = _MemoryBlob(
+                data=b"",
+                etag=self._next_etag(),
+                last_modified=datetime.now(timezone.utc),
+                content_type=content_type,
+                metadata=dict(metadata or {}),
+                committed_block_count=0,
+            )
+            self._written(path)
+    
+    def append_block(self, path: str, data: bytes, append_position: Optional[int] = None) -> int:
+        with self._lock:
+            blob = self._get(path)
+            if blob.committed_block_count is None:
+                raise ResourceExistsError(f"The blob type is invalid for this operation: {path}")
+            if blob.sealed:
+                raise ResourceModifiedError(f"The blob is sealed: {path}")
+            if append_position is not None and len(blob.data) != append_position:
+                raise ResourceModifiedError(f"The append position condition was not met: {path}")
+            blob.data += bytes(data)
+            blob.etag = self._next_etag()
+            blob.last_modified = datetime.now(timezone.utc)
+            blob.committed_block_count += 1
+            self._written(path)
+            return blob.committed_block_count
+    
+    def seal_append_blob(self, path: str) -> None:
+        with self._lock:
+            blob = self._get(path)
+            if blob.committed_block_count is None:
+                raise ResourceExistsError(f"The blob type is invalid for this operation: {path}")
+            if not blob.sealed:
+                blob.sealed = True
+                blob.etag = self._next_etag()
@@ -0,0 +1,106 @@
+"""
+Per-user group-by counts of all collections, kept current with deltas for dashboard overviews
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .config import SummaryConfig
+from .data_index import ChangeSet
+from .user_index import UserIndex
+
+
+class SummaryStats(UserIndex):
+    """
+    Aggregates of a user's collections in `__indexes__/summary.json`.
+    
+    Each section counts the entries of one collection per value of every
+    grouped field (SummaryConfig.GROUP_FIELDS), with values compared as
+    strings like FileStats categories; entries without the field are not
+    counted. Counts do not depend on positions, so updates and removals
+    recorded in an operation log are applied as deltas too whenever logging
+    them worked out the entries they change (see DataStore._record); other
+    logged operations, compactions, racing writers and writes made outside
+    DataStore leave a section stale.
+    """
+    
+    BLOB_NAME = "summary.json"
+    POSITIONAL = False
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        return SummaryConfig.ENABLED
+    
+    @classmethod
+    def signature(cls) -> Any:
+        return list(SummaryConfig.GROUP_FIELDS)
+    
+    @classmethod
+    def entry_groups(cls, entry: Any) -> Dict[str, str]:
+        """Value of each grouped field the entry has"""
+        if not isinstance(entry, dict):
+            return {}
+        return {
+            field_name: str(entry[field_name])
+            for field_name in SummaryConfig.GROUP_FIELDS
+            if field_name in entry
+        }
+    
+    @classmethod
+    def build_section(cls, entries: List[Any]) -> Dict[str, Any]:
+        groups: Dict[str, Counter] = {}
+        for entry in entries:
+            for field_name, value in cls.entry_groups(entry).items():
+                groups.setdefault(field_name, Counter())[value] += 1
+        return {"groups": {field_name: dict(counts) for field_name, counts in groups.items()}}
+    
+    @classmethod
+    def apply_changes(cls, section: Dict[str, Any], changes: ChangeSet) -> Optional[Dict[str, Any]]:
+        groups = {field_name: Counter(counts) for field_name, counts in section.get("groups", {}).items()}
+        
+        def count(entry: Any, delta: int) -> None:
+            for field_name, value in cls.entry_groups(entry).items():
+                groups.setdefault(field_name, Counter())[value] += delta
+        
+        for _, old_entry, new_entry in changes.updated:
+            count(old_entry, -1)
+            count(new_entry, 1)
+        for _, old_entry in changes.removed:
+            count(old_entry, -1)
+        for entry in changes.appended:
+            count(entry, 1)
+        
+        if any(value < 0 for counts in groups.values() for value in counts.values()):
+            # The section did not describe the entries the write changed
+            return None
+        return {"groups": {
+            field_name: {value: number for value, number in counts.items() if number}
+            for field_name, counts in groups.items()
+            if any(counts.values())
+        }}
+    
+    @classmethod
+    def overview(cls, sections: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Dashboard overview of several collections.
+        
+        Args:
+            sections: Section per logical file name
+        
+        Returns:
+            Dict with the total entry count, the counts per value of every
+            grouped field over all files (most frequent first) and the same
+            per file
+        """
+        totals: Dict[str, Counter] = {field_name: Counter() for field_name in SummaryConfig.GROUP_FIELDS}
+        files = []
+        for name in sorted(sections):
+            section = sections[name]
+            for field_name, counts in section.get("groups", {}).items():
+                totals.setdefault(field_name, Counter()).update(counts)
+            files.append({"file": name, "entry_count": section["count"], "groups": section.get("groups", {})})
+        
+        return {
+            "entry_count": sum(section["count"] for section in sections.values()),
+            "groups": {field_name: dict(counts.most_common()) for field_name, counts in totals.items()},
+            "files": files
+        }
@@ -0,0 +1,269 @@
+"""
+Per-user documents derived from all of a user's collections, each kept in one small blob
+"""
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .config import UserNamespace
+from .data_index import ChangeSet
+from .storage import get_storage
+
+
+@dataclass
+class UserIndexState:
+    """A per-user index brought up to date with the user's collections (see DataStore.refresh_user_index)"""
+    sections: Dict[str, Dict[str, Any]]
+    rebuilt: List[str] = field(default_factory=list)
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    drifted: List[str] = field(default_factory=list)
+
+
+class UserIndex(ABC):
+    """
+    Base of documents describing every collection of a user at once, stored
+    in one blob under `__indexes__/` of the user's namespace.
+    
+    The document holds one section per collection: what the subclass derives
+    from the entries (`build_section`) plus the ETag, operation log and
+    operation count of the collection version it describes. Writers keep
+    sections current from the ChangeSet of each committed write
+    (`apply_changes`) and from operations recorded in an operation log
+    (only appends for POSITIONAL indexes, since logged updates and removals
+    carry no positions); compactions and concurrent writers leave a section
+    stale. Readers compare the sections with one listing of the user's blobs
+    and rebuild only the stale ones (see DataStore.refresh_user_index), so a
+    query costs one listing and one small download.
+    """
+    
+    DIRECTORY = "__indexes__/"
+    
+    # Blob name of the document within DIRECTORY (set by subclasses)
+    BLOB_NAME = ""
+    
+    # Sections refer to entries by position
+    POSITIONAL = True
+    
+    # Users found without the document are remembered briefly so writes skip the lookup
+    MISSING_TTL = 30.0
+    _missing_until: Dict[str, float] = {}
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        """Whether writes keep the document current (readers rebuild it either way)"""
+        return True
+    
+    @classmethod
+    def signature(cls) -> Any:
+        """Settings the sections depend on; documents built with other settings are rebuilt"""
+        return None
+    
+    @classmethod
+    def index_name(cls) -> str:
+        """Blob name of the document within the user's namespace"""
+        return f"{cls.DIRECTORY}{cls.BLOB_NAME}"
+    
+    @classmethod
+    def is_index_blob(cls, blob_name: str) -> bool:
+        """Check if a blob (relative or full name) is a per-user index document, kept at the namespace root"""
+        user_id = UserNamespace.extract_user_id_from_blob_name(blob_name)
+        if user_id is not None:
+            blob_name = blob_name[len(UserNamespace.get_user_prefix(user_id)):]
+        return blob_name.startswith(cls.DIRECTORY)
+    
+    @classmethod
+    @abstractmethod
+    def build_section(cls, entries: List[Any]) -> Dict[str, Any]:
+        """Derive a collection's section from all of its entries"""
+    
+    @classmethod
+    @abstractmethod
+    def apply_changes(cls, section: Dict[str, Any], changes: ChangeSet) -> Optional[Dict[str, Any]]:
+        """
+        Derive the section of the next collection version from a ChangeSet.
+        
+        Must not modify `section`, which may be the shared cached copy.
+        Returns None if the change cannot be applied incrementally.
+        """
+    
+    @classmethod
+    def section(
+        cls,
+        entries: Any,
+        etag: str,
+        oplog: Optional[str] = None,
+        oplog_ops: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Build a collection's section in one pass.
+        
+        Args:
+            entries: Entries of the collection (a non-array document contributes nothing)
+            etag: ETag of the collection version the entries were read from
+            oplog: Operation log the entries include, in snapshot + log mode
+            oplog_ops: Number of operations of that log folded into the entries
+        
+        Returns:
+            Section with its version fields
+        """
+        entries = entries if isinstance(entries, list) else []
+        return {
+            **cls.build_section(entries),
+            "etag": etag,
+            "oplog": oplog,
+            "oplog_ops": oplog_ops,
+            "count": len(entries)
+        }
+    
+    @classmethod
+    def load(cls, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Read the user's document (None if there is none yet)"""
+        document, _ = get_storage().read_json(cls.index_name(), user_id)
+        return document
+    
+    @classmethod
+    def sections(cls, document: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Sections per logical file name of a stored document (none if built with other settings)"""
+        if not document or document.get("signature") != cls.signature():
+            return {}
+        return document.get("files", {})
+    
+    @classmethod
+    def merge(
+        cls,
+        document: Optional[Dict[str, Any]],
+        changed: Dict[str, Optional[Dict[str, Any]]],
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Store rebuilt sections (None drops a file's section).
+        
+        A section a writer changed since `document` was read is kept, unless
+        it describes the same version as the rebuilt one: that one was counted
+        from the data, so storing it also repairs drift.
+        
+        Args:
+            document: The document the sections were checked against
+            changed: Rebuilt section (or None) per logical file name
+            user_id: Optional user ID for namespace isolation
+        
+        Returns:
+            The document including the rebuilt sections (also when it could
+            not be stored)
+        """
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(), user_id)
+        cls._missing_until.pop(path, None)
+        merged: Dict[str, Any] = {}
+        checked = cls.sections(document)
+        
+        def replace(current):
+            files = dict(cls.sections(current))
+            for name, section in changed.items():
+                stored = files.get(name)
+                if section is None:
+                    files.pop(name, None)
+                elif stored is None or stored == checked.get(name) or cls.describes(stored, section["etag"], section["oplog_ops"]):
+                    files[name] = section
+            merged.update({"signature": cls.signature(), "files": files})
+            return dict(merged)
+        
+        try:
+            storage.update_json(path, replace, default_factory=lambda: None)
+        except Exception as e:
+            # Queries still work from the sections rebuilt in memory
+            logging.warning(f"Could not store {cls.index_name()} of user {user_id}: {str(e)}")
+            if not merged:
+                replace(document)
+        return merged
+    
+    @classmethod
+    def apply(cls, name: str, changes: ChangeSet, user_id: Optional[str] = None) -> None:
+        """Apply a committed ChangeSet to the collection's section, if the user has a document"""
+        if not cls.enabled():
+            return
+        
+        def apply_to(section):
+            if section is None:
+                # A collection created by this write; others are left for the next query
+                if changes.previous_etag is not None or changes.count != len(changes.appended):
+                    return None
+                return cls.section(changes.appended, changes.etag, changes.oplog)
+            if not cls.describes(section, changes.previous_etag):
+                return None
+            updated = cls.apply_changes(section, changes)
+            count = section["count"] + len(changes.appended) - len(changes.removed)
+            if updated is None or count != changes.count:
+                return None
+            return {**section, **updated, "etag": changes.etag, "oplog": changes.oplog, "oplog_ops": 0, "count": count}
+        
+        cls._update(name, user_id, apply_to)
+    
+    @classmethod
+    def apply_logged(
+        cls,
+        name: str,
+        oplog: str,
+        op_count: int,
+        changes: ChangeSet,
+        user_id: Optional[str] = None
+    ) -> None:
+        """
+        Apply an operation recorded in an operation log.
+        
+        Args:
+            name: Logical blob name of the collection
+            oplog: The log the operation was recorded in
+            op_count: Operations in the log including this one
+            changes: Entries the operation changed; `etag` and
+                `previous_etag` are both the ETag of the manifest naming the log
+            user_id: Optional user ID for namespace isolation
+        """
+        if not cls.enabled() or (cls.POSITIONAL and (changes.updated or changes.removed)):
+            return
+        previous_count = changes.count - len(changes.appended) + len(changes.removed)
+        
+        def apply_op(section):
+            if section is None or section.get("oplog") != oplog:
+                return None
+            if not cls.describes(section, changes.etag, op_count - 1) or section["count"] != previous_count:
+                return None
+            updated = cls.apply_changes(section, changes)
+            if updated is None:
+                return None
+            return {**section, **updated, "oplog_ops": op_count, "count": changes.count}
+        
+        cls._update(name, user_id, apply_op)
+    
+    @staticmethod
+    def describes(section: Optional[Dict[str, Any]], etag: Optional[str], oplog_ops: int = 0) -> bool:
+        """Whether a section is current for a collection version (and operation count)"""
+        return section is not None and section.get("etag") == etag and section.get("oplog_ops", 0) == oplog_ops
+    
+    @classmethod
+    def _update(cls, name: str, user_id: Optional[str], apply_to) -> None:
+        storage = get_storage()
+        path = storage.blob_path(cls.index_name(), user_id)
+        if cls._missing_until.get(path, 0.0) > time.monotonic():
+            return
+        
+        def update(document):
+            if document is None:
+                cls._missing_until[path] = time.monotonic() + cls.MISSING_TTL
+                return None
+            if document.get("signature") != cls.signature():
+                return None
+            files = cls.sections(document)
+            section = apply_to(files.get(name))
+            if section is None:
+                # The section already lags behind; the next query rebuilds it
+                return None
+            return {**document, "files": {**files, name: section}}
+        
+        try:
+            storage.update_json(path, update, default_factory=lambda: None)
+        except Exception as e:
+            # The data write already succeeded; a stale section is rebuilt by the next query
+            logging.warning(f"Could not update {cls.index_name()} for '{name}': {str(e)}")
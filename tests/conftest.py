@@ -0,0 +1,59 @@
+"""
+Shared fixtures: every test runs against a fresh in-memory storage backend
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import OplogConfig, SegmentConfig
+from shared.data_store import DataStore
+from shared.storage import set_storage
+from shared.storage.memory_backend import MemoryStorageBackend
+
+
+@pytest.fixture
+def storage():
+    """A fresh in-memory backend installed as the process-wide storage"""
+    backend = MemoryStorageBackend()
+    set_storage(backend)
+    yield backend
+    set_storage(None)
+
+
+@pytest.fixture
+def cold(storage):
+    """Forget what this worker has cached, as on a freshly started instance"""
+    def forget():
+        storage._cache.clear()
+        storage._results.clear()
+    return forget
+
+
+@pytest.fixture
+def segmented(monkeypatch):
+    """Segment collections past 10 entries, 4 entries per segment"""
+    monkeypatch.setattr(SegmentConfig, "SEGMENT_THRESHOLD", 10)
+    monkeypatch.setattr(SegmentConfig, "SEGMENT_SIZE", 4)
+
+
+@pytest.fixture
+def oplog_mode(segmented, monkeypatch):
+    """Log operations on collections of 10+ entries, compacting only when asked"""
+    monkeypatch.setattr(OplogConfig, "MIN_ENTRIES", 10)
+    monkeypatch.setattr(OplogConfig, "COMPACT_OPS", 1000)
+
+
+@pytest.fixture
+def segment_reads(monkeypatch):
+    """Segment blobs read by DataStore, in order"""
+    reads = []
+    read_segment = DataStore._read_segment.__func__
+    
+    def recording(cls, storage, name, user_id, segment):
+        reads.append(segment["blob"])
+        return read_segment(cls, storage, name, user_id, segment)
+    monkeypatch.setattr(DataStore, "_read_segment", classmethod(recording))
+    return reads
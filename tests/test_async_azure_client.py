@@ -0,0 +1,30 @@
+"""
+Tests for the async blob client's connection pool lifecycle
+"""
+import asyncio
+
+from shared.async_azure_client import AsyncAzureBlobClient
+from shared.config import AzureConfig
+
+
+def test_loop_change_closes_previous_session(monkeypatch):
+    monkeypatch.setattr(AzureConfig, "CONNECTION_STRING", "UseDevelopmentStorage=true")
+    
+    async def session():
+        AsyncAzureBlobClient.get_service_client()
+        return AsyncAzureBlobClient._session
+    
+    first = asyncio.run(session())
+    
+    async def second_loop():
+        current = await session()
+        await asyncio.gather(*AsyncAzureBlobClient._closing)
+        return current
+    
+    try:
+        second = asyncio.run(second_loop())
+        assert second is not first
+        assert first.closed
+        assert not second.closed
+    finally:
+        asyncio.run(AsyncAzureBlobClient.close())
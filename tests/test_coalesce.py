@@ -0,0 +1,102 @@
+"""
+Tests of combining concurrent appends into one write
+"""
+import threading
+
+import pytest
+
+from shared.data_store import DataStore
+from shared.storage.coalesce import WriteCoalescer
+
+
+def _concurrently(items, call):
+    """Run call(item) from one thread per item, all released at once; returns (results, errors) by item"""
+    results = {}
+    errors = {}
+    start = threading.Barrier(len(items))
+    
+    def run(item):
+        start.wait()
+        try:
+            results[item] = call(item)
+        except Exception as e:
+            errors[item] = e
+    
+    threads = [threading.Thread(target=run, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def _submit_all(coalescer, items, commit):
+    return _concurrently(items, lambda item: coalescer.submit("users/alice/tasks.json", item, commit))
+
+
+def test_concurrent_items_share_one_commit():
+    coalescer = WriteCoalescer(window=0.2, max_batch=100)
+    batches = []
+    
+    def commit(items):
+        batches.append(items)
+        return [f"ok {item}" for item in items]
+    
+    results, errors = _submit_all(coalescer, list(range(8)), commit)
+    
+    assert not errors
+    assert results == {item: f"ok {item}" for item in range(8)}
+    assert len(batches) == 1 and sorted(batches[0]) == list(range(8))
+    assert coalescer.stats() == {"commits": 1, "items": 8}
+
+
+def test_full_batches_are_closed():
+    coalescer = WriteCoalescer(window=0.2, max_batch=3)
+    batches = []
+    
+    def commit(items):
+        batches.append(items)
+        return items
+    
+    results, _ = _submit_all(coalescer, list(range(7)), commit)
+    
+    assert results == {item: item for item in range(7)}
+    assert all(len(items) <= 3 for items in batches)
+    assert sorted(item for items in batches for item in items) == list(range(7))
+
+
+def test_commit_error_reaches_every_writer():
+    coalescer = WriteCoalescer(window=0.2, max_batch=100)
+    
+    def commit(items):
+        raise RuntimeError("conflict")
+    
+    results, errors = _submit_all(coalescer, list(range(4)), commit)
+    
+    assert not results
+    assert sorted(errors) == list(range(4))
+    assert all(isinstance(error, RuntimeError) for error in errors.values())
+
+
+def test_keys_commit_separately():
+    coalescer = WriteCoalescer(window=0, max_batch=100)
+    assert coalescer.submit("a", 1, lambda items: ["a"] * len(items)) == "a"
+    assert coalescer.submit("b", 1, lambda items: ["b"] * len(items)) == "b"
+    assert coalescer.stats() == {"commits": 2, "items": 2}
+
+
+@pytest.mark.parametrize("layout", ["plain", "segmented"])
+def test_concurrent_appends_count_their_own_entry(storage, monkeypatch, request, layout):
+    if layout == "segmented":
+        request.getfixturevalue("segmented")
+    monkeypatch.setattr(DataStore, "_appends", WriteCoalescer(window=0.05, max_batch=100))
+    
+    counts, errors = _concurrently(list(range(12)), lambda i: DataStore.append("tasks.json", {"id": i}, "alice"))
+    
+    assert not errors
+    stored, total = DataStore.read("tasks.json", "alice")
+    assert total == 12
+    assert sorted(entry["id"] for entry in stored) == list(range(12))
+    # Each writer gets the count up to its own entry
+    assert {entry["id"]: position + 1 for position, entry in enumerate(stored)} == counts
+    assert DataStore._appends.stats()["commits"] < 12
@@ -0,0 +1,133 @@
+"""
+Tests of columnar views: structured queries over them match the row-by-row path
+"""
+import importlib
+import json
+
+import azure.functions as func
+import pytest
+
+from shared.columnar import ColumnarView
+from shared.config import ColumnarConfig
+from shared.data_store import DataStore
+from shared.query import Query
+
+upload_data_or_file = importlib.import_module("upload_data_or_file")
+
+STATUSES = ["open", "done", "blocked", None, 1, "1"]
+PRIORITIES = [1, 2, 3, "3", "x", None, 2.5, True]
+DUES = ["2026-10-20", "2026-10-05T10:00:00+02:00", "2026-10-05T07:00:00Z", "soon", None, "2026-09-01"]
+
+SPECS = [
+    {"where": {"field": "status", "value": "open"}, "sort": ["-priority", "due"], "limit": 5},
+    {"where": [
+        {"field": "status", "op": "in", "value": ["open", "blocked", "1"]},
+        {"field": "due", "op": "lt", "value": "2026-10-15"}
+    ], "sort": "due"},
+    {"where": {"or": [
+        {"field": "tags", "op": "contains", "value": "WORK"},
+        {"not": {"field": "owner", "op": "exists"}}
+    ]}, "limit": 7},
+    {"where": {"field": "priority", "op": "gte", "value": 3}},
+    {"where": {"field": "due", "op": "gte", "value": "2026-10-05T08:00:00Z"}, "sort": "-due"},
+    {"where": {"field": "status", "op": "ne", "value": "done"}, "sort": ["-status", "priority", "id"], "fields": ["id", "status"]},
+    {"sort": [{"field": "owner", "order": "desc"}, "id"], "limit": 6},
+]
+
+
+def _entries(count):
+    entries = []
+    for i in range(count):
+        entry = {
+            "id": f"T{i:03d}",
+            "status": STATUSES[i % len(STATUSES)],
+            "priority": PRIORITIES[i % len(PRIORITIES)],
+            "due": DUES[i % len(DUES)],
+            "tags": [["work"], ["home", "work"], [], "work"][i % 4]
+        }
+        if i % 3 == 0:
+            entry["owner"] = ["bob", "ann"][i % 2]
+        if i % 5 == 0:
+            del entry["status"]
+        entries.append(entry)
+    return entries
+
+
+def _expected(entries, spec):
+    query = Query.compile(spec)
+    return query.finish([entry for entry in entries if query.where is None or query.where(entry)])
+
+
+@pytest.fixture
+def columnar(monkeypatch):
+    """Columnar views for collections of 20+ entries"""
+    monkeypatch.setattr(ColumnarConfig, "MIN_ENTRIES", 20)
+    ColumnarView._views.clear()
+
+
+@pytest.mark.parametrize("layout", ["plain", "segmented", "oplog"])
+def test_view_matches_rows(storage, columnar, layout, request):
+    if layout != "plain":
+        request.getfixturevalue("oplog_mode" if layout == "oplog" else "segmented")
+    entries = _entries(60)
+    DataStore.append_many("tasks.json", entries, "alice")
+    if layout == "oplog":
+        DataStore.append("tasks.json", {"id": "T060", "status": "open"}, "alice")
+        DataStore.update_where("tasks.json", "id", "T001", {"status": "open"}, "alice")
+        entries, _ = DataStore.read("tasks.json", "alice")
+    
+    for spec in SPECS:
+        found = DataStore._find_columnar("tasks.json", Query.compile(spec), "alice")
+        assert found is not None, spec
+        assert found[:2] == (_expected(entries, spec), len(entries)), spec
+    assert storage.exists(ColumnarView.index_name("tasks.json"), "alice")
+
+
+def test_view_is_rebuilt_after_writes(storage, columnar):
+    DataStore.append_many("tasks.json", _entries(30), "alice")
+    spec = Query.compile({"where": {"field": "status", "value": "open"}})
+    before, _ = DataStore.find("tasks.json", spec, "alice")
+    
+    DataStore.append("tasks.json", {"id": "NEW", "status": "open"}, "alice")
+    after, total = DataStore.find("tasks.json", spec, "alice")
+    
+    assert total == 31
+    assert after == before + [{"id": "NEW", "status": "open"}]
+    assert ColumnarView.load("tasks.json", "alice").count == 31
+
+
+def test_small_collections_have_no_view(storage, columnar):
+    DataStore.append_many("tasks.json", _entries(10), "alice")
+    
+    assert DataStore._find_columnar("tasks.json", Query.compile({"sort": "id"}), "alice") is None
+    assert not storage.exists(ColumnarView.index_name("tasks.json"), "alice")
+
+
+def test_view_is_internal(storage, columnar):
+    DataStore.append_many("tasks.json", _entries(30), "alice")
+    DataStore.find("tasks.json", Query.compile({"sort": "id"}), "alice")
+    view_blob = ColumnarView.index_name("tasks.json")
+    
+    assert DataStore.is_internal_blob(f"users/alice/{view_blob}")
+    request = func.HttpRequest(
+        method="POST",
+        url="/api/upload_data_or_file",
+        headers={"X-User-Id": "alice"},
+        body=json.dumps({"target_blob_name": "tasks.json", "file_content": []}).encode("utf-8")
+    )
+    assert upload_data_or_file.main(request).status_code == 200
+    assert not storage.exists(view_blob, "alice")
+
+
+def test_view_pages(storage, columnar):
+    entries = _entries(60)
+    DataStore.append_many("tasks.json", entries, "alice")
+    
+    for spec in SPECS[:2]:
+        query = Query.compile({**spec, "limit": 4})
+        collected, start = [], 0
+        while start is not None:
+            page, total, start = DataStore._find_columnar("tasks.json", query, "alice", start=start)
+            assert len(page) <= 4 and total == 60
+            collected += page
+        assert collected == _expected(entries, {**spec, "limit": None}), spec
@@ -0,0 +1,112 @@
+"""
+Tests of the opt-in field hash indexes kept beside collections
+"""
+import json
+
+import pytest
+
+from shared.config import StorageConfig
+from shared.data_index import FieldIndex
+from shared.data_store import DataStore
+from shared.storage import get_storage
+
+
+
+@pytest.fixture(autouse=True)
+def no_missing_cache(monkeypatch):
+    monkeypatch.setattr(FieldIndex, "_missing_until", {})
+
+
+def _tasks(count):
+    return [{"id": i, "status": "open" if i % 3 else "done", "title": f"Task {i}"} for i in range(count)]
+
+
+def _append_all(entries):
+    for entry in entries:
+        DataStore.append("tasks.json", entry, "alice")
+
+
+def _assert_in_step(name="tasks.json"):
+    """The index describes the current version of the collection exactly"""
+    storage = get_storage()
+    entries, _ = DataStore.read(name, "alice")
+    _, etag = storage.read_json(name, "alice")
+    index = FieldIndex.load(name, "alice")
+    assert index["source_etag"] == etag
+    assert index["count"] == len(entries)
+    assert index["fields"] == FieldIndex.build(index["fields"], entries)
+
+
+def test_create_index(storage):
+    _append_all(_tasks(6))
+    
+    assert DataStore.create_index("tasks.json", ["status"], "alice") == ["status"]
+    assert DataStore.create_index("tasks.json", ["id"], "alice") == ["id", "status"]
+    
+    index = FieldIndex.load("tasks.json", "alice")
+    assert index["fields"]["status"] == {"done": [0, 3], "open": [1, 2, 4, 5]}
+    _assert_in_step()
+
+
+def test_index_follows_writes(storage):
+    _append_all(_tasks(6))
+    DataStore.create_index("tasks.json", ["status"], "alice")
+    
+    _append_all([{"id": 6, "status": "done"}])
+    _assert_in_step()
+    DataStore.update_entries("tasks.json", lambda entry: {**entry, "status": "done"} if entry["id"] == 1 else None, "alice")
+    _assert_in_step()
+    DataStore.update_entries("tasks.json", lambda entry: DataStore.DELETE if entry["id"] in (0, 4) else None, "alice")
+    _assert_in_step()
+    
+    entries, total = DataStore.read("tasks.json", "alice", match=("status", "done"))
+    assert [entry["id"] for entry in entries] == [1, 3, 6] and total == 5
+
+
+def test_indexed_read_fetches_only_matching_segments(storage, segmented, segment_reads):
+    _append_all(_tasks(20))
+    DataStore.create_index("tasks.json", ["title"], "alice")
+    segment_reads.clear()
+    
+    entries, total = DataStore.read("tasks.json", "alice", match=("title", "Task 13"))
+    
+    assert entries == [_tasks(20)[13]] and total == 20
+    assert len(segment_reads) == 1
+
+
+def test_stale_index_is_rebuilt_on_read(storage):
+    _append_all(_tasks(6))
+    DataStore.create_index("tasks.json", ["status"], "alice")
+    # Written around DataStore, so no ChangeSet reaches the index
+    storage.write_bytes("tasks.json", json.dumps(_tasks(3)).encode("utf-8"), "alice")
+    
+    entries, _ = DataStore.read("tasks.json", "alice", match=("status", "done"))
+    
+    assert entries == [_tasks(3)[0]]
+    _assert_in_step()
+
+
+@pytest.mark.parametrize("stale", [False, True])
+def test_indexed_streamed_read(storage, cold, monkeypatch, stale):
+    _append_all(_tasks(12))
+    DataStore.create_index("tasks.json", ["status"], "alice")
+    if stale:
+        storage.write_bytes("tasks.json", json.dumps(_tasks(9)).encode("utf-8"), "alice")
+    monkeypatch.setattr(StorageConfig, "STREAM_MIN_BYTES", 64)
+    cold()
+    
+    entries, total = DataStore.read("tasks.json", "alice", match=("status", "done"), limit=2)
+    
+    assert [entry["id"] for entry in entries] == [0, 3]
+    assert total == (9 if stale else 12)
+    _assert_in_step()
+
+
+def test_drop_index(storage):
+    _append_all(_tasks(3))
+    DataStore.create_index("tasks.json", ["id", "status"], "alice")
+    
+    assert DataStore.drop_index("tasks.json", ["id"], "alice") == ["status"]
+    assert DataStore.drop_index("tasks.json", None, "alice") == []
+    assert not storage.exists(FieldIndex.index_name("tasks.json"), "alice")
+    assert DataStore.is_internal_blob(FieldIndex.index_name("tasks.json"))
@@ -0,0 +1,132 @@
+"""
+Tests of collections kept as a snapshot plus an operation log
+"""
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from shared.config import OplogConfig
+from shared.data_oplog import OpLog
+from shared.data_store import DataStore
+
+compact_oplogs = importlib.import_module("compact_oplogs")
+
+
+def _tasks(count):
+    return [{"id": i, "status": "open"} for i in range(count)]
+
+
+def _manifest(storage):
+    return storage.read_json("tasks.json", "alice")[0]
+
+
+def _log_path(storage):
+    ref = DataStore._oplog_ref(_manifest(storage))
+    return storage.blob_path(DataStore._segment_path("tasks.json", ref), "alice")
+
+
+def _logged(storage):
+    data, _ = storage.download(_log_path(storage))
+    return [op["op"] for op in OpLog.decode(data)]
+
+
+@pytest.fixture
+def large(storage, oplog_mode):
+    """A 20-entry collection in snapshot + log mode with an empty log"""
+    DataStore.append_many("tasks.json", _tasks(20), "alice")
+    DataStore.append("tasks.json", {"id": 20, "status": "open"}, "alice")
+    DataStore.compact("tasks.json", "alice")
+    assert _logged(storage) == []
+
+
+def test_operations_are_logged_not_rewritten(storage, large):
+    before = _manifest(storage)
+    
+    assert DataStore.append("tasks.json", {"id": 21, "status": "open"}, "alice") == 22
+    assert DataStore.update_where("tasks.json", "id", 3, {"status": "done"}, "alice") == 1
+    assert DataStore.remove_where("tasks.json", "id", 4, "alice") == 1
+    
+    assert _manifest(storage) == before
+    assert _logged(storage) == ["add", "update", "remove"]
+    entries, total = DataStore.read("tasks.json", "alice")
+    assert total == 21
+    assert [entry["id"] for entry in entries] == [i for i in range(22) if i != 4]
+    assert entries[3] == {"id": 3, "status": "done"}
+
+
+def test_unmatched_operation_is_not_logged(storage, large):
+    assert DataStore.update_where("tasks.json", "id", 99, {"status": "done"}, "alice") == 0
+    assert DataStore.remove_where("tasks.json", "id", 99, "alice") == 0
+    assert _logged(storage) == []
+
+
+def test_compact_folds_the_log_into_a_snapshot(storage, large):
+    DataStore.remove_where("tasks.json", "id", 0, "alice")
+    DataStore.append("tasks.json", {"id": 21, "status": "open"}, "alice")
+    old_log = _log_path(storage)
+    expected = DataStore.read("tasks.json", "alice")
+    
+    assert DataStore.compact("tasks.json", "alice")
+    
+    assert DataStore.read("tasks.json", "alice") == expected
+    assert _manifest(storage)["count"] == 21
+    assert _logged(storage) == []
+    assert not storage.exists(old_log)
+    assert not DataStore.compact("tasks.json", "alice")
+
+
+def test_count_includes_operation_appended_in_between(storage, large, monkeypatch):
+    # Another worker logs a removal after this one read the log but before it appends
+    read_log = DataStore._read_log.__func__
+    raced = []
+    
+    def racing(cls, storage, name, user_id, ref):
+        data = read_log(cls, storage, name, user_id, ref)
+        if not raced:
+            raced.append(ref)
+            storage.append_block(_log_path(storage), OpLog.encode(OpLog.remove("id", 0)))
+        return data
+    monkeypatch.setattr(DataStore, "_read_log", classmethod(racing))
+    
+    assert DataStore.append("tasks.json", {"id": 21, "status": "open"}, "alice") == 21
+    assert _logged(storage) == ["remove", "add"]
+
+
+def test_sealed_log_is_compacted_before_appending(storage, large):
+    DataStore.remove_where("tasks.json", "id", 0, "alice")
+    sealed = _log_path(storage)
+    # A compaction that sealed the log and then died
+    storage.seal_append_blob(sealed)
+    
+    assert DataStore.append("tasks.json", {"id": 21, "status": "open"}, "alice") == 21
+    
+    assert _log_path(storage) != sealed
+    assert _logged(storage) == ["add"]
+    assert [entry["id"] for entry in DataStore.read("tasks.json", "alice")[0]] == list(range(1, 22))
+
+
+def test_counting_is_skipped_when_it_reads_too_many_segments(storage, large, segment_reads, monkeypatch):
+    monkeypatch.setattr(OplogConfig, "COUNT_MAX_SEGMENTS", 0)
+    segment_reads.clear()
+    
+    # Appends alone need no segments
+    assert DataStore.append("tasks.json", {"id": 21, "status": "open"}, "alice") == 22
+    assert DataStore.update_where("tasks.json", "id", 3, {"status": "done"}, "alice") == DataStore.UNCOUNTED
+    assert DataStore.append("tasks.json", {"id": 22, "status": "open"}, "alice") == DataStore.UNCOUNTED
+    
+    assert segment_reads == []
+    entries, total = DataStore.read("tasks.json", "alice")
+    assert total == 23
+    assert entries[3]["status"] == "done"
+
+
+def test_timer_compacts_pending_logs(storage, large):
+    DataStore.remove_where("tasks.json", "id", 0, "alice")
+    pending = _log_path(storage)
+    
+    compact_oplogs.main(SimpleNamespace(past_due=False))
+    
+    assert not storage.exists(pending)
+    assert _logged(storage) == []
+    assert _manifest(storage)["count"] == 20
@@ -0,0 +1,249 @@
+"""
+Tests of DataStore collections, plain and segmented
+"""
+import random
+
+import pytest
+
+from shared.config import ColumnarConfig, StorageConfig
+from shared.data_store import DataStore
+from shared.query import Cursor, Query
+
+
+def _tasks(count):
+    return [{"id": i, "status": "open" if i % 3 else "done", "title": f"Task {i}"} for i in range(count)]
+
+
+def _append_all(entries):
+    for entry in entries:
+        count = DataStore.append("tasks.json", entry, "alice")
+    return count
+
+
+def _segment_blobs(storage):
+    return [info.name for info in storage.list_blobs("users/alice/tasks.json.segments/")]
+
+
+def test_small_collection_stays_plain(storage, segmented):
+    assert _append_all(_tasks(10)) == 10
+    
+    document, _ = storage.read_json("tasks.json", "alice")
+    assert document == _tasks(10)
+    assert DataStore.read("tasks.json", "alice") == (_tasks(10), 10)
+
+
+def test_collection_is_segmented_past_threshold(storage, segmented):
+    assert _append_all(_tasks(14)) == 14
+    
+    manifest, _ = storage.read_json("tasks.json", "alice")
+    assert DataStore.is_manifest(manifest)
+    assert [segment["count"] for segment in manifest["segments"]] == [4, 4, 4, 2]
+    assert len(_segment_blobs(storage)) == 4
+    assert DataStore.read("tasks.json", "alice") == (_tasks(14), 14)
+
+
+def test_append_rewrites_only_the_tail_segment(storage, segmented):
+    _append_all(_tasks(11))
+    before, _ = storage.read_json("tasks.json", "alice")
+    
+    _append_all(_tasks(12)[11:])
+    
+    after, _ = storage.read_json("tasks.json", "alice")
+    assert after["segments"][:-1] == before["segments"][:-1]
+    assert after["segments"][-1]["blob"] != before["segments"][-1]["blob"]
+    # The replaced tail segment is cleaned up
+    assert len(_segment_blobs(storage)) == len(after["segments"])
+
+
+def test_filtered_read_skips_segments_by_bounds(storage, segmented, segment_reads):
+    _append_all(_tasks(20))
+    segment_reads.clear()
+    
+    entries, total = DataStore.read("tasks.json", "alice", match=("id", 13))
+    
+    assert entries == [_tasks(20)[13]] and total == 20
+    # Bounds compare strings, so "13" also falls within ["0", "3"] and ["10", "9"]
+    assert len(segment_reads) == 3
+
+
+def test_update_and_remove_rewrite_changed_segments(storage, segmented):
+    _append_all(_tasks(20))
+    before, _ = storage.read_json("tasks.json", "alice")
+    
+    def close(entry):
+        return {**entry, "status": "closed"} if str(entry["id"]) == "5" else None
+    assert DataStore.update_entries("tasks.json", close, "alice", first_only=True, match=("id", 5)) == 1
+    
+    def drop_done(entry):
+        return DataStore.DELETE if entry["status"] == "done" else None
+    assert DataStore.update_entries("tasks.json", drop_done, "alice") == 7
+    
+    expected = [
+        {**entry, "status": "closed"} if entry["id"] == 5 else entry
+        for entry in _tasks(20) if entry["status"] != "done"
+    ]
+    assert DataStore.read("tasks.json", "alice") == (expected, 13)
+    after, _ = storage.read_json("tasks.json", "alice")
+    assert after["count"] == 13
+    assert len(_segment_blobs(storage)) == len(after["segments"])
+    assert {segment["blob"] for segment in after["segments"]}.isdisjoint(
+        segment["blob"] for segment in before["segments"]
+    )
+
+
+def test_update_missing_collection(storage):
+    assert DataStore.update_entries("missing.json", lambda entry: None, "alice") is None
+    assert DataStore.read("missing.json", "alice") == (None, 0)
+
+
+def test_delete_removes_segments(storage, segmented):
+    _append_all(_tasks(20))
+    
+    DataStore.delete("tasks.json", "alice")
+    
+    assert list(storage.list_blobs("users/alice/")) == []
+
+
+@pytest.fixture
+def large_manifest(storage, segmented, cold, monkeypatch):
+    """A segmented collection whose manifest is stored larger than STREAM_MIN_BYTES"""
+    _append_all(_tasks(25))
+    manifest = storage.get_properties(storage.blob_path("tasks.json", "alice"))
+    monkeypatch.setattr(StorageConfig, "STREAM_MIN_BYTES", manifest.size // 2)
+    cold()
+
+
+def test_read_large_manifest(large_manifest):
+    entries, total = DataStore.read("tasks.json", "alice")
+    assert entries == _tasks(25)
+    assert total == 25
+
+
+def test_read_large_manifest_filtered(large_manifest):
+    entries, total = DataStore.read("tasks.json", "alice", match=("status", "done"), limit=3)
+    assert [entry["id"] for entry in entries] == [0, 3, 6]
+    assert total == 25
+
+
+def test_pages_of_large_manifest(large_manifest, monkeypatch):
+    monkeypatch.setattr(ColumnarConfig, "MIN_ENTRIES", 0)
+    query = Query.compile({"where": {"field": "status", "value": "open"}, "limit": 4, "fields": ["id"]})
+    pages = []
+    cursor = None
+    while True:
+        entries, total, token = DataStore.find_page("tasks.json", query, "alice", cursor)
+        pages.append([entry["id"] for entry in entries])
+        assert total == 25
+        if token is None:
+            break
+        cursor = Cursor.decode(token)
+    assert pages == [[1, 2, 4, 5], [7, 8, 10, 11], [13, 14, 16, 17], [19, 20, 22, 23]]
+
+
+def test_streamed_plain_array(storage, cold, monkeypatch):
+    _append_all(_tasks(25))
+    monkeypatch.setattr(StorageConfig, "STREAM_MIN_BYTES", 64)
+    cold()
+    entries, total = DataStore.read("tasks.json", "alice", match=("status", "done"))
+    assert [entry["id"] for entry in entries] == list(range(0, 25, 3))
+    assert total == 25
+    
+    entries, total = DataStore.read("tasks.json", "alice", limit=2)
+    assert entries == _tasks(2)
+    assert total == 25
+
+
+def test_append_many_fills_tail_then_splits(storage, segmented):
+    _append_all(_tasks(13))
+    
+    assert DataStore.append_many("tasks.json", _tasks(20)[13:], "alice") == 20
+    
+    entries, total = DataStore.read("tasks.json", "alice")
+    assert entries == _tasks(20) and total == 20
+    manifest, _ = storage.read_json("tasks.json", "alice")
+    assert [segment["count"] for segment in manifest["segments"]] == [4, 4, 4, 4, 4]
+
+
+@pytest.fixture
+def requests(storage, monkeypatch):
+    """Storage requests made, by kind"""
+    made = []
+    for method in ("download", "get_properties"):
+        original = getattr(storage, method)
+        
+        def recording(path, *args, _method=method, _original=original, **kwargs):
+            made.append((_method, path))
+            return _original(path, *args, **kwargs)
+        monkeypatch.setattr(storage, method, recording)
+    return made
+
+
+def test_cached_read_hit_costs_one_request(storage, requests):
+    _append_all(_tasks(5))
+    assert DataStore.read_cached("tasks.json", "alice") == (_tasks(5), 5, None, "miss")
+    requests.clear()
+    
+    assert DataStore.read_cached("tasks.json", "alice") == (_tasks(5), 5, None, "hit")
+    assert requests == [("download", "users/alice/tasks.json")]
+    assert DataStore.read_cached("tasks.json", "alice", match=("status", "done"))[3] == "miss"
+    assert DataStore.read_cached("nothing.json", "alice") == (None, 0, None, "bypass")
+
+
+def test_cached_read_opens_collection_once_on_miss(storage, cold, requests):
+    _append_all(_tasks(5))
+    cold()
+    requests.clear()
+    
+    assert DataStore.read_cached("tasks.json", "alice")[3] == "miss"
+    assert requests == [("download", "users/alice/tasks.json")]
+
+
+def test_cached_reads_follow_writes(storage, cold):
+    _append_all(_tasks(5))
+    DataStore.read_cached("tasks.json", "alice")
+    
+    DataStore.append("tasks.json", {"id": 5}, "alice")
+    assert storage.result_cache_stats()["invalidations"] == 1
+    assert DataStore.read_cached("tasks.json", "alice") == (_tasks(5) + [{"id": 5}], 6, None, "miss")
+    
+    # Written by another instance: only the ETag tells
+    storage._results.invalidate = lambda path: None
+    storage.write_json("tasks.json", _tasks(2), "alice")
+    storage._cache.clear()
+    assert DataStore.read_cached("tasks.json", "alice") == (_tasks(2), 2, None, "miss")
+
+
+@pytest.mark.parametrize("stream_min_bytes", [64, 4 * 1024 * 1024])
+def test_cached_reads_follow_logged_writes(storage, oplog_mode, monkeypatch, stream_min_bytes):
+    monkeypatch.setattr(StorageConfig, "STREAM_MIN_BYTES", stream_min_bytes)
+    rng = random.Random(7)
+    expected = _tasks(30)
+    DataStore.append_many("tasks.json", expected, "alice")
+    next_id = len(expected)
+    
+    for _ in range(60):
+        action = rng.choice(["append", "update", "remove"])
+        if action == "append":
+            entry = {"id": next_id, "status": "open", "title": f"Task {next_id}"}
+            next_id += 1
+            DataStore.append("tasks.json", entry, "alice")
+            expected.append(entry)
+        elif action == "update":
+            target = rng.choice(expected)["id"]
+            DataStore.update_where("tasks.json", "id", target, {"status": "done"}, "alice")
+            for entry in expected:
+                if entry["id"] == target:
+                    entry["status"] = "done"
+        else:
+            target = rng.choice(expected)["id"]
+            DataStore.remove_where("tasks.json", "id", target, "alice")
+            expected = [entry for entry in expected if entry["id"] != target]
+        
+        entries, total, _, _ = DataStore.read_cached("tasks.json", "alice")
+        assert entries == expected
+        assert total == len(expected)
+        assert DataStore.read_cached("tasks.json", "alice")[3] == "hit"
+        done, _, _, _ = DataStore.read_cached("tasks.json", "alice", match=("status", "done"))
+        assert done == [entry for entry in expected if entry["status"] == "done"]
+    
+    assert DataStore._oplog_ref(storage.read_json("tasks.json", "alice")[0]) is not None
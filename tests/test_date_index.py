@@ -0,0 +1,152 @@
+"""
+Tests of the per-user date index and the get_date_range / get_due_today endpoints
+"""
+import importlib
+import json
+
+import azure.functions as func
+import pytest
+
+from shared.data_store import DataStore
+from shared.date_index import DateIndex
+from shared.user_index import UserIndex
+
+get_date_range = importlib.import_module("get_date_range")
+get_due_today = importlib.import_module("get_due_today")
+manage_files = importlib.import_module("manage_files")
+
+
+def _tasks(count):
+    return [{"id": f"T{i}", "due": f"2026-10-{10 + i:02d}"} for i in range(count)]
+
+
+def _call(module, body=None, params=None):
+    request = func.HttpRequest(
+        method="POST" if body is not None else "GET",
+        url=f"/api/{module.__name__}",
+        headers={"X-User-Id": "alice"},
+        params=params or {},
+        body=json.dumps(body).encode("utf-8") if body is not None else b""
+    )
+    response = module.main(request)
+    return response.status_code, json.loads(response.get_body())
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    """Collections read to rebuild a per-user index section, in order"""
+    names = []
+    read_version = DataStore._read_version.__func__
+    
+    def recording(cls, storage, name, user_id):
+        names.append(name)
+        return read_version(cls, storage, name, user_id)
+    monkeypatch.setattr(DataStore, "_read_version", classmethod(recording))
+    return names
+
+
+def _assert_current(storage):
+    """Every stored section equals one built from scratch"""
+    for name, section in DateIndex.sections(DateIndex.load("alice")).items():
+        entries, etag, oplog, oplog_ops = DataStore._read_version(storage, name, "alice")
+        assert section == DateIndex.section(entries, etag, oplog, oplog_ops), name
+
+
+def test_user_index_is_abstract():
+    with pytest.raises(TypeError):
+        UserIndex()
+    assert DateIndex.is_index_blob("__indexes__/dates.json")
+    assert DateIndex.is_index_blob("users/alice/__indexes__/dates.json")
+    # A user's own folder of that name deeper down is theirs
+    assert not DateIndex.is_index_blob("users/alice/notes/__indexes__/a.json")
+    assert not DataStore.is_internal_blob("users/alice/notes/__indexes__/a.json")
+
+
+def test_date_keys():
+    assert DateIndex.date_key("2026-10-17") == "2026-10-17"
+    assert DateIndex.date_key("2026-10-17T09:30:00+02:00") == "2026-10-17T07:30:00"
+    assert DateIndex.date_key("17.10.2026") is None
+    assert DateIndex.date_key(20261017) is None
+
+
+def test_range_in_date_order(storage):
+    DataStore.append_many("tasks.json", _tasks(5), "alice")
+    DataStore.append_many("events.json", [
+        {"id": "E1", "date": "2026-10-12T18:00:00Z"},
+        {"id": "E2", "date": "2026-10-01"},
+    ], "alice")
+    
+    result = DataStore.date_range("2026-10-11", "2026-10-12", "alice")
+    assert [(hit["id"], hit["field"]) for hit in result.hits] == [("T1", "due"), ("T2", "due"), ("E1", "date")]
+    assert sorted(result.rebuilt) == ["events.json", "tasks.json"]
+    
+    result = DataStore.date_range(None, "2026-10-11", "alice", fields=["due"], limit=1, include_entries=True)
+    assert result.matched == 2
+    assert result.hits[0]["entry"] == {"id": "T0", "due": "2026-10-10"}
+
+
+def test_writes_keep_sections_current(storage, rebuilds):
+    DataStore.append_many("tasks.json", _tasks(5), "alice")
+    DataStore.date_range("2026-10-01", None, "alice")
+    rebuilds.clear()
+    
+    DataStore.append("tasks.json", {"id": "X1", "due": "2026-10-17"}, "alice")
+    DataStore.update_where("tasks.json", "id", "T3", {"due": "2026-10-17"}, "alice")
+    DataStore.remove_where("tasks.json", "id", "T1", "alice")
+    DataStore.append("new.json", {"id": "N1", "created": "2026-10-17T08:00:00Z"}, "alice")
+    
+    result = DataStore.date_range("2026-10-17", "2026-10-17", "alice")
+    assert rebuilds == []
+    assert [hit["id"] for hit in result.hits] == ["T3", "X1", "N1"]
+    _assert_current(storage)
+
+
+def test_logged_appends_keep_sections_current(storage, oplog_mode, rebuilds):
+    DataStore.append_many("tasks.json", _tasks(12), "alice")
+    DataStore.append("tasks.json", {"id": "T12"}, "alice")
+    DataStore.compact("tasks.json", "alice")
+    DataStore.date_range("2026-10-01", None, "alice")
+    rebuilds.clear()
+    
+    DataStore.append("tasks.json", {"id": "X1", "due": "2026-10-30"}, "alice")
+    assert [hit["id"] for hit in DataStore.date_range("2026-10-30", None, "alice").hits] == ["X1"]
+    assert rebuilds == []
+    
+    # A logged update leaves the section to the next reader
+    DataStore.update_where("tasks.json", "id", "T0", {"due": "2026-10-31"}, "alice")
+    assert [hit["id"] for hit in DataStore.date_range("2026-10-30", None, "alice").hits] == ["X1", "T0"]
+    assert rebuilds == ["tasks.json"]
+    _assert_current(storage)
+
+
+def test_sections_follow_rename_and_delete(storage):
+    DataStore.append_many("tasks.json", _tasks(3), "alice")
+    DataStore.date_range("2026-10-01", None, "alice")
+    
+    status, _ = _call(manage_files, {"operation": "rename", "source_name": "tasks.json", "target_name": "done.json"})
+    assert status == 200
+    assert {hit["file"] for hit in DataStore.date_range("2026-10-01", None, "alice").hits} == {"done.json"}
+    
+    DataStore.delete("done.json", "alice")
+    assert DataStore.date_range("2026-10-01", None, "alice").hits == []
+    assert DateIndex.sections(DateIndex.load("alice")) == {}
+    
+    status, body = _call(manage_files, {"operation": "list"})
+    assert status == 200 and "__indexes__" not in json.dumps(body)
+
+
+def test_handlers(storage):
+    DataStore.append_many("tasks.json", _tasks(5), "alice")
+    
+    status, body = _call(get_date_range, {"from": "2026-10-12", "to": "2026-10-13"})
+    assert status == 200
+    assert [hit["id"] for hit in body["hits"]] == ["T2", "T3"]
+    
+    status, body = _call(get_due_today, params={"date": "2026-10-12", "include_overdue": "true", "include_entries": "true"})
+    assert status == 200
+    assert [hit["entry"]["id"] for hit in body["hits"]] == ["T0", "T1", "T2"]
+    
+    assert _call(get_date_range, {})[0] == 400
+    assert _call(get_date_range, {"from": "soon"})[0] == 400
+    assert _call(get_date_range, {"from": "2026-10-01", "fields": ["deadline"]})[0] == 400
+    assert _call(get_due_today, params={"date": "12.10.2026"})[0] == 400
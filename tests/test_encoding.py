@@ -0,0 +1,94 @@
+"""
+Tests of the storage encodings for JSON documents
+"""
+import gzip
+import importlib
+import json
+from types import SimpleNamespace
+
+import azure.functions as func
+import pytest
+
+from shared.config import StorageConfig
+from shared.storage.encoding import COMPACT, ENCODINGS, GZIP, PRETTY, ZSTD, decode_blob, encode_json
+
+upload_data_or_file = importlib.import_module("upload_data_or_file")
+reencode_blobs = importlib.import_module("reencode_blobs")
+
+DOCUMENT = [{"id": 1, "title": "Zażółć gęślą jaźń", "tags": ["a", "b"]}, {"id": 2, "nested": {"x": None}}]
+
+
+@pytest.fixture(params=ENCODINGS)
+def encoding(request, monkeypatch):
+    if request.param == ZSTD:
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(StorageConfig, "JSON_ENCODING", request.param)
+    return request.param
+
+
+def test_encoded_documents_round_trip(encoding):
+    encoded = encode_json(DOCUMENT, encoding)
+    
+    assert json.loads(encoded.raw) == DOCUMENT
+    assert decode_blob(encoded.payload, encoded.metadata) == encoded.raw
+    assert encoded.metadata == {"json_encoding": encoding}
+
+
+def test_pretty_is_the_default_and_compact_is_smaller():
+    assert StorageConfig.JSON_ENCODING == PRETTY
+    assert len(encode_json(DOCUMENT, COMPACT).payload) < len(encode_json(DOCUMENT, PRETTY).payload)
+    with pytest.raises(ValueError):
+        encode_json(DOCUMENT, "brotli")
+
+
+def test_written_documents_read_back(storage, cold, encoding):
+    storage.write_json("tasks.json", DOCUMENT, "alice")
+    storage.update_json("notes.json", lambda data: data + DOCUMENT, "alice")
+    cold()
+    
+    assert storage.read_json("tasks.json", "alice")[0] == DOCUMENT
+    assert storage.read_json("notes.json", "alice")[0] == DOCUMENT
+    info = storage.get_properties(storage.blob_path("tasks.json", "alice"))
+    assert info.metadata["json_encoding"] == encoding
+    assert info.content_type == encode_json(DOCUMENT, encoding).content_type
+
+
+def test_legacy_pretty_blobs_are_read_and_reencoded(storage, cold, monkeypatch):
+    # Written before encodings existed: indented JSON without metadata
+    path = storage.blob_path("tasks.json", "alice")
+    storage.upload(path, json.dumps(DOCUMENT, indent=2).encode("utf-8"), content_type="application/json")
+    storage.create_append_blob(storage.blob_path("log.jsonl", "alice"))
+    monkeypatch.setattr(StorageConfig, "JSON_ENCODING", GZIP)
+    
+    assert storage.read_json("tasks.json", "alice")[0] == DOCUMENT
+    reencode_blobs.main(SimpleNamespace(past_due=False))
+    cold()
+    
+    data, info = storage.download(path)
+    assert info.metadata["json_encoding"] == GZIP
+    assert json.loads(gzip.decompress(data)) == DOCUMENT
+    assert storage.read_json("tasks.json", "alice")[0] == DOCUMENT
+    assert not storage.reencode_json(path, GZIP)
+    assert not storage.reencode_json(storage.blob_path("log.jsonl", "alice"), GZIP)
+
+
+def _upload(body):
+    request = func.HttpRequest(
+        method="POST",
+        url="/api/upload_data_or_file",
+        body=json.dumps({**body, "user_id": "alice"}).encode("utf-8")
+    )
+    return json.loads(upload_data_or_file.main(request).get_body())
+
+
+def test_uploaded_json_uses_the_storage_encoding(storage, cold, encoding):
+    response = _upload({"target_blob_name": "tasks.json", "file_content": DOCUMENT})
+    cold()
+    
+    data, info = storage.download(storage.blob_path("tasks.json", "alice"))
+    assert response["size_bytes"] == len(data) == info.size
+    assert info.metadata["json_encoding"] == encoding
+    assert storage.read_json("tasks.json", "alice")[0] == DOCUMENT
+    
+    text = _upload({"target_blob_name": "notes.txt", "file_content": "plain text"})
+    assert text["content_type"] == "text/plain" and text["size_bytes"] == len("plain text")
@@ -0,0 +1,180 @@
+"""
+Tests of the file handlers that write whole files or single entries in a user's namespace
+"""
+import importlib
+import json
+
+import azure.functions as func
+
+from shared.data_store import DataStore
+
+manage_files = importlib.import_module("manage_files")
+migrate_root_blobs = importlib.import_module("migrate_root_blobs")
+remove_data_entry = importlib.import_module("remove_data_entry")
+update_data_entry = importlib.import_module("update_data_entry")
+upload_data_or_file = importlib.import_module("upload_data_or_file")
+
+
+def _call(module, body, user_id="alice"):
+    request = func.HttpRequest(
+        method="POST",
+        url=f"/api/{module.__name__}",
+        headers={"X-User-Id": user_id},
+        body=json.dumps(body).encode("utf-8")
+    )
+    response = module.main(request)
+    try:
+        return response.status_code, json.loads(response.get_body())
+    except ValueError:
+        return response.status_code, response.get_body().decode("utf-8")
+
+
+def _tasks(count):
+    return [{"id": f"T{i:03d}", "status": "open"} for i in range(count)]
+
+
+def test_handlers_work_in_the_users_namespace(storage):
+    status, _ = _call(upload_data_or_file, {"target_blob_name": "tasks.json", "file_content": _tasks(3)})
+    assert status == 200
+    assert storage.exists("tasks.json", "alice")
+    assert not storage.exists("tasks.json")
+    
+    status, body = _call(update_data_entry, {
+        "target_blob_name": "tasks.json",
+        "find_key": "id",
+        "find_value": "t001",
+        "update_key": "status",
+        "update_value": "done"
+    })
+    assert status == 200 and body["user_id"] == "alice"
+    status, _ = _call(remove_data_entry, {"target_blob_name": "tasks.json", "key_to_find": "id", "value_to_find": "T002"})
+    assert status == 200
+    
+    entries, _ = DataStore.read("tasks.json", "alice")
+    assert entries == [{"id": "T000", "status": "open"}, {"id": "T001", "status": "done"}]
+    # Another user does not see the file
+    status, _ = _call(remove_data_entry, {"target_blob_name": "tasks.json", "key_to_find": "id", "value_to_find": "T000"}, "bob")
+    assert status == 404
+
+
+def test_upload_replaces_a_segmented_collection(storage, segmented):
+    DataStore.append_many("tasks.json", _tasks(20), "alice")
+    DataStore.create_index("tasks.json", ["status"], "alice")
+    
+    status, _ = _call(upload_data_or_file, {"target_blob_name": "tasks.json", "file_content": _tasks(2)})
+    
+    assert status == 200
+    assert [info.name for info in storage.list_blobs("users/alice/")] == ["users/alice/tasks.json"]
+    assert DataStore.read("tasks.json", "alice") == (_tasks(2), 2)
+
+
+def test_list_hides_internal_blobs(storage, segmented):
+    DataStore.append_many("tasks.json", _tasks(20), "alice")
+    storage.write_bytes("notes.txt", b"hello", "alice")
+    
+    status, body = _call(manage_files, {"operation": "list"})
+    
+    assert status == 200
+    assert body["files"] == ["notes.txt", "tasks.json"]
+
+
+def test_migrate_moves_root_blobs(storage, segmented):
+    DataStore.append_many("tasks.json", _tasks(20))
+    storage.write_bytes("notes.txt", b"root", None)
+    storage.write_bytes("notes.txt", b"alice", "alice")
+    
+    dry_run = migrate_root_blobs.migrate(storage, "alice")
+    assert "tasks.json" in dry_run["moved"]
+    assert dry_run["skipped"] == ["notes.txt"]
+    assert storage.exists("tasks.json")
+    
+    migrate_root_blobs.migrate(storage, "alice", apply=True)
+    
+    assert [info.name for info in storage.list_blobs()] == ["notes.txt"] + [
+        info.name for info in storage.list_blobs("users/")
+    ]
+    assert storage.read_bytes("notes.txt", "alice")[0] == b"alice"
+    assert DataStore.read("tasks.json", "alice") == (_tasks(20), 20)
+
+
+def _names(storage, user_id="alice"):
+    return storage.list_user_blobs(user_id)
+
+
+def _seed_files(storage):
+    for name in ("a.json", "b.json", "drafts/c.json", "drafts/d.json"):
+        storage.write_json(name, [{"id": name}], "alice")
+
+
+def test_batch_delete_by_names_and_prefix(storage):
+    _seed_files(storage)
+    
+    status, body = _call(manage_files, {"operation": "delete", "source_names": ["a.json", "missing.json"]})
+    assert status == 200
+    assert [result["status"] for result in body["results"]] == ["success", "not_found"]
+    
+    status, body = _call(manage_files, {"operation": "delete", "prefix": "drafts/"})
+    assert status == 200 and body["succeeded"] == 2
+    assert _names(storage) == ["b.json"]
+
+
+def test_batch_rename_and_archive(storage, segmented):
+    _seed_files(storage)
+    DataStore.append_many("big.json", _tasks(20), "alice")
+    
+    status, _ = _call(manage_files, {"operation": "rename", "prefix": "drafts/", "target_prefix": "notes/"})
+    assert status == 200
+    status, body = _call(manage_files, {"operation": "archive", "source_names": ["a.json", "big.json"]})
+    assert status == 200 and body["succeeded"] == 2
+    
+    assert [name for name in _names(storage) if not DataStore.is_internal_blob(name)] == [
+        "archive/a.json", "archive/big.json", "b.json", "notes/c.json", "notes/d.json"
+    ]
+    # Segments moved with the collection
+    assert DataStore.read("archive/big.json", "alice") == (_tasks(20), 20)
+    assert not any(name.startswith("big.json") for name in _names(storage))
+
+
+def test_ambiguous_batches_are_rejected(storage):
+    _seed_files(storage)
+    rejected = [
+        {"operation": "archive", "renames": [{"source_name": "a.json", "target_name": "x.json"}]},
+        {"operation": "delete", "source_name": "a.json", "prefix": "drafts/"},
+        {"operation": "archive", "source_name": "a.json", "source_names": ["b.json"]},
+        {"operation": "delete", "source_names": ["a.json"], "prefix": "drafts/"},
+        {"operation": "rename", "source_names": ["a.json"]},
+        {"operation": "archive", "prefix": ""},
+        {"operation": "delete", "prefix": None},
+    ]
+    for body in rejected:
+        status, _ = _call(manage_files, body)
+        assert status == 400, body
+    assert _names(storage) == ["a.json", "b.json", "drafts/c.json", "drafts/d.json"]
+    
+    # A single delete with an empty prefix only touches the named file
+    status, _ = _call(manage_files, {"operation": "delete", "source_name": "a.json", "prefix": ""})
+    assert status == 200
+    assert _names(storage) == ["b.json", "drafts/c.json", "drafts/d.json"]
+
+
+def test_list_pages_with_continuation_tokens(storage, segmented):
+    DataStore.append_many("big.json", _tasks(20), "alice")
+    for i in range(4):
+        storage.write_bytes(f"note_{i}.txt", b"x", "alice")
+    
+    pages, token = [], None
+    while True:
+        body = {"operation": "list", "max_results": 2, "include_details": True}
+        if token:
+            body["continuation_token"] = token
+        status, page = _call(manage_files, body)
+        assert status == 200
+        pages.append(page)
+        token = page["continuation_token"]
+        if not page["has_more"]:
+            break
+    
+    assert [len(page["files"]) for page in pages] == [2, 2, 1]
+    listed = [entry for page in pages for entry in page["files"]]
+    assert [entry["name"] for entry in listed] == ["big.json"] + [f"note_{i}.txt" for i in range(4)]
+    assert listed[1]["size"] == 1
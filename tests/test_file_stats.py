@@ -0,0 +1,139 @@
+"""
+Tests of the file statistics kept in blob metadata and of get_file_stats
+"""
+import importlib
+import json
+
+import azure.functions as func
+import pytest
+
+from shared.data_store import DataStore
+from shared.file_stats import FileStats
+
+get_file_stats = importlib.import_module("get_file_stats")
+upload_data_or_file = importlib.import_module("upload_data_or_file")
+
+
+def _entries(count):
+    return [{"id": i, "category": "work" if i % 3 else "home"} for i in range(count)]
+
+
+def _info(storage, name="tasks.json", user_id="alice"):
+    return storage.get_properties(storage.blob_path(name, user_id))
+
+
+def _call(module, body):
+    request = func.HttpRequest(
+        method="POST",
+        url=f"/api/{module.__name__}",
+        body=json.dumps(body).encode("utf-8")
+    )
+    response = module.main(request)
+    return response.status_code, json.loads(response.get_body())
+
+
+@pytest.fixture
+def no_downloads(storage, monkeypatch):
+    """Call to fail any later content read, so statistics must come from metadata"""
+    def download(*args, **kwargs):
+        raise AssertionError("get_file_stats downloaded a blob")
+    
+    def forbid():
+        monkeypatch.setattr(storage, "download", download)
+        monkeypatch.setattr(storage, "open_stream", download)
+    return forbid
+
+
+def test_writes_record_counts(storage):
+    DataStore.append_many("tasks.json", _entries(6), "alice")
+    DataStore.update_entries("tasks.json", lambda entry: {**entry, "category": "errand"} if entry["id"] == 0 else None, "alice")
+    
+    stats = FileStats.from_info(_info(storage))
+    assert stats["entry_count"] == 6
+    assert stats["category_counts"] == {"work": 4, "home": 1, "errand": 1}
+    assert stats["byte_size"] == _info(storage).size and not stats["segmented"]
+
+
+def test_segmented_counts_are_summed_from_descriptors(storage, segmented):
+    DataStore.append_many("tasks.json", _entries(14), "alice")
+    DataStore.update_entries("tasks.json", lambda entry: DataStore.DELETE if entry["id"] == 13 else None, "alice")
+    
+    stats = FileStats.from_info(_info(storage))
+    segment_bytes = sum(info.size for info in storage.list_blobs("users/alice/tasks.json.segments/"))
+    assert stats["segmented"]
+    assert stats["entry_count"] == 13
+    assert stats["category_counts"] == {"work": 8, "home": 5}
+    assert stats["byte_size"] == _info(storage).size + segment_bytes
+
+
+def test_category_counts_are_capped(monkeypatch):
+    monkeypatch.setattr(FileStats, "MAX_CATEGORY_BYTES", 64)
+    counts = {f"category-{i}": 100 - i for i in range(20)}
+    
+    metadata = FileStats.metadata(20, counts)
+    
+    assert len(metadata[FileStats.CATEGORY_COUNTS_KEY]) <= 64
+    assert metadata[FileStats.CATEGORIES_PARTIAL_KEY] == "true"
+    kept = json.loads(metadata[FileStats.CATEGORY_COUNTS_KEY])
+    # The most frequent categories are kept
+    assert kept == {name: counts[name] for name in list(counts)[:len(kept)]}
+
+
+def test_uploads_record_counts(storage):
+    _call(upload_data_or_file, {"target_blob_name": "tasks.json", "file_content": _entries(3), "user_id": "alice"})
+    stats = FileStats.from_info(_info(storage))
+    assert stats["entry_count"] == 3 and stats["category_counts"] == {"home": 1, "work": 2}
+    
+    _call(upload_data_or_file, {"target_blob_name": "profile.json", "file_content": {"name": "Alice"}, "user_id": "alice"})
+    assert FileStats.from_info(_info(storage, "profile.json"))["entry_count"] is None
+
+
+def test_get_file_stats_reads_only_metadata(storage, segmented, no_downloads):
+    DataStore.append_many("tasks.json", _entries(12), "alice")
+    DataStore.append_many("notes.json", _entries(2), "alice")
+    DataStore.create_index("tasks.json", ["id"], "alice")
+    no_downloads()
+    
+    status, single = _call(get_file_stats, {"target_blob_name": "tasks.json", "user_id": "alice"})
+    assert status == 200
+    assert single["files"][0]["entry_count"] == 12
+    
+    status, listing = _call(get_file_stats, {"user_id": "alice"})
+    assert status == 200
+    # Segments and indexes are not files of their own
+    assert {entry["file"]: entry["entry_count"] for entry in listing["files"]} == {"notes.json": 2, "tasks.json": 12}
+
+
+def test_get_file_stats_missing_file(storage):
+    status, body = _call(get_file_stats, {"target_blob_name": "missing.json", "user_id": "alice"})
+    assert status == 404 and "missing.json" in body["error"]
+
+
+def test_blobs_without_stats_report_unknown_counts(storage):
+    storage.write_bytes("old.json", b"[1, 2]", "alice")
+    stats = FileStats.from_info(_info(storage, "old.json"))
+    assert stats["entry_count"] is None and stats["category_counts"] is None
+
+
+def test_stats_include_logged_operations(storage, oplog_mode, segment_reads):
+    DataStore.append_many("tasks.json", _entries(20), "alice")
+    for i in range(20, 26):
+        DataStore.append("tasks.json", {"id": i, "category": "errand"}, "alice")
+    assert DataStore._oplog_ref(storage.read_json("tasks.json", "alice")[0]) is not None
+    segment_reads.clear()
+    
+    # Appended entries are counted from the log alone
+    stats = DataStore.file_stats("tasks.json", _info(storage), "alice")
+    assert stats["entry_count"] == 26
+    assert stats["category_counts"] == {"work": 13, "home": 7, "errand": 6}
+    assert segment_reads == []
+    
+    DataStore.update_where("tasks.json", "id", 0, {"category": "work"}, "alice")
+    DataStore.remove_where("tasks.json", "id", 1, "alice")
+    stats = DataStore.file_stats("tasks.json", _info(storage), "alice")
+    assert stats["entry_count"] == 25
+    assert stats["category_counts"] == {"work": 13, "home": 6, "errand": 6}
+    
+    DataStore.compact("tasks.json", "alice")
+    assert FileStats.from_info(_info(storage))["category_counts"] == {"work": 13, "home": 6, "errand": 6}
+    assert DataStore.file_stats("tasks.json", _info(storage), "alice")["entry_count"] == 25
@@ -0,0 +1,260 @@
+"""
+Tests of the partitioned interaction log and the per-thread logs kept alongside
+"""
+import importlib
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from shared.data_store import DataStore
+from shared.interaction_log import InteractionLog
+from shared.storage.cache import ResultCache
+
+build_thread_indexes = importlib.import_module("build_thread_indexes")
+
+
+@pytest.fixture(autouse=True)
+def fresh_counts(monkeypatch):
+    monkeypatch.setattr(InteractionLog, "_counts", ResultCache(64, 64))
+    monkeypatch.setattr(InteractionLog, "_thread_index_state", ResultCache(64, 64))
+
+
+@pytest.fixture
+def properties_calls(storage, monkeypatch):
+    """Record properties calls (listings carry no committed block counts)"""
+    calls = []
+    get_properties = storage.get_properties
+    
+    def properties(path):
+        calls.append(path)
+        return get_properties(path)
+    
+    monkeypatch.setattr(storage, "get_properties", properties)
+    return calls
+
+
+def _legacy(count):
+    return [
+        {"timestamp": f"2025-12-{day:02d}T12:00:00", "interaction_id": f"legacy-{day}", "user_message": "hi"}
+        for day in range(1, count + 1)
+    ]
+
+
+def _write_legacy(storage, count):
+    storage.write_bytes(InteractionLog.LEGACY_BLOB_NAME, json.dumps(_legacy(count)).encode("utf-8"), "alice")
+
+
+def _save(day, hour, **fields):
+    entry = {"timestamp": f"2026-01-{day:02d}T{hour:02d}:00:00", "interaction_id": f"{day}-{hour}", **fields}
+    return InteractionLog.append("alice", entry)
+
+
+def _ids(entries):
+    return [entry["interaction_id"] for entry in entries]
+
+
+def test_append_reports_running_total(storage):
+    totals = [_save(day, hour) for day in (1, 2) for hour in range(3)]
+    
+    assert totals == [1, 2, 3, 4, 5, 6]
+    assert storage.exists(InteractionLog.partition_name("2026-01-02"), "alice")
+    assert _ids(InteractionLog.iter_entries("alice")) == ["1-0", "1-1", "1-2", "2-0", "2-1", "2-2"]
+
+
+def test_pages_newest_first_across_partitions(storage):
+    for day in range(1, 4):
+        for hour in range(3):
+            _save(day, hour)
+    
+    page, total, has_more = InteractionLog.page("alice", 2, 3)
+    assert _ids(page) == ["3-0", "2-2", "2-1"] and total == 9 and has_more
+    
+    page, total, has_more = InteractionLog.page("alice", 6, 5)
+    assert _ids(page) == ["1-2", "1-1", "1-0"] and total == 9 and not has_more
+
+
+def test_partitions_before_the_offset_are_not_read(storage, monkeypatch):
+    for day in range(1, 4):
+        _save(day, 0)
+        _save(day, 1)
+    read = []
+    iter_lines = InteractionLog._iter_lines.__func__
+    
+    def recording(cls, path):
+        read.append(path)
+        return iter_lines(cls, path)
+    
+    monkeypatch.setattr(InteractionLog, "_iter_lines", classmethod(recording))
+    page, total, _ = InteractionLog.page("alice", 2, 2)
+    
+    assert _ids(page) == ["2-1", "2-0"] and total == 6
+    assert read == [storage.blob_path(InteractionLog.partition_name("2026-01-02"), "alice")]
+
+
+def test_thread_filter(storage):
+    for hour in range(4):
+        _save(1, hour, thread_id="a" if hour % 2 else "b")
+    _save(2, 0, thread_id="a")
+    
+    page, total, has_more = InteractionLog.page("alice", 0, 1, thread_id="a")
+    assert _ids(page) == ["2-0"] and total is None and has_more
+    
+    page, total, has_more = InteractionLog.page("alice", 0, 5, thread_id="a")
+    assert _ids(page) == ["2-0", "1-3", "1-1"] and total == 3 and not has_more
+
+
+def test_legacy_history_is_read_first_and_counted(storage):
+    _write_legacy(storage, 4)
+    
+    assert _save(1, 0) == 5
+    
+    # A fresh worker takes the legacy count from the first partition's metadata
+    InteractionLog._counts.clear()
+    assert _save(2, 0) == 6
+    assert _ids(InteractionLog.iter_entries("alice")) == ["legacy-1", "legacy-2", "legacy-3", "legacy-4", "1-0", "2-0"]
+    page, total, _ = InteractionLog.page("alice", 0, 3)
+    assert _ids(page) == ["2-0", "1-0", "legacy-4"] and total == 6
+    # The legacy array is left untouched rather than copied
+    assert storage.read_json(InteractionLog.LEGACY_BLOB_NAME, "alice")[0] == _legacy(4)
+
+
+def test_pre_partitioning_log_follows_legacy_array(storage):
+    _write_legacy(storage, 2)
+    path = storage.blob_path(InteractionLog.BLOB_NAME, "alice")
+    storage.create_append_blob(path, metadata={InteractionLog.LEGACY_ENTRIES_KEY: "2"})
+    storage.append_block(path, InteractionLog.encode_entry({"timestamp": "2025-12-20T12:00:00", "interaction_id": "jsonl"}))
+    
+    assert _save(1, 0) == 4
+    assert _ids(InteractionLog.iter_entries("alice")) == ["legacy-1", "legacy-2", "jsonl", "1-0"]
+    page, total, has_more = InteractionLog.page("alice", 1, 10)
+    assert _ids(page) == ["jsonl", "legacy-2", "legacy-1"] and total == 4 and not has_more
+
+
+def test_history_without_partitions_comes_from_legacy_array(storage):
+    _write_legacy(storage, 2)
+    
+    assert _ids(InteractionLog.iter_entries("alice")) == ["legacy-1", "legacy-2"]
+    assert InteractionLog.page("alice", 0, 10) == (list(reversed(_legacy(2))), 2, False)
+    assert list(InteractionLog.iter_entries("bob")) == []
+
+
+def test_totals_come_from_one_listing(storage, properties_calls):
+    for day in range(1, 8):
+        for hour in range(day):
+            _save(day, hour)
+    InteractionLog._counts.clear()
+    properties_calls.clear()
+    
+    page, total, has_more = InteractionLog.page("alice", 0, 3)
+    assert total == 28
+    assert _ids(page) == ["7-6", "7-5", "7-4"]
+    assert has_more
+    # Only the newest partition has no successor recording its count
+    assert properties_calls == [storage.blob_path(InteractionLog.partition_name("2026-01-07"), "alice")]
+    
+    # Appended to after its successor was created: counted from its properties again
+    _save(3, 23)
+    _, total, _ = InteractionLog.page("alice", 0, 3)
+    assert total == 29
+
+
+def test_count_cache_is_bounded(storage, monkeypatch):
+    monkeypatch.setattr(InteractionLog, "_counts", ResultCache(4, 4))
+    for user in range(10):
+        InteractionLog.append(f"user{user}", {"timestamp": "2026-01-01T10:00:00"})
+    assert InteractionLog._counts.stats()["entries"] <= 4
+
+
+def test_thread_blobs_are_internal():
+    assert DataStore.is_internal_blob("users/alice/interaction_threads.jsonl")
+    assert DataStore.is_internal_blob("interaction_threads.jsonl")
+    assert DataStore.is_internal_blob("users/alice/interaction_threads/t1.jsonl")
+    assert not DataStore.is_internal_blob("users/alice/my_interaction_threads.jsonl.json")
+    assert not DataStore.is_internal_blob("users/alice/interaction_logs/2026-01-01.jsonl")
+
+
+def _threaded_history():
+    _save(1, 0, thread_id="a")
+    _save(1, 1, thread_id=7)
+    _save(1, 2)
+    _save(2, 0, thread_id="a")
+
+
+def test_reads_scan_partitions_until_the_index_is_built(storage):
+    _threaded_history()
+    
+    page, total, _ = InteractionLog.page("alice", 0, 10, thread_id="7")
+    threads = InteractionLog.list_threads("alice")
+    
+    # Nothing is built on a read; thread ids match as strings
+    assert not storage.exists(InteractionLog.THREAD_INDEX_BLOB_NAME, "alice")
+    assert _ids(page) == ["1-1"] and total == 1
+    assert [(thread["thread_id"], thread["interaction_count"]) for thread in threads] == [("a", 2), ("7", 1)]
+
+
+def test_built_index_serves_thread_reads(storage):
+    _threaded_history()
+    
+    assert InteractionLog.build_thread_index("alice")
+    assert not InteractionLog.build_thread_index("alice")
+    _save(3, 0, thread_id="a")
+    _save(3, 1, thread_id="new")
+    
+    page, total, has_more = InteractionLog.page("alice", 0, 2, thread_id="a")
+    assert _ids(page) == ["3-0", "2-0"] and total == 3 and has_more
+    threads = {thread["thread_id"]: thread["interaction_count"] for thread in InteractionLog.list_threads("alice")}
+    assert threads == {"a": 3, "7": 1, "new": 1}
+
+
+def test_thread_index_state_is_bounded(storage, monkeypatch):
+    monkeypatch.setattr(InteractionLog, "_thread_index_state", ResultCache(4, 4))
+    for user in range(10):
+        InteractionLog.append(f"user{user}", {"timestamp": "2026-01-01T10:00:00", "thread_id": "t"})
+        InteractionLog.build_thread_index(f"user{user}")
+    assert InteractionLog._thread_index_state.stats()["entries"] <= 4
+
+
+def test_saves_racing_the_build_are_not_counted_twice(storage, monkeypatch):
+    _threaded_history()
+    _save(2, 5, thread_id="a")
+    create_append_blob = storage.create_append_blob
+    
+    def racing(path, **kwargs):
+        create_append_blob(path, **kwargs)
+        if path.endswith(InteractionLog.thread_blob_name("a")):
+            # The thread half of a save the build also copies from the partitions
+            entry = {"timestamp": "2026-01-02T05:00:00", "interaction_id": "2-5", "thread_id": "a"}
+            InteractionLog._append_line(path, InteractionLog.encode_entry(entry))
+    
+    monkeypatch.setattr(storage, "create_append_blob", racing)
+    InteractionLog.build_thread_index("alice")
+    monkeypatch.undo()
+    InteractionLog._counts.clear()
+    
+    threads = {thread["thread_id"]: thread["interaction_count"] for thread in InteractionLog.list_threads("alice")}
+    assert threads == {"a": 3, "7": 1}
+    page, total, _ = InteractionLog.page("alice", 0, 10, thread_id="a")
+    assert _ids(page) == ["2-5", "2-0", "1-0"] and total == 3
+
+
+def test_abandoned_build_is_restarted(storage, monkeypatch):
+    _threaded_history()
+    storage.create_append_blob(storage.blob_path(InteractionLog.THREAD_INDEX_BLOB_NAME, "alice"))
+    
+    assert not InteractionLog.build_thread_index("alice")
+    monkeypatch.setattr(InteractionLog, "THREAD_INDEX_BUILD_TIMEOUT", timedelta(seconds=-1))
+    assert InteractionLog.build_thread_index("alice")
+    assert InteractionLog.page("alice", 0, 10, thread_id="a")[1] == 2
+
+
+def test_timer_builds_pending_users(storage):
+    _threaded_history()
+    InteractionLog.append("bob", {"timestamp": "2026-01-01T10:00:00", "thread_id": "b"})
+    storage.write_json("tasks.json", [], "carol")
+    
+    assert build_thread_indexes.pending_users() == ["alice", "bob"]
+    build_thread_indexes.main(SimpleNamespace(past_due=False))
+    assert build_thread_indexes.pending_users() == []
+    assert InteractionLog.list_threads("bob")[0]["interaction_count"] == 1
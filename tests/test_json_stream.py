@@ -0,0 +1,47 @@
+"""
+Tests of streaming JSON arrays out of blob chunks
+"""
+import json
+
+import pytest
+
+from shared.storage.encoding import ENCODINGS, ZSTD, decode_chunks, encode_json
+from shared.storage.json_stream import NotJsonArrayError, iter_array
+
+DOCUMENT = [{"id": i, "title": f"Zadanie {i} – żółw", "tags": ["a", "b"], "nested": {"x": None}} for i in range(20)]
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 4096])
+def test_iter_array_across_chunk_boundaries(size):
+    data = json.dumps(DOCUMENT, indent=2, ensure_ascii=False).encode("utf-8")
+    assert list(iter_array(_chunks(data, size))) == DOCUMENT
+
+
+def test_iter_array_of_scalars_and_empty_array():
+    assert list(iter_array([b" [1, 2.5, \"x\", ", b"true, null] "])) == [1, 2.5, "x", True, None]
+    assert list(iter_array([b"[", b" ]"])) == []
+
+
+def test_iter_array_is_lazy():
+    items = iter_array(iter([b'[{"id": 0}, ', b'{"id": 1}, ', b'{"id": 2}]']))
+    assert next(items) == {"id": 0}
+
+
+def test_iter_array_rejects_other_documents():
+    with pytest.raises(NotJsonArrayError):
+        list(iter_array([b'{"segments": []}']))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_array([b'[{"id": 0}, {"id"']))
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_decoded_chunks_stream_back(encoding):
+    if encoding == ZSTD:
+        pytest.importorskip("zstandard")
+    encoded = encode_json(DOCUMENT, encoding)
+    chunks = decode_chunks(_chunks(encoded.payload, 50), encoded.metadata)
+    assert list(iter_array(chunks)) == DOCUMENT
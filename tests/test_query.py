@@ -0,0 +1,238 @@
+"""
+Tests of compiled query specs and of the handlers that accept them
+"""
+import importlib
+import json
+
+import azure.functions as func
+import pytest
+
+from shared.data_store import DataStore, NotAnArrayError
+from shared.config import StorageConfig
+from shared.query import Cursor, CursorError, Query, QueryError
+
+get_filtered_data = importlib.import_module("get_filtered_data")
+remove_data_entry = importlib.import_module("remove_data_entry")
+update_data_entry = importlib.import_module("update_data_entry")
+
+TASKS = [
+    {"id": "T1", "status": "open", "priority": 3, "due": "2026-10-20", "tags": ["work"]},
+    {"id": "T2", "status": "done", "priority": 1, "due": "2026-10-18T09:00:00Z"},
+    {"id": "T3", "status": "blocked", "priority": 10, "due": "2026-11-02", "tags": ["home"], "owner": "ala"},
+    {"id": "T4", "status": "open", "priority": 2, "title": "Write report"},
+]
+
+
+def _ids(query_spec, entries=TASKS):
+    query = Query.compile(query_spec)
+    return [entry["id"] for entry in query.finish([entry for entry in entries if query.where is None or query.where(entry)])]
+
+
+def _pages(query_spec, cursor=None):
+    """Ids of every page of a query, following the cursors"""
+    query = Query.compile(query_spec)
+    pages = []
+    while True:
+        entries, total, token = DataStore.find_page("many.json", query, "alice", cursor)
+        pages.append([entry["id"] for entry in entries])
+        if token is None:
+            return pages, total
+        cursor = Cursor.decode(token)
+
+
+def _many(count):
+    return [{"id": i, "status": "open" if i % 3 else "done", "rank": (i * 7) % count} for i in range(count)]
+
+
+def _call(module, body):
+    request = func.HttpRequest(
+        method="POST",
+        url=f"/api/{module.__name__}",
+        headers={"X-User-Id": "alice"},
+        body=json.dumps(body).encode("utf-8")
+    )
+    response = module.main(request)
+    try:
+        return response.status_code, json.loads(response.get_body())
+    except ValueError:
+        return response.status_code, response.get_body().decode("utf-8")
+
+
+def test_operators():
+    assert _ids({"where": {"field": "status", "op": "in", "value": ["open", "blocked"]}}) == ["T1", "T3", "T4"]
+    assert _ids({"where": {"field": "priority", "op": "gte", "value": 3}}) == ["T1", "T3"]
+    # Dates and datetimes compare as points in time
+    assert _ids({"where": {"field": "due", "op": "lt", "value": "2026-10-19"}}) == ["T2"]
+    assert _ids({"where": {"field": "tags", "op": "contains", "value": "work"}}) == ["T1"]
+    assert _ids({"where": {"field": "title", "op": "contains", "value": "REPORT"}}) == ["T4"]
+    assert _ids({"where": {"not": {"field": "owner", "op": "exists"}}}) == ["T1", "T2", "T4"]
+    assert _ids({"where": {"or": [
+        {"field": "status", "op": "eq", "value": "done"},
+        {"field": "priority", "op": "gt", "value": 5}
+    ]}}) == ["T2", "T3"]
+
+
+def test_sort_limit_and_fields():
+    assert _ids({"sort": ["-priority"], "limit": 2}) == ["T3", "T1"]
+    # Entries without the field sort last in either direction
+    assert _ids({"sort": ["due"]}) == ["T2", "T1", "T3", "T4"]
+    assert _ids({"sort": ["-due"]}) == ["T3", "T1", "T2", "T4"]
+    query = Query.compile({"fields": ["id", "status"], "limit": 1})
+    assert query.finish(TASKS) == [{"id": "T1", "status": "open"}]
+
+
+@pytest.mark.parametrize("spec", [
+    [],
+    {"where": {"field": "status", "op": "like", "value": "o%"}},
+    {"where": {"field": "status"}, "group": "id"},
+    {"limit": 0},
+    {"fields": []},
+    {"where": [{"field": "id", "op": "eq", "value": i} for i in range(Query.MAX_CLAUSES + 1)]},
+])
+def test_malformed_specs_are_rejected(spec):
+    with pytest.raises(QueryError):
+        Query.compile(spec)
+    assert Query.compile({"where": {"field": "id", "op": "eq", "value": "T1"}}, filter_only=True)
+    with pytest.raises(QueryError):
+        Query.compile({"sort": ["id"]}, filter_only=True)
+
+
+def test_find_prunes_segments_by_equality(storage, segmented, segment_reads):
+    entries = [{"id": i, "status": "open" if i < 12 else "done", "priority": i % 5} for i in range(20)]
+    DataStore.append_many("tasks.json", entries, "alice")
+    segment_reads.clear()
+    
+    query = Query.compile({"where": [
+        {"field": "status", "op": "eq", "value": "done"},
+        {"field": "priority", "op": "gte", "value": 3}
+    ], "sort": ["-id"]})
+    found, total = DataStore.find("tasks.json", query, "alice")
+    
+    assert [entry["id"] for entry in found] == [19, 18, 14, 13]
+    assert total == 20
+    # Segments holding only "open" entries are skipped by their bounds
+    assert len(segment_reads) == 2
+
+
+def test_find_rejects_documents(storage):
+    storage.write_json("profile.json", {"name": "Alice"}, "alice")
+    with pytest.raises(NotAnArrayError):
+        DataStore.find("profile.json", Query.compile({"limit": 1}), "alice")
+    
+    status, body = _call(get_filtered_data, {"target_blob_name": "profile.json", "query": {"limit": 1}})
+    assert status == 400 and "not a JSON array" in body["error"]
+
+
+def test_handlers_accept_queries(storage):
+    DataStore.append_many("tasks.json", TASKS, "alice")
+    
+    status, body = _call(get_filtered_data, {
+        "target_blob_name": "tasks.json",
+        "query": {"where": {"field": "status", "op": "eq", "value": "open"}, "fields": ["id"]}
+    })
+    assert status == 200 and body["data"] == [{"id": "T1"}, {"id": "T4"}] and body["total"] == 4
+    assert body["cache"] == "miss"
+    # The same query in another form is served from the result cache
+    status, body = _call(get_filtered_data, {
+        "target_blob_name": "tasks.json",
+        "query": {"fields": ["id"], "where": [{"field": "status", "value": "open"}]}
+    })
+    assert status == 200 and body["data"] == [{"id": "T1"}, {"id": "T4"}] and body["cache"] == "hit"
+    
+    status, body = _call(update_data_entry, {
+        "target_blob_name": "tasks.json",
+        "query": {"where": {"field": "status", "op": "eq", "value": "open"}},
+        "updates": {"status": "review"}
+    })
+    assert status == 200 and body["updated_count"] == 2
+    
+    status, body = _call(remove_data_entry, {
+        "target_blob_name": "tasks.json",
+        "query": {"where": {"field": "priority", "op": "lt", "value": 3}}
+    })
+    assert status == 200 and body["deleted_count"] == 2
+    assert [entry["id"] for entry in DataStore.read("tasks.json", "alice")[0]] == ["T1", "T3"]
+    
+    # Without 'where' every entry would match
+    status, _ = _call(remove_data_entry, {"target_blob_name": "tasks.json", "query": {}})
+    assert status == 400
+    status, _ = _call(update_data_entry, {"target_blob_name": "tasks.json", "query": {}, "updates": {"status": "x"}})
+    assert status == 400
+
+
+def test_bulk_changes_to_documents_are_rejected(storage):
+    storage.write_json("profile.json", {"name": "Alice"}, "alice")
+    query = {"where": {"field": "name", "op": "exists"}}
+    
+    status, _ = _call(update_data_entry, {"target_blob_name": "profile.json", "query": query, "updates": {"name": "Ala"}})
+    assert status == 400
+    status, _ = _call(remove_data_entry, {"target_blob_name": "profile.json", "query": query})
+    assert status == 500
+    assert storage.read_json("profile.json", "alice")[0] == {"name": "Alice"}
+
+
+def test_cursor_tokens():
+    cursor = Cursor(12, "version", "scope")
+    assert Cursor.decode(cursor.encode()) == cursor
+    for token in ["", "not base64!", Cursor(-1, "v", "s").encode(), 12]:
+        with pytest.raises(CursorError):
+            Cursor.decode(token)
+
+
+@pytest.mark.parametrize("layout", ["plain", "segmented", "oplog", "streamed"])
+def test_pages_cover_results_once(storage, layout, request, monkeypatch):
+    if layout in ("segmented", "oplog"):
+        request.getfixturevalue("oplog_mode" if layout == "oplog" else "segmented")
+    entries = _many(23)
+    DataStore.append_many("many.json", entries, "alice")
+    if layout == "oplog":
+        DataStore.append("many.json", {"id": 23, "status": "open", "rank": 0}, "alice")
+        DataStore.remove_where("many.json", "id", 1, "alice")
+        entries = DataStore.read("many.json", "alice")[0]
+    if layout == "streamed":
+        monkeypatch.setattr(StorageConfig, "STREAM_MIN_BYTES", 64)
+        request.getfixturevalue("cold")()
+    
+    where = {"field": "status", "value": "open"}
+    pages, total = _pages({"where": where, "limit": 4})
+    assert total == len(entries)
+    assert all(len(page) == 4 for page in pages[:-1])
+    assert sum(pages, []) == [entry["id"] for entry in entries if entry["status"] == "open"]
+    
+    pages, _ = _pages({"where": where, "sort": ["-rank", "id"], "limit": 5, "fields": ["id"]})
+    expected = sorted((entry for entry in entries if entry["status"] == "open"), key=lambda entry: (-entry["rank"], entry["id"]))
+    assert sum(pages, []) == [entry["id"] for entry in expected]
+
+
+def test_cursors_are_bound_to_query_and_version(storage):
+    DataStore.append_many("many.json", _many(10), "alice")
+    query = Query.compile({"where": {"field": "status", "value": "open"}, "limit": 2})
+    _, _, token = DataStore.find_page("many.json", query, "alice")
+    cursor = Cursor.decode(token)
+    
+    with pytest.raises(CursorError):
+        DataStore.find_page("many.json", Query.compile({"limit": 2}), "alice", cursor)
+    DataStore.append("many.json", {"id": 10}, "alice")
+    with pytest.raises(CursorError, match="changed since the cursor was issued"):
+        DataStore.find_page("many.json", query, "alice", cursor)
+
+
+def test_handler_pages(storage):
+    DataStore.append_many("many.json", _many(7), "alice")
+    
+    status, body = _call(get_filtered_data, {"target_blob_name": "many.json", "key": "status", "value": "open", "limit": 3, "fields": ["id"]})
+    assert status == 200
+    assert body["data"] == [{"id": 1}, {"id": 2}, {"id": 4}] and body["total"] == 7
+    status, body = _call(get_filtered_data, {
+        "target_blob_name": "many.json", "key": "status", "value": "open", "limit": 3, "cursor": body["next_cursor"]
+    })
+    assert status == 200
+    assert [entry["id"] for entry in body["data"]] == [5] and body["next_cursor"] is None
+    
+    status, body = _call(get_filtered_data, {"target_blob_name": "many.json", "query": {"sort": "-id"}, "limit": 2})
+    assert [entry["id"] for entry in body["data"]] == [6, 5]
+    cursor = body["next_cursor"]
+    assert _call(get_filtered_data, {"target_blob_name": "many.json", "query": {"sort": "id"}, "cursor": cursor})[0] == 400
+    assert _call(get_filtered_data, {"target_blob_name": "many.json", "cursor": "garbage"})[0] == 400
+    DataStore.append("many.json", {"id": 7}, "alice")
+    assert _call(get_filtered_data, {"target_blob_name": "many.json", "query": {"sort": "-id"}, "cursor": cursor})[0] == 409
@@ -0,0 +1,99 @@
+"""
+Tests of query_files, the concurrent filter across a user's files
+"""
+import asyncio
+import importlib
+import json
+
+import azure.functions as func
+
+from shared.config import AzureConfig
+from shared.data_store import DataStore
+
+query_files = importlib.import_module("query_files")
+
+
+def _query(body):
+    request = func.HttpRequest(
+        method="POST",
+        url="/api/query_files",
+        body=json.dumps(body).encode("utf-8")
+    )
+    response = asyncio.run(query_files.main(request))
+    return response.status_code, json.loads(response.get_body())
+
+
+def _seed(storage):
+    DataStore.append_many("tasks.json", [{"id": i, "status": "open" if i % 2 else "done"} for i in range(12)], "alice")
+    DataStore.append_many("ideas.json", [{"id": 1, "status": "open"}], "alice")
+    DataStore.append_many("archive/old.json", [{"id": 9, "status": "open"}], "alice")
+    storage.write_bytes("notes.txt", b"open", "alice")
+    storage.write_json("profile.json", {"status": "open"}, "alice")
+    DataStore.append_many("tasks.json", [{"id": 0, "status": "open"}], "bob")
+
+
+def test_queries_every_json_file(storage, segmented):
+    _seed(storage)
+    DataStore.create_index("tasks.json", ["status"], "alice")
+    
+    status, body = _query({"key": "status", "value": "open", "user_id": "alice"})
+    
+    assert status == 200 and body["status"] == "success"
+    per_file = {entry["file"]: (entry["count"], entry["total"]) for entry in body["files"]}
+    # Segments and indexes are not listed; the non-array profile is skipped
+    assert per_file == {"archive/old.json": (1, 1), "ideas.json": (1, 1), "profile.json": (0, 1), "tasks.json": (6, 12)}
+    assert sorted(entry["entry"]["id"] for entry in body["data"] if entry["file"] == "tasks.json") == [1, 3, 5, 7, 9, 11]
+    assert body["count"] == 8
+
+
+def test_prefix_and_limit(storage):
+    _seed(storage)
+    
+    _, body = _query({"prefix": "archive/", "user_id": "alice"})
+    assert [entry["file"] for entry in body["files"]] == ["archive/old.json"]
+    
+    _, body = _query({"files": ["tasks.json", "ideas.json"], "limit": 2, "user_id": "alice"})
+    assert body["count"] == 3
+    assert [entry["entry"]["id"] for entry in body["data"]] == [0, 1, 1]
+
+
+def test_missing_and_internal_files_are_reported(storage, segmented):
+    _seed(storage)
+    segment = next(storage.list_blobs("users/alice/tasks.json.segments/")).name[len("users/alice/"):]
+    
+    status, body = _query({"files": ["ideas.json", "missing.json", segment], "user_id": "alice"})
+    
+    assert status == 200 and body["status"] == "partial"
+    assert body["errors"] == [
+        {"file": segment, "error": "Not a user file"},
+        {"file": "missing.json", "error": "File not found"},
+    ]
+    assert [entry["file"] for entry in body["files"]] == ["ideas.json"]
+
+
+def test_reads_are_bounded_by_the_concurrency_limit(storage, monkeypatch):
+    for i in range(6):
+        DataStore.append_many(f"file{i}.json", [{"id": i}], "alice")
+    monkeypatch.setattr(AzureConfig, "QUERY_MAX_CONCURRENCY", 2)
+    running = []
+    peak = []
+    read = DataStore.read.__func__
+    
+    def counting_read(cls, *args, **kwargs):
+        running.append(1)
+        peak.append(len(running))
+        try:
+            return read(cls, *args, **kwargs)
+        finally:
+            running.pop()
+    
+    monkeypatch.setattr(DataStore, "read", classmethod(counting_read))
+    _, body = _query({"user_id": "alice"})
+    
+    assert body["count"] == 6
+    assert max(peak) <= 2
+
+
+def test_invalid_parameters(storage):
+    assert _query({"files": "tasks.json"})[0] == 400
+    assert _query({"limit": 0})[0] == 400
@@ -0,0 +1,126 @@
+"""
+Tests of the per-file search indexes and the get_search endpoint
+"""
+import importlib
+import json
+
+import azure.functions as func
+
+from shared.data_store import DataStore
+from shared.search_index import SearchIndex
+
+get_search = importlib.import_module("get_search")
+manage_files = importlib.import_module("manage_files")
+upload_data_or_file = importlib.import_module("upload_data_or_file")
+
+NOTES = [
+    {"id": "N1", "text": "Buy milk and bread"},
+    {"id": "N2", "text": "Milk the cows, milk the goats", "tags": ["farm"]},
+    {"id": "N3", "text": "Call the bakery about bread"},
+]
+
+
+def _call(module, body):
+    request = func.HttpRequest(
+        method="POST",
+        url=f"/api/{module.__name__}",
+        headers={"X-User-Id": "alice"},
+        body=json.dumps(body).encode("utf-8")
+    )
+    response = module.main(request)
+    return response.status_code, json.loads(response.get_body())
+
+
+def _ids(result):
+    return [hit["id"] for hit in result.hits]
+
+
+def test_tokenize():
+    assert SearchIndex.tokenize("Zażółć gęślą jaźń, 2026!") == ["zażółć", "gęślą", "jaźń", "2026"]
+    tokens = SearchIndex.entry_tokens({"id": "N1", "text": "Hello", "meta": {"tags": ["red fox"]}, "done": True})
+    assert sorted(tokens) == ["fox", "hello", "n1", "red"]
+
+
+def test_bm25_ranks_by_term_frequency(storage):
+    DataStore.append_many("notes.json", NOTES, "alice")
+    
+    result = DataStore.search("milk", "alice")
+    assert _ids(result) == ["N2", "N1"]
+    assert result.hits[0]["score"] > result.hits[1]["score"] > 0
+    assert _ids(DataStore.search("milk bread", "alice", require_all=True)) == ["N1"]
+    assert _ids(DataStore.search("bread milk", "alice", scored=False)) == ["N1", "N2", "N3"]
+    assert result.rebuilt == ["notes.json"]
+
+
+def test_index_follows_writes(storage):
+    DataStore.append_many("notes.json", NOTES, "alice")
+    DataStore.search("milk", "alice")
+    
+    DataStore.append("notes.json", {"id": "N4", "text": "Bread recipes"}, "alice")
+    DataStore.remove_where("notes.json", "id", "N1", "alice")
+    
+    result = DataStore.search("bread", "alice")
+    assert result.rebuilt == []
+    assert sorted(_ids(result)) == ["N3", "N4"]
+
+
+def test_index_follows_logged_appends(storage, oplog_mode):
+    DataStore.append_many("notes.json", NOTES * 4, "alice")
+    DataStore.append("notes.json", {"id": "N0", "text": "seed"}, "alice")
+    DataStore.compact("notes.json", "alice")
+    DataStore.search("bread", "alice")
+    
+    DataStore.append("notes.json", {"id": "N4", "text": "Rye bread"}, "alice")
+    
+    result = DataStore.search("rye", "alice")
+    assert result.rebuilt == []
+    assert _ids(result) == ["N4"]
+    assert result.hits[0]["position"] == 13
+
+
+def test_stale_index_is_rebuilt(storage):
+    DataStore.append_many("notes.json", NOTES, "alice")
+    DataStore.search("milk", "alice")
+    # Written behind the index's back
+    storage.write_json("notes.json", [{"id": "N9", "text": "Oat milk"}], "alice")
+    
+    result = DataStore.search("milk", "alice")
+    assert result.rebuilt == ["notes.json"]
+    assert _ids(result) == ["N9"]
+
+
+def test_handler(storage):
+    DataStore.append_many("notes.json", NOTES, "alice")
+    DataStore.append_many("other.json", [{"id": "O1", "text": "bread"}], "alice")
+    
+    status, body = _call(get_search, {"query": "bread", "files": ["notes.json"], "include_entries": True})
+    assert status == 200
+    assert body["files_searched"] == 1
+    assert sorted(hit["id"] for hit in body["hits"]) == ["N1", "N3"]
+    assert all(hit["entry"] == NOTES[hit["position"]] for hit in body["hits"])
+    
+    status, body = _call(get_search, {"query": "bread", "limit": 1})
+    assert status == 200 and body["count"] == 1 and body["matched"] == 3
+    
+    assert _call(get_search, {"query": " "})[0] == 400
+    assert _call(get_search, {"query": "bread", "match": "some"})[0] == 400
+    assert _call(get_search, {"query": "bread", "limit": 0})[0] == 400
+
+
+def test_index_is_hidden_and_removed_with_the_collection(storage):
+    DataStore.append_many("notes.json", NOTES, "alice")
+    DataStore.search("milk", "alice")
+    index_blob = SearchIndex.index_name("notes.json")
+    assert storage.exists(index_blob, "alice")
+    
+    status, body = _call(manage_files, {"operation": "list"})
+    assert status == 200
+    assert "searchindex" not in json.dumps(body)
+    
+    status, _ = _call(upload_data_or_file, {"target_blob_name": "notes.json", "file_content": NOTES[:1]})
+    assert status == 200
+    assert not storage.exists(index_blob, "alice")
+    
+    DataStore.search("milk", "alice")
+    DataStore.delete("notes.json", "alice")
+    assert not storage.exists(index_blob, "alice")
@@ -0,0 +1,231 @@
+"""
+Tests of the storage backends and the JSON helpers they share
+"""
+import asyncio
+import os
+
+import pytest
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotModifiedError
+
+from shared.azure_client import ConcurrencyConflictError
+from shared.config import AzureConfig
+from shared.storage import base
+from shared.storage.cache import BlobCache, CachedBlob, ResultCache
+from shared.storage.local_backend import LocalStorageBackend
+from shared.storage.memory_backend import MemoryStorageBackend
+
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorageBackend()
+    return LocalStorageBackend(str(tmp_path), "test-container")
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(base.time, "sleep", delays.append)
+    return delays
+
+
+def test_conditional_uploads(backend):
+    etag = backend.upload("users/alice/tasks.json", b"[]", if_missing=True)
+    
+    with pytest.raises(ResourceExistsError):
+        backend.upload("users/alice/tasks.json", b"[1]", if_missing=True)
+    new_etag = backend.upload("users/alice/tasks.json", b"[1]", etag=etag)
+    with pytest.raises(ResourceModifiedError):
+        backend.upload("users/alice/tasks.json", b"[2]", etag=etag)
+    with pytest.raises(ResourceNotModifiedError):
+        backend.download("users/alice/tasks.json", etag=new_etag)
+    
+    data, info = backend.download("users/alice/tasks.json", etag=etag)
+    assert data == b"[1]" and info.etag == new_etag != etag
+
+
+def test_append_blobs_count_blocks(backend):
+    backend.create_append_blob("users/alice/log.jsonl", metadata={"kind": "log"})
+    
+    with pytest.raises(ResourceExistsError):
+        backend.create_append_blob("users/alice/log.jsonl")
+    assert backend.append_block("users/alice/log.jsonl", b"a\n") == 1
+    assert backend.append_block("users/alice/log.jsonl", b"b\n") == 2
+    _, chunks = backend.open_stream("users/alice/log.jsonl")
+    assert b"".join(chunks) == b"a\nb\n"
+    assert backend.get_properties("users/alice/log.jsonl").metadata == {"kind": "log"}
+
+
+def test_list_blobs_by_prefix(backend):
+    for name in ["users/alice/a.json", "users/alice/notes/b.json", "users/alicia/c.json", "users/bob/d.json"]:
+        backend.upload(name, b"{}")
+    
+    assert [info.name for info in backend.list_blobs("users/alice/")] == [
+        "users/alice/a.json",
+        "users/alice/notes/b.json",
+    ]
+    assert [info.name for info in backend.list_blobs("users/ali")] == [
+        "users/alice/a.json",
+        "users/alice/notes/b.json",
+        "users/alicia/c.json",
+    ]
+    assert backend.list_user_blobs("alice", "notes/") == ["notes/b.json"]
+
+
+def _visible(name):
+    return not name.startswith("hidden")
+
+
+def _sync_pages(backend, max_results):
+    pages, token = [], None
+    while True:
+        infos, token = backend.list_user_page("alice", None, max_results, token, _visible)
+        pages.append([info.name for info in infos])
+        if token is None:
+            return pages
+
+
+async def _async_pages(backend, max_results):
+    pages, token = [], None
+    while True:
+        infos, token = await backend.alist_user_page("alice", None, max_results, token, _visible)
+        pages.append([info.name for info in infos])
+        if token is None:
+            return pages
+
+
+def test_user_pages_resume_past_hidden_blobs(backend):
+    for i in range(7):
+        backend.upload(f"users/alice/notes_{i}.json", b"[]")
+        backend.upload(f"users/alice/hidden_{i}.json", b"[]")
+    
+    pages = _sync_pages(backend, 3)
+    
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == [f"notes_{i}.json" for i in range(7)]
+    backend._listings.clear()
+    assert asyncio.run(_async_pages(backend, 3)) == pages
+
+
+def test_listing_pages_are_dropped_by_own_writes(backend):
+    backend.upload("users/alice/a.json", b"[]")
+    assert _sync_pages(backend, 10) == [["a.json"]]
+    
+    backend.upload("users/alice/b.json", b"[]")
+    assert _sync_pages(backend, 10) == [["a.json", "b.json"]]
+    backend.delete("users/alice/a.json")
+    assert _sync_pages(backend, 10) == [["b.json"]]
+    assert backend.listing_cache_stats()["hits"] == 0
+    assert _sync_pages(backend, 10) == [["b.json"]]
+    assert backend.listing_cache_stats()["hits"] == 1
+
+
+def test_local_listing_walks_only_the_prefix_directory(tmp_path, monkeypatch):
+    backend = LocalStorageBackend(str(tmp_path), "test-container")
+    backend.upload("users/alice/a.json", b"{}")
+    backend.upload("users/bob/b.json", b"{}")
+    walked = []
+    walk = os.walk
+    
+    def recording_walk(top, *args, **kwargs):
+        walked.append(top)
+        return walk(top, *args, **kwargs)
+    monkeypatch.setattr(os, "walk", recording_walk)
+    
+    assert [info.name for info in backend.list_blobs("users/alice/a")] == ["users/alice/a.json"]
+    assert walked == [os.path.join(backend.data_root, "users", "alice")]
+    assert list(backend.list_blobs("users/carol/")) == []
+
+
+def test_local_backend_rejects_escaping_names(tmp_path):
+    backend = LocalStorageBackend(str(tmp_path), "test-container")
+    
+    with pytest.raises(ValueError):
+        backend.upload("users/alice/../bob/tasks.json", b"[]")
+
+
+def test_reads_are_revalidated_from_cache(backend):
+    backend.write_bytes("tasks.json", b'[{"id": 1}]', "alice")
+    backend._cache.clear()
+    
+    first, etag = backend.read_json("tasks.json", "alice")
+    second, same_etag = backend.read_json("tasks.json", "alice")
+    third, _ = asyncio.run(backend.aread_json("tasks.json", "alice"))
+    
+    # A 304 reuses the parsed document instead of decoding it again
+    assert second is first and third is first and same_etag == etag
+    assert backend.cache_stats()["hits"] == 2
+    assert backend.cache_stats()["misses"] == 1
+
+
+def test_update_json_creates_missing_blob(backend, sleeps):
+    result = backend.update_json("tasks.json", lambda data: data + [{"id": 1}], "alice")
+    
+    assert result == [{"id": 1}]
+    assert backend.read_json("tasks.json", "alice")[0] == [{"id": 1}]
+    assert backend.cache_stats()["misses"] == 0
+    assert sleeps == []
+
+
+def test_update_json_remerges_after_concurrent_write(backend, sleeps):
+    backend.write_bytes("tasks.json", b'[{"id": 1}]', "alice")
+    calls = []
+    
+    def append(data):
+        calls.append(list(data))
+        if len(calls) == 1:
+            # Another worker appends between our read and our write
+            backend.upload(backend.blob_path("tasks.json", "alice"), b'[{"id": 1}, {"id": 2}]')
+        return data + [{"id": 3}]
+    
+    result = backend.update_json("tasks.json", append, "alice")
+    
+    assert calls == [[{"id": 1}], [{"id": 1}, {"id": 2}]]
+    assert result == backend.read_json("tasks.json", "alice")[0] == [{"id": 1}, {"id": 2}, {"id": 3}]
+    assert len(sleeps) == 1
+
+
+def test_update_json_backs_off_only_between_attempts(backend, sleeps, monkeypatch):
+    monkeypatch.setattr(AzureConfig, "WRITE_MAX_ATTEMPTS", 3)
+    backend.write_bytes("tasks.json", b"[]", "alice")
+    
+    def always_loses(data):
+        backend.upload(backend.blob_path("tasks.json", "alice"), b'[{"id": "other"}]')
+        return data + [{"id": "mine"}]
+    
+    with pytest.raises(ConcurrencyConflictError):
+        backend.update_json("tasks.json", always_loses, "alice")
+    
+    assert len(sleeps) == 2
+    assert backend.read_json("tasks.json", "alice")[0] == [{"id": "other"}]
+
+
+def test_blob_cache_evicts_least_recently_used():
+    cache = BlobCache(max_bytes=10, max_entries=2)
+    cache.put("a", CachedBlob(etag="1", data=b"aaaa"))
+    cache.put("b", CachedBlob(etag="1", data=b"bbbb"))
+    cache.get("a")
+    cache.put("c", CachedBlob(etag="1", data=b"cccc"))
+    cache.put("huge", CachedBlob(etag="1", data=b"x" * 11))
+    
+    assert cache.get("b") is None and cache.get("huge") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_cache_drops_results_of_changed_blobs():
+    cache = ResultCache(max_bytes=100, max_entries=10)
+    assert cache.put("all", "v1", [1, 2], 10, paths=["users/alice/tasks.json"])
+    assert cache.put("both", "v1", [3], 10, paths=["users/alice/tasks.json", "users/alice/log"])
+    assert not cache.put("huge", "v1", [], 101)
+    
+    assert cache.get("all", "v2") is None
+    cache.invalidate("users/alice/log")
+    assert cache.get("both", "v1") is None
+    assert cache.stats()["invalidations"] == 1
+    
+    cache.put("all", "v1", [1, 2], 10, paths=["users/alice/tasks.json"])
+    assert cache.get("all", "v1") == [1, 2]
+    cache.invalidate("users/alice/tasks.json")
+    assert cache.get("all", "v1") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
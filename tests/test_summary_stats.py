@@ -0,0 +1,113 @@
+"""
+Tests of the per-user summary counts and the get_summary_stats endpoint
+"""
+import importlib
+import json
+
+import azure.functions as func
+import pytest
+
+from shared.data_store import DataStore
+from shared.summary_stats import SummaryStats
+
+get_summary_stats = importlib.import_module("get_summary_stats")
+
+
+def _tasks(count):
+    return [{"id": i, "status": "open", "category": "work" if i % 2 else "home"} for i in range(count)]
+
+
+def _call(params=None):
+    request = func.HttpRequest(
+        method="GET",
+        url="/api/get_summary_stats",
+        headers={"X-User-Id": "alice"},
+        params=params or {},
+        body=b""
+    )
+    response = get_summary_stats.main(request)
+    return response.status_code, json.loads(response.get_body())
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    """Collections read to rebuild a per-user index section, in order"""
+    names = []
+    read_version = DataStore._read_version.__func__
+    
+    def recording(cls, storage, name, user_id):
+        names.append(name)
+        return read_version(cls, storage, name, user_id)
+    monkeypatch.setattr(DataStore, "_read_version", classmethod(recording))
+    return names
+
+
+def test_overview(storage):
+    DataStore.append_many("tasks.json", _tasks(5), "alice")
+    DataStore.append_many("notes.json", [{"id": "N1", "category": "work"}, {"id": "N2"}], "alice")
+    
+    status, body = _call()
+    assert status == 200
+    assert body["entry_count"] == 7 and body["file_count"] == 2
+    assert body["groups"] == {"category": {"work": 3, "home": 3}, "status": {"open": 5}}
+    assert body["files"][0] == {"file": "notes.json", "entry_count": 2, "groups": {"category": {"work": 1}}}
+    
+    status, body = _call({"prefix": "tasks"})
+    assert status == 200 and body["entry_count"] == 5
+
+
+def test_writes_apply_deltas(storage, rebuilds):
+    DataStore.append_many("tasks.json", _tasks(5), "alice")
+    _call()
+    rebuilds.clear()
+    
+    DataStore.append("tasks.json", {"id": 5, "status": "open"}, "alice")
+    DataStore.update_where("tasks.json", "id", 0, {"status": "done"}, "alice")
+    DataStore.remove_where("tasks.json", "id", 1, "alice")
+    
+    status, body = _call()
+    assert rebuilds == []
+    assert body["groups"] == {"category": {"home": 3, "work": 1}, "status": {"open": 4, "done": 1}}
+
+
+def test_logged_operations_apply_deltas(storage, oplog_mode, rebuilds, monkeypatch):
+    DataStore.append_many("tasks.json", _tasks(20), "alice")
+    DataStore.append("tasks.json", {"id": 20}, "alice")
+    DataStore.compact("tasks.json", "alice")
+    _call()
+    rebuilds.clear()
+    
+    DataStore.update_where("tasks.json", "id", 0, {"status": "done"}, "alice")
+    DataStore.remove_where("tasks.json", "id", 1, "alice")
+    status, body = _call()
+    assert rebuilds == []
+    assert body["entry_count"] == 20
+    assert body["groups"]["status"] == {"open": 18, "done": 1}
+    
+    # Operations too costly to count are left to the next reader
+    monkeypatch.setattr("shared.config.OplogConfig.COUNT_MAX_SEGMENTS", 0)
+    DataStore.remove_where("tasks.json", "status", "done", "alice")
+    status, body = _call()
+    assert rebuilds == ["tasks.json"]
+    assert body["entry_count"] == 19
+    assert body["groups"]["status"] == {"open": 18}
+
+
+def test_verify_repairs_drift(storage):
+    DataStore.append_many("tasks.json", _tasks(4), "alice")
+    _call()
+    # Counts that no longer match the data of the version they claim to describe
+    storage.update_json(
+        SummaryStats.index_name(),
+        lambda document: {**document, "files": {"tasks.json": {**document["files"]["tasks.json"], "groups": {}}}},
+        "alice"
+    )
+    
+    status, body = _call()
+    assert body["groups"]["status"] == {}
+    
+    status, body = _call({"verify": "true"})
+    assert status == 200
+    assert body["drifted"] == ["tasks.json"]
+    assert body["groups"]["status"] == {"open": 4}
+    assert _call({"verify": "true"})[1]["drifted"] == []
@@ -1,80 +1,119 @@
 import logging
 import json
+import sys
 import os
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
 
-# Pobieranie zmiennych środowiskowych
-CONN_STR = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
-CONTAINER_NAME = os.environ.get('AZURE_BLOB_CONTAINER_NAME')
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.azure_client import ConcurrencyConflictError
+from shared.data_store import DataStore, NotAnArrayError
+from shared.query import Query, QueryError
+from shared.user_manager import extract_user_id
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Python HTTP trigger function (update_data_entry) processed a request.')
-
-    if not CONN_STR or not CONTAINER_NAME:
-        return func.HttpResponse(
-             json.dumps({"status": "error", "message": "Brak konfiguracji połączenia z Blob Storage."}, indent=2),
-             mimetype="application/json",
-             status_code=500
-        )
-
+    
     # --- 1. PARSOWANIE DANYCH WEJŚCIOWYCH ---
     try:
         req_body = req.get_json()
     except ValueError:
         return func.HttpResponse(json.dumps({"status": "error", "message": "Nieprawidłowy format JSON."}, indent=2), mimetype="application/json", status_code=400)
-
+    
     # Argumenty do znalezienia rekordu
     target_blob_name = req_body.get('target_blob_name')
     find_key = req_body.get('find_key')     # np. 'id'
     find_value = req_body.get('find_value') # np. 'T002'
-
+    
     # Argumenty do aktualizacji rekordu
     update_key = req_body.get('update_key')   # np. 'status'
     update_value = req_body.get('update_value') # np. 'done'
-
-    if not all([target_blob_name, find_key, find_value, update_key, update_value]):
+    
+    # Tryb wsadowy: 'query' ({"where": ...}, jak w get_filtered_data) wybiera wszystkie pasujące rekordy,
+    # 'updates' (lub update_key/update_value) to ustawiane pola
+    query_spec = req_body.get('query')
+    updates = req_body.get('updates')
+    
+    if query_spec is not None:
+        if updates is None and update_key:
+            updates = {update_key: update_value}
+        if not target_blob_name or not isinstance(updates, dict) or not updates:
+            return func.HttpResponse(json.dumps({"status": "error", "message": "Tryb 'query' wymaga 'target_blob_name' oraz 'updates' (lub 'update_key' i 'update_value')."}, indent=2), mimetype="application/json", status_code=400)
+        try:
+            query = Query.compile(query_spec, filter_only=True)
+        except QueryError as e:
+            return func.HttpResponse(json.dumps({"status": "error", "message": f"Nieprawidłowe zapytanie: {e}"}, indent=2, ensure_ascii=False), mimetype="application/json", status_code=400)
+        if query.where is None:
+            return func.HttpResponse(json.dumps({"status": "error", "message": "Zapytanie musi zawierać 'where'; aktualizacja całego pliku nie jest dozwolona."}, indent=2), mimetype="application/json", status_code=400)
+    
+    elif not all([target_blob_name, find_key, find_value, update_key, update_value]):
          return func.HttpResponse(json.dumps({"status": "error", "message": "Brak wymaganych argumentów do znalezienia i aktualizacji rekordu."}, indent=2), mimetype="application/json", status_code=400)
-
+    
+    # Plik użytkownika (users/<user_id>/...), jak w pozostałych endpointach
+    user_id = extract_user_id(req)
+    logging.info(f"update_data_entry: user_id={user_id}, file_name={target_blob_name}")
+    
     # --- 2. LOGIKA AKTUALIZACJI ---
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(CONN_STR)
-        blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, target_blob_name)
-
-        # Pobranie aktualnego pliku
-        download_stream = blob_client.download_blob()
-        data_list = json.loads(download_stream.readall().decode('utf-8'))
+        if query_spec is not None:
+            # Jeden przebieg po rekordach; przepisywane są tylko segmenty z trafieniami
+            updated_count = DataStore.update_query(target_blob_name, query, updates, user_id=user_id)
+            if updated_count is None:
+                return func.HttpResponse(
+                    json.dumps({"status": "error", "message": f"Plik '{target_blob_name}' nie istnieje."}, indent=2),
+                    mimetype="application/json",
+                    status_code=404
+                )
+            message = f"Zaktualizowano {updated_count} rekordów w pliku '{target_blob_name}'."
+            return func.HttpResponse(
+                json.dumps({"status": "success", "message": message, "updated_count": updated_count, "updates": updates, "user_id": user_id}, indent=2, ensure_ascii=False),
+                mimetype="application/json",
+                status_code=200
+            )
         
-        entry_updated = False
+        # Duże pliki: jedna operacja dopisana do logu; mniejsze: odczyt + warunkowy zapis (If-Match)
+        # tylko segmentu z rekordem. Zakładamy, że klucz jest unikalny, przerywamy po pierwszym znalezieniu.
+        updated_count = DataStore.update_where(
+            target_blob_name,
+            find_key,
+            find_value,
+            {update_key: update_value},
+            user_id=user_id,
+            first_only=True,
+            ignore_case=True
+        )
         
-        # Iteracja i aktualizacja
-        for item in data_list:
-            if str(item.get(find_key)).lower() == str(find_value).lower():
-                # Zmiana wartości w znalezionym obiekcie
-                item[update_key] = update_value
-                entry_updated = True
-                logging.info(f"Zaktualizowano rekord '{find_value}': zmieniono '{update_key}' na '{update_value}'.")
-                break # Zakładamy, że klucz jest unikalny, przerywamy po znalezieniu
-
-        if not entry_updated:
+        if not updated_count:
             return func.HttpResponse(
                 json.dumps({"status": "warning", "message": f"Nie znaleziono rekordu o kluczu '{find_key}'='{find_value}'."}, indent=2),
                 mimetype="application/json",
                 status_code=404
             )
-
-        # Zapisanie zmodyfikowanej listy (nadpisanie)
-        modified_data = json.dumps(data_list, indent=2)
-        blob_client.upload_blob(modified_data, overwrite=True)
-
+        
+        logging.info(f"Zaktualizowano rekord '{find_value}': zmieniono '{update_key}' na '{update_value}'.")
+        
         # --- 3. ZWROT WYNIKU DO AGENTA ---
         message = f"Pomyślnie zaktualizowano rekord {find_key}={find_value} w pliku '{target_blob_name}'. Ustawiono {update_key} na {update_value}."
         return func.HttpResponse(
-            json.dumps({"status": "success", "message": message, "updated_key": update_key, "updated_value": update_value}, indent=2),
+            json.dumps({"status": "success", "message": message, "updated_key": update_key, "updated_value": update_value, "user_id": user_id}, indent=2),
             mimetype="application/json",
             status_code=200
         )
-
+    
+    except NotAnArrayError:
+        return func.HttpResponse(
+             json.dumps({"status": "error", "message": "Plik docelowy nie jest listą, aktualizacja wsadowa niemożliwa."}, indent=2),
+             mimetype="application/json",
+             status_code=400
+        )
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Konflikt zapisu w update_data_entry: {e}")
+        return func.HttpResponse(
+             json.dumps({"status": "conflict", "message": f"Plik był równolegle modyfikowany, spróbuj ponownie: {e}"}, indent=2),
+             mimetype="application/json",
+             status_code=409
+        )
     except Exception as e:
         logging.error(f"Global Error in update_data_entry: {e}")
         return func.HttpResponse(
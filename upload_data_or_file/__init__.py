@@ -1,9 +1,18 @@
 import logging
 import json
 import azure.functions as func
+import sys
 import os
 
-from azure.storage.blob import BlobServiceClient, ContentSettings
+# Add parent directory to path for shared imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.config import StorageConfig
+from shared.data_store import DataStore
+from shared.file_stats import FileStats
+from shared.storage import get_storage
+from shared.storage.encoding import encode_json
+from shared.user_manager import extract_user_id
 
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
@@ -18,10 +27,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             status_code=400
         )
-
+    
     target_blob_name = req_body.get('target_blob_name')
     file_content = req_body.get('file_content')
-
+    
     if not target_blob_name or file_content is None:
         return func.HttpResponse(
             json.dumps({
@@ -30,56 +39,50 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json",
             status_code=400
         )
-
-    # --- 2. Konfiguracja środowiska ---
-    try:
-        connect_str = os.environ["AZURE_STORAGE_CONNECTION_STRING"]
-        container_name = os.environ["AZURE_BLOB_CONTAINER_NAME"]
-    except KeyError:
-        return func.HttpResponse(
-            json.dumps({"error": "Missing Azure Storage configuration."}, ensure_ascii=False),
-            mimetype="application/json",
-            status_code=500
-        )
-
+    
+    # Zapis w przestrzeni użytkownika (users/<user_id>/...)
+    user_id = extract_user_id(req)
+    logging.info(f"upload_data_or_file: user_id={user_id}, file_name={target_blob_name}")
+    
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-        container_client = blob_service_client.get_container_client(container_name)
-
-        # --- 3. Przygotowanie danych do uploadu ---
+        # --- 2. Przygotowanie danych do uploadu ---
         # Automatyczne wykrycie content_type
         if isinstance(file_content, (dict, list)):
-            upload_data = json.dumps(file_content, indent=2, ensure_ascii=False)
-            content_type = "application/json"
+            # JSON przez wspólny encoder (STORAGE_JSON_ENCODING)
+            encoded = encode_json(file_content, StorageConfig.JSON_ENCODING)
+            # Entry/category counts for get_file_stats
+            encoded.metadata.update(FileStats.for_document(file_content))
+            upload_data = encoded.payload
+            content_type = encoded.content_type
         else:
-            upload_data = str(file_content)
+            encoded = None
+            upload_data = str(file_content).encode("utf-8")
             content_type = "text/plain"
-
-        content_settings = ContentSettings(content_type=content_type)
-
-        blob_client = container_client.get_blob_client(target_blob_name)
-
-        # --- 4. Zapis do Azure Blob (PRODUCTION SAFE) ---
-        blob_client.upload_blob(
-            upload_data.encode("utf-8"),
-            overwrite=True,
-            content_settings=content_settings
-        )
-
-        # --- 5. Odpowiedź ---
+        
+        # --- 3. Zapis do storage (PRODUCTION SAFE) ---
+        storage = get_storage()
+        if encoded is not None:
+            storage.write_encoded(target_blob_name, encoded, user_id, document=file_content)
+        else:
+            storage.write_bytes(target_blob_name, upload_data, user_id=user_id, content_type=content_type)
+        # Nadpisana kolekcja: jej segmenty, log operacji i indeksy nie opisują już nowej treści
+        DataStore.delete_internal(target_blob_name, user_id)
+        
+        # --- 4. Odpowiedź ---
         response_data = {
             "message": "File uploaded successfully.",
             "blob_name": target_blob_name,
             "content_type": content_type,
-            "size_bytes": len(upload_data.encode("utf-8")),
+            "size_bytes": len(upload_data),
+            "user_id": user_id,
         }
-
+        
         return func.HttpResponse(
             json.dumps(response_data, ensure_ascii=False),
             mimetype="application/json",
             status_code=200
         )
-
+    
     except Exception as e:
         logging.error(f"Critical error in upload_data_or_file: {e}")
         return func.HttpResponse(